@@ -1,64 +1,590 @@
-from flask import Flask, render_template, redirect, flash, request, session, g, jsonify
-from flask_debugtoolbar import DebugToolbarExtension
-from models import connect_db, User, Court, db
+from flask import Blueprint, Flask, Response, render_template, redirect, flash, request, session, g, jsonify, abort, current_app
+from models import connect_db, unique_violation_column, User, Court, GeocodeResult, PlaceRatingStats, db, password_hasher
 from forms import RegisterForm, LoginForm, EditForm
+from assets import StaticAssets
+from cache import TTLCache
+from fragments import FragmentCache
+from pagination import KeysetPage
+from geocoding import GeocodingError, GeocodingQuotaExceeded, create_geocoder
+from hashing import PasswordHasherBusy
+from ratelimit import LoginThrottle, create_rate_limit_backend
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, install_circuit_breaker, is_transient_db_error
+from metrics import (
+    MeasuredTemplate, finish_request, install_query_events, record_fragment_lookup, request_metrics, start_request
+)
+from pooling import engine_options, install_pool_events, pool_metrics, pool_status
+from sqlite_pragmas import install_sqlite_pragmas, is_memory_database, memory_engine_options
+from places import PlacesSearchCache, PlacesProviderError, PlacesQuotaExceeded, create_places_provider, DEFAULT_QUERY
 from functools import wraps
-from sqlalchemy.exc import IntegrityError
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy.exc import DisconnectionError, IntegrityError, OperationalError, SQLAlchemyError
+from sqlalchemy.orm import make_transient_to_detached
+import hmac
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
-    "DATABASE_URL", "postgresql:///basketball_court_finder_db"
-)
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ECHO"] = False
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_pre_ping": True,
-    "pool_recycle": 300,
-    "pool_timeout": 30,
-    "max_overflow": 10,
-    "pool_size": 5
-}
-app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
-app.config["DEBUG_TB_INTERCEPT_REDIRECTS"] = False
-# toolbar = DebugToolbarExtension(app)
-
-api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-
-connect_db(app)
-
 CURR_USER_KEY = "curr_user"
+CURR_USER_VERSION_KEY = "curr_user_version"
+
+views = Blueprint("views", __name__)
+
+# Per-process caches and services, built by create_app() from the app's config and shared by every
+# app created in this process.
+user_cache = None
+court_count_cache = None
+fragment_cache = None
+idempotency_cache = None
+places_search = None
+geocoder = None
+login_throttle = None
+db_breaker = None
+read_retry = None
+
+
+def configure(config):
+    """Fill in a config mapping with the app's settings, read from the environment."""
+
+    config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
+        "DATABASE_URL", "postgresql:///basketball_court_finder_db"
+    )
+    # Startup does one schema version SELECT by default; "off" skips it and "create" runs create_all().
+    # Schema changes are applied with `python schema.py`.
+    config["SCHEMA_CHECK"] = os.getenv("SCHEMA_CHECK", "version")
+    config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    config["SQLALCHEMY_ECHO"] = False
+    # Connection pool profile: "adaptive" (default), "direct" or "pgbouncer"; see pooling.engine_options.
+    config["DB_POOL_PROFILE"] = os.getenv("DB_POOL_PROFILE", "adaptive")
+    config["DB_POOL_SIZE"] = int(os.getenv("DB_POOL_SIZE", 5))
+    config["DB_MAX_OVERFLOW"] = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    config["DB_POOL_TIMEOUT"] = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    config["DB_POOL_RECYCLE"] = int(os.getenv("DB_POOL_RECYCLE", 300))
+    # With the adaptive profile, connections idle at least this many seconds are pinged before reuse.
+    config["DB_PING_AFTER_IDLE"] = float(os.getenv("DB_PING_AFTER_IDLE", 30))
+    # PRAGMAs for SQLite databases (local runs, tests and benchmarks): "default" or "benchmark", which adds
+    # WAL mode and faster, less durable settings; see sqlite_pragmas.PRAGMAS.
+    config["SQLITE_PROFILE"] = os.getenv("SQLITE_PROFILE", "default")
+    # Reads are retried on transient database errors with exponential backoff and jitter, and after
+    # DB_BREAKER_FAILURES failures in a row requests fail fast for DB_BREAKER_RESET_SECONDS.
+    config["DB_RETRY_ATTEMPTS"] = int(os.getenv("DB_RETRY_ATTEMPTS", 3))
+    config["DB_RETRY_BASE_DELAY"] = float(os.getenv("DB_RETRY_BASE_DELAY", 0.05))
+    config["DB_RETRY_MAX_DELAY"] = float(os.getenv("DB_RETRY_MAX_DELAY", 1.0))
+    config["DB_BREAKER_FAILURES"] = int(os.getenv("DB_BREAKER_FAILURES", 5))
+    config["DB_BREAKER_RESET_SECONDS"] = float(os.getenv("DB_BREAKER_RESET_SECONDS", 30))
+    # Bearer token for the /internal/* endpoints; they 404 when it isn't set.
+    config["INTERNAL_METRICS_TOKEN"] = os.getenv("INTERNAL_METRICS_TOKEN")
+    config["SECRET_KEY"] = os.getenv("SECRET_KEY")
+    config["DEBUG_TB_INTERCEPT_REDIRECTS"] = False
+    config["USER_CACHE_SIZE"] = int(os.getenv("USER_CACHE_SIZE", 1024))
+    config["USER_CACHE_TTL"] = int(os.getenv("USER_CACHE_TTL", 60))
+    config["COURT_COUNT_CACHE_TTL"] = int(os.getenv("COURT_COUNT_CACHE_TTL", 300))
+    config["IDEMPOTENCY_KEY_TTL"] = int(os.getenv("IDEMPOTENCY_KEY_TTL", 600))
+    config["FRAGMENT_CACHE_SIZE"] = int(os.getenv("FRAGMENT_CACHE_SIZE", 4096))
+    config["FRAGMENT_CACHE_TTL"] = int(os.getenv("FRAGMENT_CACHE_TTL", 3600))
+    # Compiled templates are cached in this directory, so new workers load them instead of compiling;
+    # empty picks a private directory under /tmp and "off" turns the cache off.
+    config["JINJA_BYTECODE_CACHE_DIR"] = os.getenv("JINJA_BYTECODE_CACHE_DIR", "")
+    config["PLACES_PROVIDER"] = os.getenv("PLACES_PROVIDER", "google")
+    # Recorded searches served when PLACES_PROVIDER is "fixture".
+    config["PLACES_FIXTURE"] = os.getenv(
+        "PLACES_FIXTURE", os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "places.json")
+    )
+    config["PLACES_CACHE_SIZE"] = int(os.getenv("PLACES_CACHE_SIZE", 2048))
+    config["PLACES_CACHE_TTL"] = int(os.getenv("PLACES_CACHE_TTL", 86400))
+    config["PLACES_GEOHASH_PRECISION"] = int(os.getenv("PLACES_GEOHASH_PRECISION", 5))
+    config["GEOCODER"] = os.getenv("GEOCODER", "google")
+    # Fix the bcrypt cost with BCRYPT_LOG_ROUNDS, or let BCRYPT_TARGET_MS pick it at startup.
+    config["BCRYPT_LOG_ROUNDS"] = int(os.getenv("BCRYPT_LOG_ROUNDS", 0)) or None
+    config["BCRYPT_TARGET_MS"] = float(os.getenv("BCRYPT_TARGET_MS", 0)) or None
+    config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    # Below gunicorn's threads per worker (GUNICORN_THREADS, 8), so a login burst gets 503s instead of
+    # holding every thread of the worker.
+    config["PASSWORD_HASH_MAX_PENDING"] = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 4))
+    # Login limits are (burst, attempts per minute) token buckets; the unknown user limit is per client IP.
+    config["RATE_LIMIT_BACKEND"] = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    config["LOGIN_LIMIT_PER_USERNAME"] = (
+        int(os.getenv("LOGIN_USERNAME_BURST", 5)), int(os.getenv("LOGIN_USERNAME_PER_MINUTE", 5))
+    )
+    config["LOGIN_LIMIT_PER_IP"] = (
+        int(os.getenv("LOGIN_IP_BURST", 20)), int(os.getenv("LOGIN_IP_PER_MINUTE", 20))
+    )
+    config["LOGIN_LIMIT_UNKNOWN_USERS"] = (
+        int(os.getenv("LOGIN_UNKNOWN_USER_BURST", 10)), int(os.getenv("LOGIN_UNKNOWN_USER_PER_MINUTE", 10))
+    )
+    # How many proxies in front of the app append to X-Forwarded-For (1 behind Render's load balancer). The
+    # client IP the login limits are keyed on is read from that header only when this is set, since without
+    # a proxy clients could fake it.
+    config["PROXY_HOPS"] = int(os.getenv("PROXY_HOPS", 0))
+    # The browser key is embedded in the search page and should be HTTP-referrer-restricted, which Google
+    # rejects on server calls; the server key (restricted by IP instead) is used for Places and geocoding.
+    config["GOOGLE_MAPS_API_KEY"] = os.getenv("GOOGLE_MAPS_API_KEY")
+    config["GOOGLE_MAPS_SERVER_API_KEY"] = os.getenv("GOOGLE_MAPS_SERVER_API_KEY")
+    # Debug-only extensions are imported only when switched on.
+    config["DEBUG_TOOLBAR"] = os.getenv("DEBUG_TOOLBAR") == "1"
+    return config
+
+
+def create_app(config=None):
+    """
+    Build the Flask app: settings from the environment (overridden by `config`), the database,
+    the password hasher, the per-process caches and services, and the routes.
+    """
+
+    global user_cache, court_count_cache, fragment_cache, idempotency_cache, places_search, geocoder, login_throttle
+    global db_breaker, read_retry
+
+    app = Flask(__name__)
+    configure(app.config)
+    app.config.update(config or {})
+    if is_memory_database(app.config["SQLALCHEMY_DATABASE_URI"]):
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", memory_engine_options())
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS",
+        engine_options(
+            app.config["DB_POOL_PROFILE"],
+            pool_size=app.config["DB_POOL_SIZE"],
+            max_overflow=app.config["DB_MAX_OVERFLOW"],
+            pool_timeout=app.config["DB_POOL_TIMEOUT"],
+            pool_recycle=app.config["DB_POOL_RECYCLE"],
+        ),
+    )
+
+    db_breaker = CircuitBreaker(
+        failure_threshold=app.config["DB_BREAKER_FAILURES"], reset_timeout=app.config["DB_BREAKER_RESET_SECONDS"]
+    )
+    read_retry = RetryPolicy(
+        attempts=app.config["DB_RETRY_ATTEMPTS"],
+        base_delay=app.config["DB_RETRY_BASE_DELAY"],
+        max_delay=app.config["DB_RETRY_MAX_DELAY"],
+    )
+
+    def install_engine_events(engine):
+        adaptive = app.config["DB_POOL_PROFILE"] == "adaptive"
+        install_sqlite_pragmas(engine, app.config["SQLITE_PROFILE"])
+        install_pool_events(engine, ping_after_idle=app.config["DB_PING_AFTER_IDLE"] if adaptive else None)
+        install_circuit_breaker(engine, db_breaker)
+        install_query_events(engine)
+
+    if app.config["PROXY_HOPS"]:
+        hops = app.config["PROXY_HOPS"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    connect_db(app, on_engine=install_engine_events)
+    app.jinja_env.template_class = MeasuredTemplate
+    # With `python assets.py` run, static URLs point at fingerprinted, precompressed, immutable copies.
+    StaticAssets(app)
+    bytecode_cache_dir = app.config["JINJA_BYTECODE_CACHE_DIR"]
+    if bytecode_cache_dir != "off":
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir or None)
+    password_hasher.init_app(app)
+    server_api_key = app.config["GOOGLE_MAPS_SERVER_API_KEY"]
+
+    # Per-process cache of logged in users, keyed by user id. A profile edit evicts the user for every
+    # session in this worker and stamps the editing session, so its own edits are seen right away by
+    # every other worker too; other sessions there may see the old profile for up to USER_CACHE_TTL.
+    user_cache = TTLCache(
+        maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"]
+    )
+
+    # Per-process cache of how many courts each user has saved, so the saved courts page nav
+    # doesn't need a COUNT(*) on every page view.
+    court_count_cache = TTLCache(
+        maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["COURT_COUNT_CACHE_TTL"]
+    )
+
+    # Per-process cache of rendered court cards, page navs and profile bodies; see FragmentCache.
+    fragment_cache = FragmentCache(
+        app.jinja_env,
+        maxsize=app.config["FRAGMENT_CACHE_SIZE"],
+        ttl=app.config["FRAGMENT_CACHE_TTL"],
+        on_lookup=record_fragment_lookup,
+    )
+
+    # Per-process cache of /save_court responses keyed by (user id, Idempotency-Key header), so a retried
+    # request gets the original response back without another INSERT.
+    idempotency_cache = TTLCache(
+        maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["IDEMPOTENCY_KEY_TTL"]
+    )
+
+    # Court searches are proxied through the server so nearby searches share cached results instead of
+    # each spending Google Places quota.
+    places_search = PlacesSearchCache(
+        create_places_provider(
+            app.config["PLACES_PROVIDER"], server_api_key, fixture=app.config["PLACES_FIXTURE"]
+        ),
+        maxsize=app.config["PLACES_CACHE_SIZE"],
+        ttl=app.config["PLACES_CACHE_TTL"],
+        precision=app.config["PLACES_GEOHASH_PRECISION"],
+    )
+
+    geocoder = create_geocoder(app.config["GEOCODER"], server_api_key)
+
+    # Login attempts are rate limited before any bcrypt work, so hammering /login can't starve the workers' CPU.
+    login_throttle = LoginThrottle(
+        create_rate_limit_backend(app.config["RATE_LIMIT_BACKEND"]),
+        per_username=app.config["LOGIN_LIMIT_PER_USERNAME"],
+        per_ip=app.config["LOGIN_LIMIT_PER_IP"],
+        unknown_users=app.config["LOGIN_LIMIT_UNKNOWN_USERS"],
+    )
+
+    if app.config["DEBUG_TOOLBAR"]:
+        from flask_debugtoolbar import DebugToolbarExtension
+
+        DebugToolbarExtension(app)
+
+    app.register_blueprint(views)
+    return app
+
+
+SAVED_COURTS_PER_PAGE = 15
+MAX_BATCH_OPERATIONS = 100
+REMOVED_IN_BATCH_MESSAGE = "The court was removed earlier in this batch"
+MAX_NEARBY_RADIUS_M = 50000
+MAX_RATING_PLACE_IDS = 100
+HASHER_BUSY_MESSAGE = "We're getting a lot of sign-ins right now. Please try again in a moment."
+SAVE_COURT_FIELDS = ("court_name", "google_maps_place_id", "address", "google_maps_url")
+# Endpoints that keep answering while the database is down.
+DATABASE_FREE_ENDPOINTS = {"static", "views.internal_pool_stats", "views.metrics"}
+
+
+def clear_caches():
+    """
+    Empty every per-process cache and the login throttle's buckets, and close the circuit breaker
+    (used by the test suite between tests).
+    """
+    caches = (user_cache, court_count_cache, fragment_cache, idempotency_cache, places_search.cache, login_throttle)
+    for cache in caches:
+        cache.clear()
+    db_breaker.reset()
 
 ######## HELPER FUNCTIONS #######
 
 
-@app.before_request
+@views.before_app_request
+def start_request_metrics():
+    """Start timing the request and counting its SQL statements; registered first so it sees everything."""
+    start_request()
+
+
+@views.after_app_request
+def record_request_metrics(response):
+    finish_request(request.endpoint, request.method, response.status_code, response.content_length)
+    return response
+
+
+@views.teardown_app_request
+def record_failed_request_metrics(error):
+    """Requests that ended in an unhandled exception never reach after_request; record them as 500s."""
+    if error is not None:
+        finish_request(request.endpoint, request.method, 500, None)
+
+
+@views.before_app_request
+def fail_fast_while_database_down():
+    """
+    While the circuit breaker is open, answer every request with a 503 right away, except those that
+    never touch the database (static files and the internal monitoring endpoints).
+    """
+
+    if request.endpoint not in DATABASE_FREE_ENDPOINTS and not db_breaker.allow():
+        raise CircuitOpenError()
+
+
+@views.before_app_request
 def add_user_to_g():
-    """If a user is logged in, add curr user to Flask global."""
+    """
+    If a user is logged in, add curr user to Flask global.
+    Transient database errors are retried; if they persist the request gets a 503 and the user stays logged in.
+    """
 
     if CURR_USER_KEY in session:
-        retry_count = 0
-        max_retries = 3
-        while retry_count < max_retries:
-            try:
-                g.user = User.query.get(session[CURR_USER_KEY])
-                break
-            except Exception as e:
-                retry_count += 1
-                app.logger.error(f"Database connection error (attempt {retry_count}): {str(e)}")
-                if retry_count >= max_retries:
-                    app.logger.error("Max retries reached, logging user out")
-                    if CURR_USER_KEY in session:
-                        del session[CURR_USER_KEY]
-                    g.user = None
-                    flash("An error occurred with your session. Please log in again.", "danger")
+        g.user = read_retry.call(
+            lambda: load_curr_user(session[CURR_USER_KEY]), breaker=db_breaker, before_retry=db.session.rollback
+        )
     else:
         g.user = None
 
 
+@views.app_errorhandler(CircuitOpenError)
+@views.app_errorhandler(DisconnectionError)
+@views.app_errorhandler(OperationalError)
+def database_unavailable(error):
+    """Respond 503 when the database can't be reached (after any retries) or the circuit breaker is open."""
+
+    try:
+        db.session.rollback()
+    except SQLAlchemyError:
+        pass
+    current_app.logger.error(f"Database unavailable: {error!r}")
+    g.setdefault("user", None)
+
+    message = "We can't reach the database right now. Please try again in a moment."
+    if request.is_json or request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json":
+        response = jsonify({"error": message})
+    else:
+        flash(message, "danger")
+        response = current_app.make_response(render_template("homepage.html"))
+    response.status_code = 503
+    response.headers["Retry-After"] = str(int(db_breaker.reset_timeout))
+    return response
+
+
+def retry_reads(view):
+    """
+    Decorator for views that only read (or make idempotent writes): run the whole view again on transient
+    database errors, with read_retry's backoff, and fail fast while the circuit breaker is open.
+    """
+
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        return read_retry.call(lambda: view(*args, **kwargs), breaker=db_breaker, before_retry=db.session.rollback)
+
+    return decorated_function
+
+
+def load_curr_user(user_id):
+    """
+    Return the logged in user, served from user_cache when possible.
+
+    On a hit the cached column values are merged into the current session without a query, so
+    lazy relationships (e.g. user.courts) and profile updates still work as usual.
+    On a miss the user is loaded from the database and a snapshot of their columns is cached.
+    A snapshot loaded before this session last edited the user is treated as a miss.
+    """
+
+    entry = user_cache.get(user_id)
+    if entry is not None:
+        loaded_at, snapshot = entry
+        if loaded_at >= session.get(CURR_USER_VERSION_KEY, 0):
+            user = User(**snapshot)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+    # Taken before the query, so a load that may have raced an edit is never mistaken for a fresh one.
+    loaded_at = time.time()
+    user = db.session.get(User, user_id)
+    if user:
+        user_cache.set(
+            user_id, (loaded_at, {column.key: getattr(user, column.key) for column in User.__table__.columns})
+        )
+    return user
+
+
+def invalidate_curr_user():
+    """Drop the logged in user from user_cache for every session, and stamp this session with the edit time."""
+    if CURR_USER_KEY in session:
+        user_cache.pop(session[CURR_USER_KEY])
+        session[CURR_USER_VERSION_KEY] = time.time()
+
+
+def count_saved_courts(user_id):
+    """Count the courts a user has saved, with one COUNT(*) on the (user_id, id) index."""
+    return db.session.query(db.func.count(Court.id)).filter(Court.user_id == user_id).scalar()
+
+
+def get_saved_court_count(user_id):
+    """Return the number of courts a user has saved, using court_count_cache when possible."""
+
+    total = court_count_cache.get(user_id)
+    if total is None:
+        total = count_saved_courts(user_id)
+        court_count_cache.set(user_id, total)
+    return total
+
+
+def court_card(court):
+    """A saved court's card on the saved courts page, from fragment_cache unless the court has changed."""
+
+    return fragment_cache.render(
+        ("court_card", court.id),
+        (court.court_name, court.address, court.google_maps_url, court.user_rating),
+        "fragments/court_card.html",
+        court=court,
+    )
+
+
+def saved_courts_pagination(user, courts):
+    """The page-number nav of a saved courts page; one link per page, so it grows with the collection."""
+
+    return fragment_cache.render(
+        ("saved_courts_pagination", user.id, courts.page),
+        (user.username, courts.pages, courts.next_cursor),
+        "fragments/saved_courts_pagination.html",
+        user=user,
+        courts=courts,
+    )
+
+
+def user_profile_body(user):
+    """The details on a user's profile page, from fragment_cache unless they or the court count changed."""
+
+    # Counted on every view rather than taken from court_count_cache: saves and removals handled by other
+    # workers would leave that stale for up to its TTL, and the profile shows the exact total.
+    court_count = count_saved_courts(user.id)
+    return fragment_cache.render(
+        ("user_profile_body", user.id),
+        (user.username, user.email, user.first_name, user.last_name, user.bio, user.location, court_count),
+        "fragments/user_profile_body.html",
+        user=user,
+        court_count=court_count,
+    )
+
+
+def evict_court_cards(court_ids):
+    fragment_cache.evict(*(("court_card", court_id) for court_id in court_ids))
+
+
+def evict_profile_body(user_id):
+    fragment_cache.evict(("user_profile_body", user_id))
+
+
+def parse_court_id(value):
+    """Return value as an int court id, or None if it isn't one. Court ids arrive from data attributes as strings."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_location(data):
+    """Return the lat and lng from a court's JSON data, or (None, None) if they are missing or out of range."""
+    lat, lng = data.get("lat"), data.get("lng")
+    if (
+        isinstance(lat, (int, float))
+        and isinstance(lng, (int, float))
+        and not isinstance(lat, bool)
+        and not isinstance(lng, bool)
+        and -90 <= lat <= 90
+        and -180 <= lng <= 180
+    ):
+        return lat, lng
+    return None, None
+
+
+def is_valid_rating(value):
+    """Check a rating is a number between 0 and 5, matching the user_rating CheckConstraint."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 5
+
+
+def apply_court_operations(user, operations):
+    """
+    Validate and apply a list of save/remove/rate operations for a user in a single transaction.
+
+    Ownership of every court referenced by a remove or rate operation is checked with one query, which also
+    locks those rows and reads their current place and rating so the place rating stats can be updated.
+    Invalid operations get an error result and are skipped, so they can't abort the rest of the batch.
+
+    Saves, rating updates and removals are each applied together rather than one at a time, which only
+    matches request order because an operation on a court (or its place) after that court's removal in the
+    same batch is rejected with a 409: run in order it would act on a deleted court.
+    Returns a list of per-operation results in the same order as the operations.
+    Raises on a database error, in which case nothing has been committed.
+    """
+
+    court_ids = {
+        parse_court_id(op.get("court_id"))
+        for op in operations
+        if isinstance(op, dict) and op.get("op") in ("remove", "rate")
+    }
+    court_ids.discard(None)
+    # Read before the commit below expires the user, so it isn't loaded again afterwards.
+    user_id = user.id
+    owned = {}
+    if court_ids:
+        owned = {
+            row.id: row
+            for row in db.session.execute(
+                db.select(Court.id, Court.user_id, Court.place_id, Court.user_rating)
+                .where(Court.id.in_(court_ids))
+                .with_for_update()
+            )
+        }
+
+    results = []
+    new_courts = []
+    save_results = []
+    ratings = {}
+    removals = set()
+    removed_places = set()
+    for index, op in enumerate(operations):
+        kind = op.get("op") if isinstance(op, dict) else None
+
+        if kind == "save":
+            if not all(isinstance(op.get(field), str) and op.get(field) for field in SAVE_COURT_FIELDS):
+                results.append({"index": index, "status": 400, "error": "Missing court data"})
+                continue
+            if op["google_maps_place_id"] in removed_places:
+                results.append({"index": index, "status": 409, "error": REMOVED_IN_BATCH_MESSAGE})
+                continue
+            lat, lng = parse_location(op)
+            new_courts.append(dict({field: op[field] for field in SAVE_COURT_FIELDS}, lat=lat, lng=lng))
+            result = {"index": index, "message": "Court saved successfully"}
+            save_results.append((op["google_maps_place_id"], result))
+            results.append(result)
+            continue
+
+        if kind not in ("remove", "rate"):
+            results.append({"index": index, "status": 400, "error": "Unknown operation"})
+            continue
+
+        court_id = parse_court_id(op.get("court_id"))
+        if court_id in removals:
+            results.append({"index": index, "status": 409, "error": REMOVED_IN_BATCH_MESSAGE})
+        elif court_id not in owned:
+            results.append({"index": index, "status": 404, "error": "Court not found"})
+        elif owned[court_id].user_id != user_id:
+            results.append({"index": index, "status": 403, "error": "Unauthorized action"})
+        elif kind == "remove":
+            removals.add(court_id)
+            removed_places.add(owned[court_id].place_id)
+            results.append({"index": index, "status": 200, "message": "Court successfully deleted", "id": court_id})
+        elif not is_valid_rating(op.get("rating")):
+            results.append({"index": index, "status": 400, "error": "Rating must be between 0 and 5"})
+        else:
+            ratings[court_id] = op["rating"]
+            results.append({"index": index, "status": 200, "message": "Rating updated successfully", "id": court_id})
+
+    saved = Court.upsert_many(user_id, new_courts)
+    for place_id, result in save_results:
+        court_id, created = saved[place_id]
+        result.update(id=court_id, status=201 if created else 200)
+
+    ratings = {court_id: rating for court_id, rating in ratings.items() if court_id not in removals}
+    if ratings:
+        db.session.execute(
+            db.update(Court),
+            [{"id": court_id, "user_rating": rating} for court_id, rating in ratings.items()],
+        )
+    if removals:
+        db.session.execute(db.delete(Court).where(Court.id.in_(removals)))
+    PlaceRatingStats.record(
+        [(owned[court_id].place_id, 0, owned[court_id].user_rating, rating) for court_id, rating in ratings.items()]
+        + [(owned[court_id].place_id, -1, owned[court_id].user_rating, None) for court_id in removals]
+    )
+    db.session.commit()
+
+    evict_court_cards(list(ratings) + list(removals))
+    if new_courts or removals:
+        court_count_cache.pop(user_id)
+        evict_profile_body(user_id)
+    return results
+
+
+def court_miss_response(court_id):
+    """
+    Build the error response after an ownership-checked court DELETE/UPDATE matched no row.
+    Only on this rare path do we look the court up again, to tell "not found" (404) from "not yours" (403).
+    """
+
+    if court_id is None or db.session.get(Court, court_id) is None:
+        return jsonify({"error": "Court not found"}), 404
+    return jsonify({"error": "Unauthorized action"}), 403
+
+
 def do_login(user):
     """Log in a user."""
     session[CURR_USER_KEY] = user.id
@@ -66,6 +592,7 @@ def do_login(user):
 
 def do_logout():
     """Logout user."""
+    invalidate_curr_user()
     if CURR_USER_KEY in session:
         del session[CURR_USER_KEY]
 
@@ -83,6 +610,23 @@ def login_required(wrapped_function):
     return decorated_function
 
 
+def internal_token_required(wrapped_function):
+    """
+    Decorator for internal endpoints: requires `Authorization: Bearer <INTERNAL_METRICS_TOKEN>`.
+    Responds 404 when no token is configured or the header doesn't match, so the endpoints stay hidden.
+    """
+
+    @wraps(wrapped_function)
+    def decorated_function(*args, **kwargs):
+        token = current_app.config["INTERNAL_METRICS_TOKEN"]
+        supplied = request.headers.get("Authorization", "")
+        if not token or not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+            abort(404)
+        return wrapped_function(*args, **kwargs)
+
+    return decorated_function
+
+
 def cannot_be_logged_in(wrapped_function):
     """Decorator to ensure a logged in user cannot see register/login routes."""
 
@@ -109,24 +653,47 @@ def user_authorized(wrapped_function):
     return decorated_function
 
 
+def geocode_user_location(user):
+    """
+    Store the coordinates of the user's location text on the user, so /search can center the map on them
+    without a Geocoding call. Coordinates are cleared if the location is empty or can't be geocoded.
+    """
+
+    result = None
+    if user.location:
+        try:
+            result = GeocodeResult.lookup(user.location, geocoder)
+        except GeocodingError as e:
+            current_app.logger.error(f"Geocoding user location failed: {e}")
+    user.location_lat = result["lat"] if result else None
+    user.location_lng = result["lng"] if result else None
+
+
 def handle_update_user_profile_form(user, form):
     """Updates user profile with form data and commits changes to the database. Redirect response to the user's page after updating profile."""
 
+    location_changed = user.location != form.location.data
     user.username = form.username.data
     user.email = form.email.data
     user.first_name = form.first_name.data
     user.last_name = form.last_name.data
     user.bio = form.bio.data
     user.location = form.location.data
+    if location_changed:
+        geocode_user_location(user)
+    # Read before the commit expires the user, so it isn't loaded again just for these.
+    user_id, username = user.id, user.username
     db.session.commit()
-    flash(f"You have succesfully updated your profile, {user.username}!", "success")
-    return redirect(f"/users/{user.username}/user_profile")
+    invalidate_curr_user()
+    evict_profile_body(user_id)
+    flash(f"You have succesfully updated your profile, {username}!", "success")
+    return redirect(f"/users/{username}/user_profile")
 
 
 ####### ROUTES #######
 
 
-@app.route("/")
+@views.route("/")
 def home():
     """Home Page when no user is logged in."""
     return render_template("homepage.html")
@@ -135,7 +702,7 @@ def home():
 ### USER REGISTRATION/LOGIN ROUTES ###
 
 
-@app.route("/register", methods=["GET", "POST"])
+@views.route("/register", methods=["GET", "POST"])
 @cannot_be_logged_in
 def register():
     """
@@ -158,17 +725,23 @@ def register():
                 bio=form.bio.data,
                 location=form.location.data,
             )
+            geocode_user_location(new_user)
             db.session.add(new_user)
             db.session.commit()
 
+        except PasswordHasherBusy:
+            flash(HASHER_BUSY_MESSAGE, "warning")
+            return render_template("register.html", form=form), 503
+
         except IntegrityError as e:
             db.session.rollback()
-            app.logger.error(f"IntegrityError: {e}")
-            if "username" in str(e.orig):
+            current_app.logger.error(f"IntegrityError: {e}")
+            column = unique_violation_column(e)
+            if column == "username":
                 form.username.errors.append(
                     "Sorry! Another fellow hooper has already claimed that username. Please choose another username!"
                 )
-            elif "email" in str(e.orig):
+            elif column == "email":
                 form.email.errors.append(
                     "Hold up Player! Another person is using this email address already. Try again please!"
                 )
@@ -187,7 +760,7 @@ def register():
     return render_template("register.html", form=form)
 
 
-@app.route("/login", methods=["GET", "POST"])
+@views.route("/login", methods=["GET", "POST"])
 @cannot_be_logged_in
 def login():
     """
@@ -199,11 +772,30 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.authenticate(
-            username=form.username.data, password=form.password.data
-        )
+        client_ip = request.remote_addr
+        if not login_throttle.allow(form.username.data, client_ip):
+            flash("Too many login attempts. Please wait a minute and try again.", "danger")
+            return render_template("login.html", form=form), 429
+
+        try:
+            user = User.authenticate(
+                username=form.username.data,
+                password=form.password.data,
+                on_unknown_user=lambda: login_throttle.record_unknown_user(client_ip),
+            )
+        except PasswordHasherBusy:
+            flash(HASHER_BUSY_MESSAGE, "warning")
+            return render_template("login.html", form=form), 503
 
         if user:
+            if db.session.is_modified(user):
+                # authenticate() upgraded the stored hash to the current cost. Failing to save it
+                # only means the upgrade is retried next login, so don't fail the login.
+                try:
+                    db.session.commit()
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    current_app.logger.error(f"Could not save rehashed password: {e}")
             flash(f"Welcome back, {user.username}!", "success")
             do_login(user)
             return redirect(f"/users/{user.username}/saved_courts")
@@ -213,7 +805,7 @@ def login():
     return render_template("login.html", form=form)
 
 
-@app.route("/logout")
+@views.route("/logout")
 @login_required
 def logout():
     """Handle logout of user."""
@@ -226,18 +818,19 @@ def logout():
 ### USER PROFILE ROUTES ###
 
 
-@app.route("/users/<username>/user_profile")
+@views.route("/users/<username>/user_profile")
 @login_required
 @user_authorized
+@retry_reads
 def show_user_profile(username):
     """When a user is logged in, show the user's profile information.
     Checks if user is unauthorized. E.G. If they are trying to access another profile.
     """
 
-    return render_template("user_profile_page.html", user=g.user)
+    return render_template("user_profile_page.html", user=g.user, profile_body=user_profile_body(g.user))
 
 
-@app.route("/users/<username>/edit_profile", methods=["GET", "POST"])
+@views.route("/users/<username>/edit_profile", methods=["GET", "POST"])
 @login_required
 @user_authorized
 def edit_user_profile(username):
@@ -268,62 +861,281 @@ def edit_user_profile(username):
 ### COURTS ROUTES ###
 
 
-@app.route("/search")
+@views.route("/search")
 @login_required
 def search_for_courts():
     """If a user is logged in, take them to the page to search for basketball courts."""
 
-    courts_data = [court.serialize() for court in g.user.courts]
-    return render_template("search.html", api_key=api_key, courts=courts_data)
+    center = None
+    if g.user.location_lat is not None and g.user.location_lng is not None:
+        center = {"lat": g.user.location_lat, "lng": g.user.location_lng}
+    return render_template("search.html", api_key=current_app.config["GOOGLE_MAPS_API_KEY"], center=center)
+
+
+@views.route("/geocode")
+@login_required
+@retry_reads
+def geocode():
+    """
+    Geocode a search term for the search page.
+
+    Results are stored in the geocode_results table and shared across users, so repeat searches
+    for the same place never reach the Geocoding API.
+    """
+
+    query = request.args.get("query", "").strip()
+    if not query:
+        return jsonify({"error": "Please enter a search term."}), 400
+
+    try:
+        result = GeocodeResult.lookup(query, geocoder)
+        db.session.commit()
+    except GeocodingQuotaExceeded:
+        db.session.rollback()
+        return jsonify({"error": "Daily request limit for Google Maps API reached"}), 429
+    except GeocodingError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Geocoding failed: {e}")
+        return jsonify({"error": "Something went wrong, please try again!"}), 502
+
+    if result is None:
+        return jsonify({"error": "No results found. Please check the address and try again."}), 404
+    return jsonify(result)
 
 
-@app.route("/save_court", methods=["POST"])
+@views.route("/places/search")
+@login_required
+def search_places():
+    """
+    Search for basketball courts near a location through the server-side places provider.
+
+    Expects lat and lng query parameters (and an optional query, defaulting to "Basketball Court").
+    Results are cached per geohash cell of the location, so nearby searches reuse one upstream call.
+    """
+
+    lat = request.args.get("lat", type=float)
+    lng = request.args.get("lng", type=float)
+    query = request.args.get("query", DEFAULT_QUERY).strip() or DEFAULT_QUERY
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return jsonify({"error": "A valid lat and lng are required"}), 400
+
+    try:
+        places = places_search.search(query, lat, lng)
+    except PlacesQuotaExceeded:
+        return jsonify({"error": "Daily request limit for Google Maps API reached"}), 429
+    except PlacesProviderError as e:
+        current_app.logger.error(f"Places search failed: {e}")
+        return jsonify({"error": "Something went wrong with the Google Maps API"}), 502
+
+    return jsonify({"places": places})
+
+
+@views.route("/places/ratings")
+@login_required
+@retry_reads
+def place_ratings():
+    """
+    Return the community rating stats for a batch of places, e.g. /places/ratings?place_id=a&place_id=b.
+
+    Responds with {"ratings": {place_id: {"average", "rating_count", "save_count", "histogram"}}}, read in one
+    primary key lookup. Places nobody has saved are left out. At most 100 place ids are accepted.
+    """
+
+    place_ids = [place_id for place_id in request.args.getlist("place_id") if place_id]
+    if len(place_ids) > MAX_RATING_PLACE_IDS:
+        return jsonify({"error": f"At most {MAX_RATING_PLACE_IDS} place ids are allowed"}), 400
+
+    return jsonify({"ratings": PlaceRatingStats.for_places(place_ids)})
+
+
+@views.route("/internal/pool")
+@internal_token_required
+def internal_pool_stats():
+    """
+    Connection pool statistics for this worker process: the profile, the pool's live occupancy,
+    counters of checkouts, connects, idle pings and checkout waits since the worker started, the
+    circuit breaker's state and read retry count, and the logged in user cache's size and hit rate.
+    """
+
+    return jsonify(
+        {
+            "pid": os.getpid(),
+            "profile": current_app.config["DB_POOL_PROFILE"],
+            "pool": pool_status(db.engine),
+            "metrics": pool_metrics.stats(),
+            "breaker": db_breaker.stats(),
+            "read_retries": read_retry.retries,
+            "user_cache": user_cache.stats(),
+        }
+    )
+
+
+@views.route("/metrics")
+@internal_token_required
+def metrics():
+    """
+    Per-endpoint request latency, SQL statement counts and time, response sizes and template render
+    times and sizes for this worker process, in the Prometheus text format.
+    """
+
+    return Response(request_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@views.route("/saved_court_ids")
+@login_required
+@retry_reads
+def saved_court_ids():
+    """
+    Return the current user's saved courts as JSON mapping google_maps_place_id -> court id.
+
+    Used by search.js to mark saved courts on the map. The response carries an ETag so the
+    browser can revalidate with If-None-Match and get a 304 when nothing has changed.
+    """
+
+    response = jsonify(Court.saved_place_ids(g.user.id))
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@views.route("/save_court", methods=["POST"])
 @login_required
 def save_court():
-    """Save a court to the database."""
+    """
+    Save a court to the database.
+
+    Saving a place the user has already saved returns the existing court's id (200) instead of creating a duplicate (201).
+    An optional Idempotency-Key header lets retried requests return the first response without touching the database.
+    """
+
+    # Read before the commit below, which expires g.user: reading it afterwards would reload the user.
+    user_id = g.user.id
+    idempotency_key = request.headers.get("Idempotency-Key")
+    if idempotency_key:
+        cached_response = idempotency_cache.get((user_id, idempotency_key))
+        if cached_response is not None:
+            data_to_return, status = cached_response
+            return jsonify(data_to_return), status
 
     data = request.get_json()
     if not data:
         return jsonify({"error": "No input data provided"}), 400
     try:
-        saved_court = Court(
-            court_name=data.get("court_name"),
-            google_maps_place_id=data.get("google_maps_place_id"),
-            address=data.get("address"),
-            google_maps_url=data.get("google_maps_url"),
-            user_id=g.user.id,
-        )
-        db.session.add(saved_court)
+        lat, lng = parse_location(data)
+        court = dict({field: data.get(field) for field in SAVE_COURT_FIELDS}, lat=lat, lng=lng)
+        court_id, created = Court.upsert_many(user_id, [court])[court["google_maps_place_id"]]
         db.session.commit()
-        data_to_return = {"message": "Court saved successfully", "id": saved_court.id}
-        return jsonify(data_to_return), 201
+        if created:
+            court_count_cache.pop(user_id)
+            evict_profile_body(user_id)
+        data_to_return = {"message": "Court saved successfully", "id": court_id}
+        status = 201 if created else 200
+        if idempotency_key:
+            idempotency_cache.set((user_id, idempotency_key), (data_to_return, status))
+        return jsonify(data_to_return), status
+    except Exception as e:
+        db.session.rollback()
+        if is_transient_db_error(e):
+            raise
+        return jsonify({"error": "An unexpected error occured. Please try again"}), 500
+
+
+@views.route("/courts/batch", methods=["POST"])
+@login_required
+def batch_update_courts():
+    """
+    Apply many court saves, removals and rating updates in one request and one transaction.
+
+    Expects JSON like {"operations": [{"op": "save", "court_name": ..., "google_maps_place_id": ...,
+    "address": ..., "google_maps_url": ...}, {"op": "remove", "court_id": 1}, {"op": "rate", "court_id": 2, "rating": 4}]}
+    and returns {"results": [...]} with a status (matching the single court routes) for each operation.
+    """
+
+    data = request.get_json(silent=True)
+    operations = data.get("operations") if isinstance(data, dict) else None
+    if not operations or not isinstance(operations, list):
+        return jsonify({"error": "No input data provided"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"error": f"A batch can contain at most {MAX_BATCH_OPERATIONS} operations"}), 400
+
+    try:
+        results = apply_court_operations(g.user, operations)
+        return jsonify({"results": results}), 200
     except Exception as e:
         db.session.rollback()
+        if is_transient_db_error(e):
+            raise
         return jsonify({"error": "An unexpected error occured. Please try again"}), 500
 
 
-@app.route("/users/<username>/saved_courts")
+@views.route("/courts/nearby")
+@login_required
+@retry_reads
+def nearby_saved_courts():
+    """
+    Return the current user's saved courts within `radius` meters (default 5000, max 50000) of `lat`/`lng`, nearest first.
+
+    Only courts saved with a location (from the search page) can be found.
+    """
+
+    lat = request.args.get("lat", type=float)
+    lng = request.args.get("lng", type=float)
+    radius = request.args.get("radius", 5000, type=float)
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        return jsonify({"error": "A valid lat and lng are required"}), 400
+    if not 0 < radius <= MAX_NEARBY_RADIUS_M:
+        return jsonify({"error": f"radius must be between 0 and {MAX_NEARBY_RADIUS_M} meters"}), 400
+
+    courts = [
+        dict(court.serialize(), lat=court.place.lat, lng=court.place.lng, distance_m=round(distance, 1))
+        for court, distance in Court.nearby(g.user.id, lat, lng, radius)
+    ]
+    return jsonify({"courts": courts})
+
+
+@views.route("/users/<username>/saved_courts")
 @login_required
 @user_authorized
+@retry_reads
 def view_saved_courts(username):
     """
     Allow a user to view their saved courts.
 
     This function checks if the user is authorized to access the saved courts for the specified username.
     It retrieves and displays only the set of courts for the current page (paginated), ensuring that only a subset of the user's saved courts are shown at a time.
+    When an `after` court id is given (the Next link), the page is fetched with a keyset query starting after that court
+    instead of an OFFSET, so deep pages cost the same as the first one.
     """
 
     page = request.args.get("page", 1, type=int)
-    courts_paginated = (
-        Court.query.filter_by(user_id=g.user.id)
-        .order_by(Court.id.desc())
-        .paginate(page=page, per_page=15)
+    after = request.args.get("after", type=int)
+    if page < 1:
+        abort(404)
+
+    rows = Court.keyset_page(
+        g.user.id,
+        per_page=SAVED_COURTS_PER_PAGE,
+        after=after,
+        offset=(page - 1) * SAVED_COURTS_PER_PAGE,
     )
+    if page > 1 and not rows:
+        abort(404)
 
-    return render_template("saved_courts.html", user=g.user, courts=courts_paginated)
+    courts_paginated = KeysetPage(
+        rows, page, SAVED_COURTS_PER_PAGE, get_saved_court_count(g.user.id)
+    )
+
+    return render_template(
+        "saved_courts.html",
+        user=g.user,
+        courts=courts_paginated,
+        cards=[court_card(court) for court in courts_paginated],
+        pagination=saved_courts_pagination(g.user, courts_paginated) if courts_paginated.items else None,
+    )
 
 
-@app.route("/remove_court", methods=["POST"])
+@views.route("/remove_court", methods=["POST"])
 @login_required
 def remove_saved_court():
     """Removes a saved court from the saved_courts page and from the database."""
@@ -333,42 +1145,44 @@ def remove_saved_court():
         return jsonify({"error": "No input data provided"}), 400
 
     try:
-        court_id = data.get("court_id")
-        court = Court.query.get(court_id)
-        if not court:
-            return jsonify({"error": "Court not found"}), 404
+        court_id = parse_court_id(data.get("court_id"))
+        if Court.delete_owned(court_id, g.user.id) is None:
+            return court_miss_response(court_id)
 
-        if court.user_id != g.user.id:
-            return jsonify({"error": "Unauthorized action"}), 403
-
-        db.session.delete(court)
         db.session.commit()
+        court_count_cache.pop(g.user.id)
+        evict_court_cards([court_id])
+        evict_profile_body(g.user.id)
         return jsonify({"message": "Court successfully deleted"}), 200
     except Exception as e:
         db.session.rollback()
+        if is_transient_db_error(e):
+            raise
         return jsonify({"error": "An unexpected error occured. Please try again"}), 500
 
 
-@app.route("/update_court_rating", methods=["POST"])
+@views.route("/update_court_rating", methods=["POST"])
 @login_required
 def update_court_rating():
     """Updates the user's rating for a specific court they have saved."""
 
     data = request.get_json()
-    court_id = data.get("court_id")
+    court_id = parse_court_id(data.get("court_id"))
     rating = data.get("rating")
 
-    court = Court.query.get(court_id)
-    if not court:
-        return jsonify({"error": "Court not found"}), 404
-
-    if court.user_id != g.user.id:
-        return jsonify({"error": "Unauthorized action"}), 403
-
     try:
-        court.user_rating = rating
+        if Court.rate_owned(court_id, g.user.id, rating) is None:
+            return court_miss_response(court_id)
+
         db.session.commit()
+        evict_court_cards([court_id])
         return jsonify({"message": "Rating updated successfully"}), 200
     except Exception as e:
         db.session.rollback()
+        if is_transient_db_error(e):
+            raise
         return jsonify({"error": "An unexpected error occured. Please try again"}), 500
+
+
+# The default app, used by `flask run`, gunicorn (app:app) and the tests.
+app = create_app()
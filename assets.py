@@ -0,0 +1,153 @@
+"""
+Builds fingerprinted, precompressed copies of the static files. Run after changing anything in static/.
+
+Every file in static/ is copied to static/dist/ under a name carrying a hash of its content
+(js/search.js -> js/search.1f0c2a9b7d3e.js), so it can be cached by browsers forever: a changed file gets
+a new name. Text files (JS, CSS, SVG, ...) also get .gz and, with the Brotli package installed, .br
+variants next to them. static/dist/manifest.json maps each original name to its hashed name and
+variants; with it present, url_for('static', ...) emits the hashed names and the static route serves the
+best variant the browser accepts with `Cache-Control: immutable` (see StaticAssets).
+
+Usage: python assets.py [--static static]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".svg", ".json", ".txt", ".html", ".map", ".ico"}
+# Preferred first when a browser accepts several equally.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def fingerprinted_name(name, content):
+    root, extension = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{extension}"
+
+
+def compress(content, encoding):
+    if encoding == "gzip":
+        # mtime=0 keeps the output, and so the build, reproducible.
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    return brotli.compress(content, quality=11)
+
+
+def build(static_dir, log=print):
+    """
+    Rebuild static_dir/dist from the files in static_dir and write its manifest. Compressed variants are
+    only kept when they are smaller than the file. Returns the manifest's files mapping.
+    """
+
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    encodings = [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding == "gzip" or brotli is not None]
+    if brotli is None:
+        log("Brotli is not installed; writing gzip variants only.")
+
+    files = {}
+    for directory, subdirectories, filenames in os.walk(static_dir):
+        if os.path.abspath(directory) == os.path.abspath(static_dir):
+            subdirectories[:] = [name for name in subdirectories if name != DIST_DIR]
+        for filename in sorted(filenames):
+            source = os.path.join(directory, filename)
+            name = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            with open(source, "rb") as file:
+                content = file.read()
+
+            hashed = fingerprinted_name(name, content)
+            target = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as file:
+                file.write(content)
+
+            variants = []
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                for encoding, suffix in encodings:
+                    compressed = compress(content, encoding)
+                    if len(compressed) < len(content):
+                        with open(target + suffix, "wb") as file:
+                            file.write(compressed)
+                        variants.append(encoding)
+            files[name] = {"path": hashed, "encodings": variants}
+            log(f"  {name} -> {DIST_DIR}/{hashed} {' '.join(variants)}".rstrip())
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w") as manifest:
+        json.dump({"files": files}, manifest, indent=2, sort_keys=True)
+    log(f"Built {len(files)} static files into {dist_dir}.")
+    return files
+
+
+class StaticAssets:
+    """
+    Serves the build's fingerprinted files. Does nothing until the build has been run (no manifest), and
+    is skipped in debug mode, where static files are edited without rebuilding.
+
+    url_for('static', filename='js/search.js') becomes /static/dist/js/search.<hash>.js. A request for a
+    file in dist/ gets the .br or .gz variant when the Accept-Encoding header allows one, with
+    Content-Encoding, `Vary: Accept-Encoding` and a year-long immutable Cache-Control. Everything else
+    is served by Flask's own static handler.
+    """
+
+    def __init__(self, app):
+        self.static_folder = app.static_folder
+        self.files = {}
+        self.encodings = {}
+        manifest_path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as manifest:
+                self.files = json.load(manifest)["files"]
+        for entry in self.files.values():
+            self.encodings[f"{DIST_DIR}/{entry['path']}"] = entry["encodings"]
+        self._send_static_file = app.view_functions["static"]
+        app.view_functions["static"] = self.send_static_file
+        app.url_defaults(self.fingerprint_url)
+
+    def fingerprint_url(self, endpoint, values):
+        if endpoint != "static" or not self.files or current_app.debug:
+            return
+        entry = self.files.get(values.get("filename"))
+        if entry is not None:
+            values["filename"] = f"{DIST_DIR}/{entry['path']}"
+
+    def send_static_file(self, filename):
+        encodings = self.encodings.get(filename)
+        if encodings is None:
+            return self._send_static_file(filename=filename)
+
+        encoding = request.accept_encodings.best_match(
+            [encoding for encoding, suffix in ENCODINGS if encoding in encodings]
+        )
+        suffix = dict(ENCODINGS).get(encoding, "")
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = send_from_directory(self.static_folder, filename + suffix, mimetype=mimetype)
+        if encoding is not None:
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--static", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+    args = parser.parse_args()
+    build(args.static)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compare database backends: run the route benchmark (benchmarks/routes.py) once per --database URL and
+print each route's latency side by side, with the ratio to the first database.
+
+    sqlite://                               in-memory SQLite
+    sqlite:////tmp/court_connect.db         SQLite file (WAL and the other SQLITE_PROFILE=benchmark pragmas)
+    postgresql:///court_connect_bench       PostgreSQL; the database must exist and is dropped and reseeded
+
+SQLite numbers are for finding regressions quickly and in-process; they say little about production,
+where every statement is a round trip to PostgreSQL. Routes whose statement counts differ between the
+backends are flagged, since the queries themselves should not depend on the database.
+
+Usage: python benchmarks/backends.py [--database sqlite://] [--database postgresql:///court_connect_bench]
+                                     [--sizes 10,1000] [--requests 100] [--output comparison.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_DATABASES = ["sqlite://", "sqlite:////tmp/court_connect_backends_bench.db"]
+
+
+def run_routes(database, args):
+    """Run benchmarks/routes.py against one database and return its results."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "results.json")
+        env = dict(
+            os.environ,
+            DATABASE_URL=database,
+            SQLITE_PROFILE=args.sqlite_profile,
+            SCHEMA_CHECK="off",
+            SECRET_KEY=os.environ.get("SECRET_KEY", "bench"),
+        )
+        command = [
+            sys.executable,
+            os.path.join(ROOT, "benchmarks", "routes.py"),
+            "--sizes", args.sizes,
+            "--requests", str(args.requests),
+            "--login-requests", str(args.login_requests),
+            "--rounds", str(args.rounds),
+            "--output", output,
+        ]
+        subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(output) as results:
+            return json.load(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", action="append", help="database URL to benchmark; repeat to compare")
+    parser.add_argument("--sizes", default="10,1000", help="comma-separated saved court counts, one user each")
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per route")
+    parser.add_argument("--login-requests", type=int, default=10, help="timed logins (each pays for bcrypt)")
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost of the seeded passwords")
+    parser.add_argument("--sqlite-profile", default="benchmark", help="SQLITE_PROFILE for SQLite databases")
+    parser.add_argument("--output", help="write every database's results as JSON to this file")
+    args = parser.parse_args()
+
+    databases = args.database or DEFAULT_DATABASES
+    runs = {}
+    for database in databases:
+        print(f"Benchmarking {database}")
+        runs[database] = run_routes(database, args)
+
+    rows = {}
+    for database, run in runs.items():
+        for row in run["results"]:
+            rows.setdefault((row["route"], row["courts"]), {})[database] = row
+
+    first = databases[0]
+    header = "".join(f"  {f'p50 ms [{i}]':>11}  {f'p95 ms [{i}]':>11}" for i in range(len(databases)))
+    print()
+    for i, database in enumerate(databases):
+        print(f"[{i}] {database} ({runs[database]['database']})")
+    print(f"\n{'route':<34} {'courts':>8}{header}  {'p95 ratio':>10}")
+    for (route, courts), by_database in rows.items():
+        line = f"{route:<34} {courts:>8,}"
+        for database in databases:
+            row = by_database.get(database)
+            line += f"  {row['p50_ms']:11.2f}  {row['p95_ms']:11.2f}" if row else f"  {'-':>11}  {'-':>11}"
+        ratios = [
+            by_database[database]["p95_ms"] / by_database[first]["p95_ms"]
+            for database in databases[1:]
+            if database in by_database and first in by_database and by_database[first]["p95_ms"]
+        ]
+        line += f"  {' '.join(f'{ratio:.2f}x' for ratio in ratios):>10}"
+        statements = {round(row["statements_per_request"]) for row in by_database.values()}
+        if len(statements) > 1:
+            line += "  STATEMENTS DIFFER"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(runs, output, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measure app cold-start time under each SCHEMA_CHECK mode.
+
+Each run imports app.py in a fresh interpreter and reports how long the import took and how many SQL
+statements it sent. --rtt-ms adds a sleep before every statement (and three before every new connection,
+for the TCP + TLS handshake) to stand in for a remote database such as a serverless Postgres.
+
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file that is migrated first.
+Under SQLite the connections use SQLITE_PROFILE=benchmark: WAL mode and the other tuned pragmas.
+
+Usage: python benchmarks/cold_start.py [--runs 10] [--rtt-ms 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/court_connect_cold_start_bench.db")
+os.environ.setdefault("SQLITE_PROFILE", "benchmark")
+
+MODES = ("create", "version", "off")
+
+# Runs in each child interpreter: count (and delay) statements, then time the import of app.py.
+CHILD = """
+import json, sys, time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+rtt = float(sys.argv[1]) / 1000
+statements = 0
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(*args):
+    global statements
+    statements += 1
+    time.sleep(rtt)
+
+@event.listens_for(Pool, "connect")
+def connect(*args):
+    time.sleep(rtt * 3)
+
+start = time.perf_counter()
+import app
+print(json.dumps({"seconds": time.perf_counter() - start, "statements": statements}))
+"""
+
+
+def cold_start(mode, rtt_ms):
+    env = dict(os.environ, SCHEMA_CHECK=mode, SECRET_KEY=os.environ.get("SECRET_KEY", "bench"))
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, str(rtt_ms)], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=20, help="simulated database round trip in milliseconds")
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "schema.py"], cwd=ROOT, check=True, capture_output=True)
+
+    print(f"{args.runs} cold starts per mode, simulated round trip {args.rtt_ms:g} ms")
+    for mode in MODES:
+        runs = [cold_start(mode, args.rtt_ms) for _ in range(args.runs)]
+        seconds = [run["seconds"] * 1000 for run in runs]
+        print(
+            f"SCHEMA_CHECK={mode:<8} import median {statistics.median(seconds):7.1f} ms"
+            f"  (min {min(seconds):.1f}, max {max(seconds):.1f})  {runs[0]['statements']} statements"
+        )
+
+
+if __name__ == "__main__":
+    main()
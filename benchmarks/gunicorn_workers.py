@@ -0,0 +1,86 @@
+"""
+Compare gunicorn worker start time and memory with and without preloading the app.
+
+Starts gunicorn with gunicorn.conf.py twice (GUNICORN_PRELOAD=0 and 1), waits for every worker to log that
+it is ready, and reports how long each worker took from fork to ready plus its proportional (PSS) and
+private memory from /proc/<pid>/smaps_rollup. Linux only.
+
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file that is migrated first.
+Under SQLite the connections use SQLITE_PROFILE=benchmark: WAL mode and the other tuned pragmas.
+
+Usage: python benchmarks/gunicorn_workers.py [--workers 4]
+"""
+
+import argparse
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/court_connect_gunicorn_bench.db")
+os.environ.setdefault("SQLITE_PROFILE", "benchmark")
+
+READY = re.compile(r"Worker (\d+) ready in ([\d.]+) ms")
+
+
+def memory_kb(pid):
+    """(Pss, Private_Clean + Private_Dirty) of a process in kB."""
+
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def run(workers, preload, port):
+    env = dict(
+        os.environ,
+        GUNICORN_PRELOAD="1" if preload else "0",
+        WEB_CONCURRENCY=str(workers),
+        PORT=str(port),
+        SECRET_KEY=os.environ.get("SECRET_KEY", "bench"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn"], cwd=ROOT, env=env, stderr=subprocess.PIPE, text=True
+    )
+    ready = {}
+    try:
+        for line in server.stderr:
+            match = READY.search(line)
+            if match:
+                ready[int(match.group(1))] = float(match.group(2))
+                if len(ready) == workers:
+                    break
+        return ready, {pid: memory_kb(pid) for pid in ready}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "schema.py"], cwd=ROOT, check=True, capture_output=True)
+
+    print(f"{args.workers} sync workers")
+    for preload in (False, True):
+        ready, memory = run(args.workers, preload, args.port)
+        pss = [kb[0] / 1024 for kb in memory.values()]
+        private = [kb[1] / 1024 for kb in memory.values()]
+        print(f"\npreload_app={preload}:")
+        print(f"  worker fork -> ready:  median {statistics.median(ready.values()):.1f} ms, max {max(ready.values()):.1f} ms")
+        print(f"  worker PSS:            mean {statistics.mean(pss):.1f} MiB")
+        print(f"  worker private memory: mean {statistics.mean(private):.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
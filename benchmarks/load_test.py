@@ -0,0 +1,321 @@
+"""
+Load test: replay the user journey with many concurrent virtual users against a running gunicorn.
+
+Each virtual user logs in as its own account and loops through the journey until --duration is up:
+
+    login          GET /login, POST /login
+    search         GET /search, GET /geocode, GET /places/search, GET /saved_court_ids, GET /places/ratings
+    toggles        --toggles POST /save_court or /remove_court clicks on search results
+    paging         GET /users/<username>/saved_courts, following Next for up to --pages pages
+    ratings        --ratings POST /update_court_rating clicks
+    logout         GET /logout
+
+Throughput, latency percentiles and error rate are reported per step. Nothing leaves the machine: with
+--start-server the server is started with PLACES_PROVIDER=fixture (recorded search results from
+benchmarks/fixtures/places.json, in the shape search.js consumes) and GEOCODER=stub, and the login
+throttle opened up, since every virtual user logs in from 127.0.0.1. Against a server you started
+yourself, set those the same way (LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE, LOGIN_USERNAME_BURST,
+LOGIN_USERNAME_PER_MINUTE) and pass --seed to create the accounts.
+
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file that is migrated first.
+Under SQLite the connections use SQLITE_PROFILE=benchmark: WAL mode and the other tuned pragmas.
+
+Usage: python benchmarks/load_test.py --start-server [--users 20] [--duration 60] [--workers 4]
+       python benchmarks/load_test.py --url http://127.0.0.1:5000 --seed [--users 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/court_connect_load_test.db")
+os.environ.setdefault("SQLITE_PROFILE", "benchmark")
+os.environ.setdefault("SCHEMA_CHECK", "off")
+
+FIXTURE = os.path.join(ROOT, "benchmarks", "fixtures", "places.json")
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+NEXT_PAGE = re.compile(r'href="([^"]+)" aria-label="Next"')
+PASSWORD = "password"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class StepStats:
+    """Latencies and errors per journey step, shared by every virtual user."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.journeys = 0
+        self._lock = threading.Lock()
+
+    def record(self, step, seconds, ok):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+
+    def journey_done(self):
+        with self._lock:
+            self.journeys += 1
+
+    def report(self, elapsed):
+        rows = []
+        for step, latencies in self.latencies.items():
+            rows.append(
+                {
+                    "step": step,
+                    "requests": len(latencies),
+                    "per_second": len(latencies) / elapsed,
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "max_ms": max(latencies) * 1000,
+                    "error_rate": self.errors[step] / len(latencies),
+                }
+            )
+        return rows
+
+
+class VirtualUser(threading.Thread):
+    """One user's browser: a cookie session that loops through the journey."""
+
+    def __init__(self, index, args, areas, stats, stop):
+        super().__init__(daemon=True)
+        self.username = f"loadtest{index}"
+        self.args = args
+        self.areas = areas
+        self.stats = stats
+        self.stop = stop
+        self.rng = random.Random(index)
+        self.url = args.url.rstrip("/")
+        self.session = requests.Session()
+
+    def request(self, step, method, path, expect=(200,), **kwargs):
+        """Make one request as part of `step`, timing it. Returns the response, or None if it failed."""
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.url + path, allow_redirects=False, timeout=self.args.timeout, **kwargs
+            )
+        except requests.RequestException:
+            self.stats.record(step, time.perf_counter() - start, ok=False)
+            return None
+        ok = response.status_code in expect
+        self.stats.record(step, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def think(self):
+        if self.args.think_ms:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.args.think_ms / 1000)
+
+    def run(self):
+        while not self.stop.is_set():
+            self.journey()
+            self.stats.journey_done()
+
+    def journey(self):
+        form = self.request("login page", "GET", "/login")
+        token = CSRF_TOKEN.search(form.text) if form is not None else None
+        if token is None:
+            return
+        data = {"csrf_token": token.group(1), "username": self.username, "password": PASSWORD}
+        if self.request("login", "POST", "/login", expect=(302,), data=data) is None:
+            return
+        self.think()
+
+        self.request("search page", "GET", "/search")
+        area = self.rng.choice(self.areas)
+        self.request("geocode", "GET", "/geocode", params={"query": area["name"]})
+        # The stub geocoder's point is arbitrary, so search around the area's center, as if the user
+        # had panned the map there.
+        center = area["center"]
+        found = self.request("places search", "GET", "/places/search", params=center)
+        saved = self.request("saved court ids", "GET", "/saved_court_ids")
+        places = found.json()["places"] if found is not None else []
+        saved_ids = saved.json() if saved is not None else {}
+        if places:
+            self.request("place ratings", "GET", "/places/ratings", params={"place_id": [p["id"] for p in places]})
+        self.think()
+
+        for _ in range(self.args.toggles if places else 0):
+            place = self.rng.choice(places)
+            if place["id"] in saved_ids:
+                court_id = saved_ids.pop(place["id"])
+                self.request("remove court", "POST", "/remove_court", json={"court_id": court_id})
+            else:
+                court = {
+                    "court_name": place["displayName"],
+                    "google_maps_place_id": place["id"],
+                    "address": place["formattedAddress"],
+                    "google_maps_url": place["googleMapsURI"],
+                    "lat": place["location"]["lat"],
+                    "lng": place["location"]["lng"],
+                }
+                response = self.request("save court", "POST", "/save_court", expect=(200, 201), json=court)
+                if response is not None:
+                    saved_ids[place["id"]] = response.json()["id"]
+        self.think()
+
+        path = f"/users/{self.username}/saved_courts"
+        for _ in range(self.args.pages):
+            page = self.request("saved courts page", "GET", path)
+            next_link = NEXT_PAGE.search(page.text) if page is not None else None
+            if next_link is None:
+                break
+            path = next_link.group(1).replace("&amp;", "&")
+        self.think()
+
+        court_ids = list(saved_ids.values())
+        for _ in range(self.args.ratings if court_ids else 0):
+            rating = {"court_id": self.rng.choice(court_ids), "rating": self.rng.randint(0, 5)}
+            self.request("rate court", "POST", "/update_court_rating", json=rating)
+
+        self.request("logout", "GET", "/logout", expect=(302,))
+
+
+def seed_users(users, rounds):
+    """Create the virtual users' accounts that don't exist yet, sharing one password hash at `rounds`."""
+
+    from app import app
+    from models import db, User, password_hasher
+
+    with app.app_context():
+        existing = set(db.session.scalars(db.select(User.username).where(User.username.like("loadtest%"))))
+        password_hasher.rounds = rounds
+        hashed = password_hasher.hash(PASSWORD)
+        db.session.add_all(
+            User(
+                username=f"loadtest{i}",
+                password=hashed,
+                email=f"loadtest{i}@example.com",
+                first_name="Load",
+                last_name="Test",
+                location="Brooklyn, NY",
+            )
+            for i in range(users)
+            if f"loadtest{i}" not in existing
+        )
+        db.session.commit()
+
+
+def start_server(args):
+    """Start gunicorn (gunicorn.conf.py) fully offline and wait until it answers."""
+
+    wide_open = "1000000"
+    env = dict(
+        os.environ,
+        SECRET_KEY=os.environ.get("SECRET_KEY", "load-test"),
+        WEB_CONCURRENCY=str(args.workers),
+        PORT=args.url.rsplit(":", 1)[-1].strip("/"),
+        PLACES_PROVIDER="fixture",
+        PLACES_FIXTURE=FIXTURE,
+        GEOCODER="stub",
+        BCRYPT_LOG_ROUNDS=str(args.rounds),
+        LOGIN_IP_BURST=wide_open,
+        LOGIN_IP_PER_MINUTE=wide_open,
+        LOGIN_USERNAME_BURST=wide_open,
+        LOGIN_USERNAME_PER_MINUTE=wide_open,
+    )
+    env.pop("SCHEMA_CHECK", None)
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn"], cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(args.url + "/login", timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("gunicorn did not start within 30 seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5060")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run for")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds over which the users start")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between journey steps")
+    parser.add_argument("--toggles", type=int, default=5, help="save/remove clicks per journey")
+    parser.add_argument("--pages", type=int, default=3, help="saved courts pages per journey")
+    parser.add_argument("--ratings", type=int, default=3, help="rating clicks per journey")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument("--start-server", action="store_true", help="migrate, seed and start gunicorn offline")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers with --start-server")
+    parser.add_argument("--seed", action="store_true", help="create the virtual users' accounts in DATABASE_URL")
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost of the seeded passwords")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with open(FIXTURE) as fixture:
+        areas = json.load(fixture)["areas"]
+
+    server = None
+    if args.start_server:
+        subprocess.run([sys.executable, "schema.py"], cwd=ROOT, check=True, capture_output=True)
+    if args.start_server or args.seed:
+        seed_users(args.users, args.rounds)
+    if args.start_server:
+        server = start_server(args)
+
+    stats = StepStats()
+    stop = threading.Event()
+    users = [VirtualUser(i, args, areas, stats, stop) for i in range(args.users)]
+    try:
+        print(f"{args.users} virtual users against {args.url} for {args.duration:g}s")
+        start = time.perf_counter()
+        for user in users:
+            user.start()
+            time.sleep(args.ramp_up / args.users)
+        stop.wait(max(0.0, args.duration - (time.perf_counter() - start)))
+        stop.set()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+    rows = stats.report(elapsed)
+    total = sum(row["requests"] for row in rows)
+    errors = sum(row["error_rate"] * row["requests"] for row in rows)
+    columns = ("requests", "req/s", "p50 ms", "p95 ms", "p99 ms", "max ms")
+    print(f"\n{'step':<20} " + " ".join(f"{column:>8}" for column in columns) + f" {'errors':>7}")
+    for row in rows:
+        print(
+            f"{row['step']:<20} {row['requests']:>8} {row['per_second']:8.1f} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f}"
+            f" {row['p99_ms']:8.1f} {row['max_ms']:8.1f} {row['error_rate']:7.1%}"
+        )
+    print(
+        f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, {stats.journeys / elapsed:.2f} journeys/s,"
+        f" {errors / total if total else 0:.1%} errors"
+    )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(
+                {"users": args.users, "duration": elapsed, "journeys": stats.journeys, "steps": rows}, output, indent=2
+            )
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark login throughput and latency under concurrent logins.
+
+Seeds users whose passwords are hashed at --rounds, then fires --logins POST /login requests from
+--threads client threads through the Flask test client, while one more thread keeps requesting a
+cheap page (GET /login) to show how much the login burst slows everything else down. The run is
+repeated with hashing effectively unbounded (one hashing thread per client) and with the bounded
+pool (--workers hashing threads), and logins/second plus latency percentiles are reported for both.
+
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file so it works without a database server.
+Under SQLite the connections use SQLITE_PROFILE=benchmark: WAL mode and the other tuned pragmas.
+
+Usage: python benchmarks/login_throughput.py [--logins 200] [--threads 16] [--workers 2] [--rounds 12]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/court_connect_login_bench.db")
+os.environ.setdefault("SQLITE_PROFILE", "benchmark")
+os.environ.setdefault("SCHEMA_CHECK", "off")
+
+from app import app, login_throttle
+from models import db, User, password_hasher
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(users, rounds):
+    """Create `users` users sharing one password hash at `rounds` (hashed once to keep seeding fast)."""
+
+    db.drop_all()
+    db.create_all()
+    password_hasher.rounds = rounds
+    hashed = password_hasher.hash("password")
+    db.session.add_all(
+        User(
+            username=f"loginbench{i}",
+            password=hashed,
+            email=f"loginbench{i}@example.com",
+            first_name="Login",
+            last_name="Bench",
+        )
+        for i in range(users)
+    )
+    db.session.commit()
+
+
+def run(logins, threads, users):
+    """Fire the login burst plus the background page requests. Returns (elapsed, login latencies, page latencies)."""
+
+    done = threading.Event()
+    page_latencies = []
+
+    def background_pages():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get("/login")
+            page_latencies.append(time.perf_counter() - start)
+
+    def timed_login(i):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post("/login", data={"username": f"loginbench{i % users}", "password": "password"})
+        assert response.status_code == 302, response.status_code
+        return time.perf_counter() - start
+
+    background = threading.Thread(target=background_pages)
+    background.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        login_latencies = list(pool.map(timed_login, range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    background.join()
+    return elapsed, login_latencies, page_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--workers", type=int, default=2, help="hashing threads in the bounded pool")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost of the seeded passwords")
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    # Every login comes from one client IP here; lift the throttle so it measures hashing alone.
+    login_throttle.per_ip = login_throttle.per_username = (args.logins, args.logins)
+    with app.app_context():
+        seed(args.users, args.rounds)
+
+    print(f"{args.logins} logins from {args.threads} threads at bcrypt cost {args.rounds}, {os.cpu_count()} CPUs")
+    for label, workers in (("unbounded", args.threads), (f"pool of {args.workers}", args.workers)):
+        password_hasher._pool.shutdown(wait=True)
+        password_hasher._configure_pool(workers, max(args.threads, workers))
+        login_throttle.clear()
+
+        elapsed, logins, pages = run(args.logins, args.threads, args.users)
+        print(f"\n{label}:")
+        print(f"  logins/second:       {args.logins / elapsed:.1f}")
+        print(f"  login p50 / p95:     {percentile(logins, 50) * 1000:.0f} / {percentile(logins, 95) * 1000:.0f} ms")
+        print(f"  page p50 / p95:      {percentile(pages, 50) * 1000:.1f} / {percentile(pages, 95) * 1000:.1f} ms")
+        print(f"  page mean:           {statistics.mean(pages) * 1000:.1f} ms over {len(pages)} requests")
+
+
+if __name__ == "__main__":
+    main()
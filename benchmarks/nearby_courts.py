@@ -0,0 +1,139 @@
+"""
+Benchmark /courts/nearby candidate selection against a brute-force scan.
+
+Seeds a synthetic dataset of saved courts (1M by default) scattered over the continental US for one
+user, then times SavedCourt.nearby (geohash-pruned candidates + vectorized haversine) against loading
+every one of the user's court coordinates and computing all distances.
+
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file so it works without a database server.
+Under SQLite the connections use SQLITE_PROFILE=benchmark: WAL mode and the other tuned pragmas.
+
+Usage: python benchmarks/nearby_courts.py [--courts 1000000] [--queries 50] [--radius 5000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/court_connect_nearby_bench.db")
+os.environ.setdefault("SQLITE_PROFILE", "benchmark")
+os.environ.setdefault("SCHEMA_CHECK", "off")
+
+from app import app
+from models import db, User, Place, SavedCourt
+from geo import geohash_encode, haversine_m
+from models import GEOHASH_PRECISION
+
+BATCH_SIZE = 50000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(total, rng):
+    """Create the benchmark user and `total` saved courts with locations, using bulk inserts."""
+
+    db.drop_all()
+    db.create_all()
+    user = User(
+        username="nearbybench",
+        password="x",
+        email="nearbybench@example.com",
+        first_name="Nearby",
+        last_name="Bench",
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    for start in range(0, total, BATCH_SIZE):
+        places = []
+        saved = []
+        for i in range(start, min(start + BATCH_SIZE, total)):
+            lat = rng.uniform(25.0, 49.0)
+            lng = rng.uniform(-124.0, -67.0)
+            place_id = f"bench-{i}"
+            places.append(
+                {
+                    "id": place_id,
+                    "name": f"Bench Court {i}",
+                    "address": f"{i} Bench St",
+                    "google_maps_url": f"https://maps.google.com/?q=place_id:{place_id}",
+                    "lat": lat,
+                    "lng": lng,
+                    "geohash": geohash_encode(lat, lng, GEOHASH_PRECISION),
+                }
+            )
+            saved.append({"user_id": user.id, "place_id": place_id, "user_rating": None})
+        db.session.execute(Place.__table__.insert(), places)
+        db.session.execute(SavedCourt.__table__.insert(), saved)
+        db.session.commit()
+        print(f"  seeded {min(start + BATCH_SIZE, total):,} courts", end="\r")
+    print()
+
+    # Refresh planner statistics (autovacuum does this on PostgreSQL) so the geohash index is chosen.
+    db.session.execute(db.text("ANALYZE"))
+    db.session.commit()
+    return user.id
+
+
+def brute_force(user_id, lat, lng, radius):
+    """Load every saved court's coordinates for the user and filter by exact distance."""
+    rows = db.session.execute(
+        db.select(SavedCourt.id, Place.lat, Place.lng)
+        .join(Place, SavedCourt.place_id == Place.id)
+        .where(SavedCourt.user_id == user_id)
+    ).all()
+    ids, lats, lngs = zip(*rows)
+    distances = haversine_m(lat, lng, lats, lngs)
+    return sorted((d, court_id) for court_id, d in zip(ids, distances) if d <= radius)
+
+
+def time_queries(label, fn, centers):
+    latencies = []
+    for lat, lng in centers:
+        start = time.perf_counter()
+        fn(lat, lng)
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{label:<22} p50 {percentile(latencies, 50) * 1000:9.2f} ms   "
+        f"p95 {percentile(latencies, 95) * 1000:9.2f} ms   "
+        f"p99 {percentile(latencies, 99) * 1000:9.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courts", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--radius", type=float, default=5000)
+    parser.add_argument("--brute-force-queries", type=int, default=5, help="brute force is slow, so run it fewer times")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        print(f"Seeding {args.courts:,} saved courts into {db.engine.url}")
+        start = time.perf_counter()
+        user_id = seed(args.courts, rng)
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+        centers = [(rng.uniform(25.0, 49.0), rng.uniform(-124.0, -67.0)) for _ in range(args.queries)]
+        found = [len(SavedCourt.nearby(user_id, lat, lng, args.radius, limit=None)) for lat, lng in centers[:5]]
+        expected = [len(brute_force(user_id, lat, lng, args.radius)) for lat, lng in centers[:5]]
+        assert found == expected, f"nearby returned {found}, brute force found {expected}"
+
+        time_queries("geohash + haversine", lambda lat, lng: SavedCourt.nearby(user_id, lat, lng, args.radius), centers)
+        time_queries(
+            "brute force scan",
+            lambda lat, lng: brute_force(user_id, lat, lng, args.radius),
+            centers[: args.brute_force_queries],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the server-side places search cache offline.
+
+Replays searches clustered around a handful of cities against StubPlacesProvider (which sleeps to
+stand in for the Google round trip) from several threads, and reports the cache hit rate, how many
+upstream calls were made or collapsed, and per-search latency percentiles.
+
+Usage: python benchmarks/places_cache.py [--searches 2000] [--threads 16] [--latency 0.15]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from places import PlacesSearchCache, StubPlacesProvider, DEFAULT_QUERY
+
+CITIES = [
+    (40.6782, -73.9442),
+    (34.0522, -118.2437),
+    (41.8781, -87.6298),
+    (29.7604, -95.3698),
+    (33.4484, -112.0740),
+    (47.6062, -122.3321),
+    (25.7617, -80.1918),
+    (39.7392, -104.9903),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.15, help="simulated upstream latency in seconds")
+    parser.add_argument("--spread", type=float, default=0.1, help="max degrees a search strays from a city center")
+    parser.add_argument("--precision", type=int, default=5, help="geohash precision of cache cells")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    locations = []
+    for _ in range(args.searches):
+        lat, lng = rng.choice(CITIES)
+        locations.append(
+            (lat + rng.uniform(-args.spread, args.spread), lng + rng.uniform(-args.spread, args.spread))
+        )
+
+    provider = StubPlacesProvider(latency=args.latency)
+    places_search = PlacesSearchCache(provider, precision=args.precision)
+
+    def timed_search(location):
+        start = time.perf_counter()
+        places_search.search(DEFAULT_QUERY, *location)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = list(pool.map(timed_search, locations))
+    elapsed = time.perf_counter() - start
+
+    stats = places_search.stats()
+    uncached_seconds = args.searches * args.latency
+    print(f"searches:        {args.searches} over {args.threads} threads in {elapsed:.2f}s")
+    print(f"upstream calls:  {stats['upstream_calls']} ({stats['collapsed']} concurrent misses collapsed)")
+    served_from_cache = args.searches - stats["upstream_calls"] - stats["collapsed"]
+    print(f"cache hit rate:  {served_from_cache / args.searches:.1%} ({served_from_cache} searches served from cache)")
+    print(f"latency p50:     {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"latency p95:     {percentile(latencies, 95) * 1000:.2f} ms")
+    print(f"latency p99:     {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"latency mean:    {statistics.mean(latencies) * 1000:.2f} ms")
+    print(f"upstream time saved vs. no cache: {uncached_seconds - stats['upstream_calls'] * args.latency:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
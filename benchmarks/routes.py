@@ -0,0 +1,302 @@
+"""
+Benchmark the key routes against users with small, medium and large collections of saved courts.
+
+Seeds one user per --sizes entry (10, 1k and 100k saved courts by default) with bulk inserts, then times
+each route through the Flask test client for every user:
+
+    GET  /users/<username>/saved_courts          first page, deepest page by number (OFFSET) and by
+                                                 the Next link (keyset)
+    GET  /search
+    POST /save_court, /remove_court, /update_court_rating
+    POST /login                                  (includes the bcrypt verify at --rounds)
+
+and reports p50/p95/p99 latency and SQL statements per request. Results are written as JSON with
+--output; pass an earlier run as --baseline to print the change per route and exit with status 1 if any
+route's p95 grew by more than --threshold or it runs half a statement or more per request than before.
+
+Runs against DATABASE_URL, defaulting to a throwaway SQLite file so it works without a database server.
+Under SQLite the connections use SQLITE_PROFILE=benchmark: WAL mode and the other tuned pragmas.
+
+Usage: python benchmarks/routes.py [--sizes 10,1000,100000] [--requests 200] [--output results.json]
+                                   [--baseline baseline.json] [--threshold 0.2]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/court_connect_routes_bench.db")
+os.environ.setdefault("SQLITE_PROFILE", "benchmark")
+os.environ.setdefault("SCHEMA_CHECK", "off")
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app, SAVED_COURTS_PER_PAGE, clear_caches, login_throttle
+from models import db, User, Place, SavedCourt, PlaceRatingStats, password_hasher
+
+BATCH_SIZE = 50000
+WARMUP_REQUESTS = 5
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class StatementCounter:
+    """Counts SQL statements on every engine."""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def seed(sizes, rounds, rng):
+    """Create a user per size with that many saved courts (about half rated). Returns {size: username}."""
+
+    db.drop_all()
+    db.create_all()
+    password_hasher.rounds = rounds
+    hashed = password_hasher.hash("password")
+
+    usernames = {}
+    for size in sizes:
+        user = User(
+            username=f"routebench{size}",
+            password=hashed,
+            email=f"routebench{size}@example.com",
+            first_name="Route",
+            last_name="Bench",
+        )
+        db.session.add(user)
+        db.session.commit()
+        usernames[size] = user.username
+
+        for start in range(0, size, BATCH_SIZE):
+            places = []
+            saved = []
+            for i in range(start, min(start + BATCH_SIZE, size)):
+                place_id = f"routebench-{size}-{i}"
+                places.append(
+                    {
+                        "id": place_id,
+                        "name": f"Bench Court {i}",
+                        "address": f"{i} Bench St",
+                        "google_maps_url": f"https://maps.google.com/?q=place_id:{place_id}",
+                        **Place.coordinates(rng.uniform(25.0, 49.0), rng.uniform(-124.0, -67.0)),
+                    }
+                )
+                rating = rng.choice([None, rng.randint(0, 5)])
+                saved.append({"user_id": user.id, "place_id": place_id, "user_rating": rating})
+            db.session.execute(Place.__table__.insert(), places)
+            db.session.execute(SavedCourt.__table__.insert(), saved)
+            db.session.commit()
+        print(f"  seeded {size:,} courts for {user.username}")
+
+    PlaceRatingStats.rebuild()
+    db.session.execute(db.text("ANALYZE"))
+    db.session.commit()
+    return usernames
+
+
+def time_requests(counter, requests):
+    """
+    Run each request (a callable returning a response) and return latencies and statements per request.
+    The first WARMUP_REQUESTS are run but not recorded.
+    """
+
+    latencies = []
+    statements = []
+    for i, make_request in enumerate(requests):
+        before = counter.count
+        start = time.perf_counter()
+        response = make_request()
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f"Request failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        if i >= WARMUP_REQUESTS:
+            latencies.append(elapsed)
+            statements.append(counter.count - before)
+    return latencies, statements
+
+
+def logged_in_client(user):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["curr_user"] = user.id
+    return client
+
+
+def benchmark_user(username, size, requests, login_requests, counter, rng):
+    """Time every route for one seeded user. Yields (route, latencies, statements)."""
+
+    user = User.query.filter_by(username=username).one()
+    user_id = user.id
+    client = logged_in_client(user)
+    repeat = requests + WARMUP_REQUESTS
+
+    saved_courts = f"/users/{username}/saved_courts"
+    yield "saved_courts first page", *time_requests(counter, [lambda: client.get(saved_courts)] * repeat)
+
+    last_page = -(-size // SAVED_COURTS_PER_PAGE)
+    if last_page > 1:
+        # The Next link to the last page carries the id of the last court on the page before it.
+        after = db.session.scalar(
+            db.select(SavedCourt.id)
+            .where(SavedCourt.user_id == user_id)
+            .order_by(SavedCourt.id.desc())
+            .offset((last_page - 1) * SAVED_COURTS_PER_PAGE - 1)
+            .limit(1)
+        )
+        deep_offset = f"{saved_courts}?page={last_page}"
+        deep_keyset = f"{saved_courts}?page={last_page}&after={after}"
+        yield "saved_courts deep page (offset)", *time_requests(counter, [lambda: client.get(deep_offset)] * repeat)
+        yield "saved_courts deep page (keyset)", *time_requests(counter, [lambda: client.get(deep_keyset)] * repeat)
+
+    yield "search", *time_requests(counter, [lambda: client.get("/search")] * repeat)
+
+    def save(i):
+        place_id = f"routebench-new-{size}-{i}"
+        return client.post(
+            "/save_court",
+            json={
+                "court_name": f"New Court {i}",
+                "google_maps_place_id": place_id,
+                "address": f"{i} New St",
+                "google_maps_url": f"https://maps.google.com/?q=place_id:{place_id}",
+            },
+        )
+
+    saved_ids = []
+
+    def save_and_remember(i):
+        response = save(i)
+        saved_ids.append(response.get_json()["id"])
+        return response
+
+    yield "save_court", *time_requests(counter, [lambda i=i: save_and_remember(i) for i in range(repeat)])
+    removals = [
+        lambda court_id=court_id: client.post("/remove_court", json={"court_id": court_id}) for court_id in saved_ids
+    ]
+    yield "remove_court", *time_requests(counter, removals)
+
+    court_ids = db.session.scalars(
+        db.select(SavedCourt.id).where(SavedCourt.user_id == user_id).order_by(SavedCourt.id).limit(1000)
+    ).all()
+    ratings = [
+        (lambda court_id=rng.choice(court_ids), rating=rng.randint(0, 5): client.post(
+            "/update_court_rating", json={"court_id": court_id, "rating": rating}
+        ))
+        for _ in range(repeat)
+    ]
+    yield "update_court_rating", *time_requests(counter, ratings)
+
+    def login():
+        # Keep the login throttle out of the measurement: every attempt comes from the same client.
+        login_throttle.clear()
+        return app.test_client().post("/login", data={"username": username, "password": "password"})
+
+    yield "login", *time_requests(counter, [login] * (login_requests + WARMUP_REQUESTS))
+
+
+def compare(results, baseline, threshold):
+    """Print each route's change against the baseline run. Returns the routes that regressed."""
+
+    previous = {(row["route"], row["courts"]): row for row in baseline["results"]}
+    regressions = []
+    print(f"\nAgainst baseline from {baseline['created']} ({baseline['database']}):")
+    for row in results:
+        before = previous.get((row["route"], row["courts"]))
+        if before is None:
+            continue
+        p50_change = row["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        p95_change = row["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        statements_change = row["statements_per_request"] - before["statements_per_request"]
+        # Statement counts of the write routes vary a little with the random courts and ratings picked.
+        regressed = p95_change > threshold or statements_change >= 0.5
+        if regressed:
+            regressions.append(row)
+        print(
+            f"{row['route']:<34} {row['courts']:>8,}  p50 {p50_change:+7.1%}  p95 {p95_change:+7.1%}  "
+            f"statements {statements_change:+5.1f}{'  REGRESSED' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,100000", help="comma-separated saved court counts, one user each")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    parser.add_argument("--login-requests", type=int, default=20, help="timed logins (each pays for bcrypt)")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost of the seeded passwords")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 growth counted as a regression")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    rng = random.Random(args.seed)
+    app.config["WTF_CSRF_ENABLED"] = False
+
+    with app.app_context():
+        print(f"Seeding {', '.join(f'{size:,}' for size in sizes)} saved courts into {db.engine.url}")
+        usernames = seed(sizes, args.rounds, rng)
+        database = db.engine.dialect.name
+        counter = StatementCounter()
+
+        results = []
+        print(f"\n{'route':<34} {'courts':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  statements")
+        for size in sizes:
+            clear_caches()
+            for route, latencies, statements in benchmark_user(
+                usernames[size], size, args.requests, args.login_requests, counter, rng
+            ):
+                row = {
+                    "route": route,
+                    "courts": size,
+                    "requests": len(latencies),
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "statements_per_request": statistics.mean(statements),
+                }
+                results.append(row)
+                print(
+                    f"{route:<34} {size:>8,}  {row['p50_ms']:8.2f}  {row['p95_ms']:8.2f}  {row['p99_ms']:8.2f}"
+                    f"  {row['statements_per_request']:10.1f}"
+                )
+                db.session.remove()
+
+    run = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "database": database,
+        "python": platform.python_version(),
+        "requests": args.requests,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(run, output, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from threading import Lock
+
+from markupsafe import Markup
+
+from cache import TTLCache
+
+
+class FragmentCache:
+    """
+    Rendered template fragments (a court card, a profile body), kept per process.
+
+    Each fragment is stored under a key naming what it shows, such as ("court_card", court_id), together
+    with the version of the data it was rendered from: a tuple of every value the template reads. A
+    lookup whose version differs is a miss and the fragment is rendered again, so a worker never serves a
+    fragment another worker's write made stale. evict() drops a fragment as soon as this worker changes
+    its data, instead of leaving it to the TTL and LRU eviction.
+
+    Hits and misses are counted per fragment template and reported to `on_lookup(template, hit)`.
+    """
+
+    def __init__(self, environment, maxsize=4096, ttl=3600, on_lookup=None):
+        self.environment = environment
+        self.on_lookup = on_lookup
+        self.evictions = 0
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counts = {}
+        self._lock = Lock()
+
+    def render(self, key, version, template_name, **context):
+        """Return the fragment for key, rendering template_name with context if it isn't cached at version."""
+
+        entry = self._cache.get(key)
+        hit = entry is not None and entry[0] == version
+        self._count(template_name, hit)
+        if hit:
+            return entry[1]
+
+        html = Markup(self.environment.get_template(template_name).render(context))
+        self._cache.set(key, (version, html))
+        return html
+
+    def evict(self, *keys):
+        for key in keys:
+            if self._cache.pop(key) is not None:
+                with self._lock:
+                    self.evictions += 1
+
+    def _count(self, template_name, hit):
+        with self._lock:
+            counts = self._counts.setdefault(template_name, [0, 0])
+            counts[0 if hit else 1] += 1
+        if self.on_lookup is not None:
+            self.on_lookup(template_name, hit)
+
+    def clear(self):
+        """Remove every fragment and reset the counters."""
+
+        self._cache.clear()
+        with self._lock:
+            self._counts.clear()
+            self.evictions = 0
+
+    def stats(self):
+        """Size, evictions, and hits, misses and hit rate per fragment template."""
+
+        with self._lock:
+            templates = {
+                name: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+                for name, (hits, misses) in self._counts.items()
+            }
+            evictions = self.evictions
+        return {"size": len(self._cache), "evictions": evictions, "templates": templates}
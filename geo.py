@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat, lng, precision=5):
+    """Encode a latitude/longitude as a geohash string of the given length."""
+
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    use_lng = True
+
+    while len(geohash) < precision:
+        value, value_range = (lng, lng_range) if use_lng else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            value_range[0] = mid
+        else:
+            value_range[1] = mid
+        use_lng = not use_lng
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def geohash_decode(geohash):
+    """Return the (lat, lng) center of a geohash cell."""
+
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    use_lng = True
+
+    for char in geohash:
+        bits = GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lng_range if use_lng else lat_range
+            mid = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = mid
+            else:
+                value_range[1] = mid
+            use_lng = not use_lng
+
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def geohash_cell_size(precision):
+    """Return the (lat, lng) span in degrees of a geohash cell at the given precision."""
+    bits = 5 * precision
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lng_bits
+
+
+def geohash_cells_covering(lat, lng, radius_m, max_precision=9):
+    """
+    Return the geohash cells (as prefixes) that together cover a circle of radius_m around (lat, lng).
+
+    Picks the finest precision whose cells are at least radius_m on each side, so the cell containing
+    the center plus its 8 neighbors always contain the whole circle.
+    """
+
+    precision = 1
+    for candidate in range(max_precision, 0, -1):
+        lat_span, lng_span = geohash_cell_size(candidate)
+        lat_span_m = math.radians(lat_span) * EARTH_RADIUS_M
+        lng_span_m = math.radians(lng_span) * EARTH_RADIUS_M * math.cos(math.radians(min(abs(lat) + lat_span, 90)))
+        if min(lat_span_m, lng_span_m) >= radius_m:
+            precision = candidate
+            break
+
+    lat_span, lng_span = geohash_cell_size(precision)
+    cells = set()
+    for d_lat in (-lat_span, 0, lat_span):
+        for d_lng in (-lng_span, 0, lng_span):
+            cell_lat = min(max(lat + d_lat, -90.0), 90.0)
+            cell_lng = (lng + d_lng + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(cell_lat, cell_lng, precision))
+    return sorted(cells)
+
+
+def geohash_prefix_upper_bound(prefix):
+    """
+    Return the smallest geohash greater than every geohash starting with prefix (None if there is none).
+
+    `prefix <= geohash < upper bound` matches the same rows as `geohash LIKE 'prefix%'`, but as a plain range
+    it can use an ordinary btree index on any database.
+    """
+
+    chars = list(prefix)
+    while chars:
+        position = GEOHASH_BASE32.index(chars[-1])
+        if position + 1 < len(GEOHASH_BASE32):
+            chars[-1] = GEOHASH_BASE32[position + 1]
+            return "".join(chars)
+        chars.pop()
+    return None
+
+
+def haversine_m(lat, lng, lats, lngs):
+    """Great-circle distances in meters from (lat, lng) to every point in the lats/lngs arrays, vectorized with numpy."""
+
+    lat1 = math.radians(lat)
+    lats = np.radians(np.asarray(lats, dtype=float))
+    d_lat = lats - lat1
+    d_lng = np.radians(np.asarray(lngs, dtype=float) - lng)
+    a = np.sin(d_lat / 2) ** 2 + math.cos(lat1) * np.cos(lats) * np.sin(d_lng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
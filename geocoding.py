@@ -0,0 +1,91 @@
+from abc import ABC, abstractmethod
+
+import requests
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+
+def normalize_query(query):
+    """Lowercase a search term and collapse its whitespace so equivalent searches share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+class GeocodingError(Exception):
+    """Raised when a geocoder cannot complete a lookup (as opposed to finding no results)."""
+
+
+class GeocodingQuotaExceeded(GeocodingError):
+    """Raised when the Geocoding API reports that its request quota is used up."""
+
+
+class Geocoder(ABC):
+    """
+    Interface for geocoding backends.
+
+    geocode returns {"formatted_address", "lat", "lng"} for the best match, or None when nothing matches.
+    """
+
+    @abstractmethod
+    def geocode(self, query):
+        """Geocode a search term (see above for the result)."""
+
+
+class GoogleGeocoder(Geocoder):
+    """Geocoding through the Google Geocoding web service."""
+
+    def __init__(self, api_key, timeout=10):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def geocode(self, query):
+        if not self.api_key:
+            raise GeocodingError("No Google Maps API key configured")
+
+        try:
+            response = self.session.get(
+                GEOCODE_URL, params={"address": query, "key": self.api_key}, timeout=self.timeout
+            )
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise GeocodingError(str(e)) from e
+
+        if data.get("status") == "ZERO_RESULTS":
+            return None
+        if data.get("status") == "OVER_QUERY_LIMIT":
+            raise GeocodingQuotaExceeded(data.get("error_message", ""))
+        if data.get("status") != "OK":
+            raise GeocodingError(f"Geocoding returned {data.get('status')}: {data.get('error_message', '')}")
+
+        result = data["results"][0]
+        return {
+            "formatted_address": result["formatted_address"],
+            "lat": result["geometry"]["location"]["lat"],
+            "lng": result["geometry"]["location"]["lng"],
+        }
+
+
+class StubGeocoder(Geocoder):
+    """Offline geocoder that maps every query to a fixed point derived from its text."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def geocode(self, query):
+        self.calls += 1
+        seed = sum(ord(char) for char in query)
+        return {
+            "formatted_address": f"{query.title()}, USA",
+            "lat": 25 + seed % 24,
+            "lng": -70 - seed % 50,
+        }
+
+
+def create_geocoder(name, api_key=None):
+    """Build the geocoder named in config: "google" (default) or "stub" for offline use."""
+
+    if name == "stub":
+        return StubGeocoder()
+    if name == "google":
+        return GoogleGeocoder(api_key)
+    raise ValueError(f"Unknown geocoder: {name}")
@@ -0,0 +1,81 @@
+"""
+Gunicorn settings, picked up automatically when gunicorn is started from the project root:
+
+    gunicorn
+
+The app is imported once in the master (preload_app) and forked into the workers, so the workers share
+its memory copy-on-write and start serving without importing anything or compiling templates themselves.
+Database connections must never be shared across a fork: the master closes its pool before forking, and
+each worker throws away whatever it inherited and opens its own connections.
+
+Workers are threaded (gthread): a request waiting on bcrypt in the password hashing pool ties up one of the
+worker's threads, not the whole worker, and the rest keep serving pages. Password hashing is capped per worker
+by PASSWORD_HASH_MAX_PENDING, which should stay below GUNICORN_THREADS so logins can never take every thread.
+
+Code changes need a full restart with preloading on; set GUNICORN_PRELOAD=0 to load the app per worker.
+"""
+
+import gc
+import os
+import time
+
+wsgi_app = "app:app"
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Connections each worker opens as soon as it is forked, so its first requests don't pay for the connect.
+pool_warm_connections = int(os.getenv("DB_POOL_WARM_CONNECTIONS", 1))
+
+
+def _engine():
+    from app import app
+    from models import db
+
+    with app.app_context():
+        return db.engine
+
+
+def _load_templates():
+    """Compile every template (or load it from the bytecode cache) into the app's Jinja environment."""
+
+    from app import app
+
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        app.jinja_env.get_template(name)
+
+
+def when_ready(server):
+    """In the master, before any worker is forked: close its connections and freeze what it has loaded."""
+
+    if preload_app:
+        _engine().dispose()
+        # Workers inherit the compiled templates instead of each compiling them on its first requests.
+        _load_templates()
+        # Keep the cyclic GC out of the preloaded objects, so workers don't copy pages just by collecting.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """In each new worker: drop the inherited pool without closing the master's sockets, then warm our own."""
+
+    worker.forked_at = time.perf_counter()
+    engine = _engine()
+    engine.dispose(close=False)
+    if os.getenv("DB_POOL_PROFILE") == "pgbouncer":
+        # No pool to warm: every checkout opens its own connection through the external pooler.
+        return
+
+    try:
+        connections = [engine.connect() for _ in range(pool_warm_connections)]
+    except Exception as e:
+        server.log.warning(f"Could not warm the connection pool: {e}")
+        return
+    for connection in connections:
+        connection.close()
+
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} ready in {(time.perf_counter() - worker.forked_at) * 1000:.1f} ms")
@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool already has as many hashes running and queued as it allows."""
+
+
+def hash_rounds(hashed):
+    """The cost factor stored in a bcrypt hash ("$2b$12$..." -> 12), or None if it isn't a bcrypt hash."""
+
+    parts = hashed.split("$")
+    if len(parts) != 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def calibrate_rounds(target_ms, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS, timer=time.perf_counter):
+    """
+    Return the highest bcrypt cost whose hash takes no longer than target_ms on this machine.
+
+    Each extra round doubles the work, so one hash is timed at min_rounds and the rest are extrapolated.
+    Never returns less than min_rounds, even on a machine too slow to meet the target.
+    """
+
+    start = timer()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(min_rounds))
+    elapsed_ms = (timer() - start) * 1000
+
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification run on a small bounded thread pool.
+
+    The calling request thread waits for its hash, so this only helps with threaded workers (gunicorn.conf.py
+    runs gthread): bcrypt releases the GIL, so the worker's other threads keep serving while at most
+    `max_workers` hashes compete for CPU. At most `max_pending` hashes may be running or waiting; beyond that
+    PasswordHasherBusy is raised right away rather than letting a burst of logins take every thread.
+
+    Configure it from the app with init_app(), like a Flask extension.
+    """
+
+    def __init__(self, rounds=DEFAULT_ROUNDS, max_workers=2, max_pending=4):
+        self.rounds = rounds
+        self._configure_pool(max_workers, max_pending)
+        self.hashes = 0
+        self.verifications = 0
+        self.rejected = 0
+        self._dummy_hash = None
+        self._lock = Lock()
+
+    def init_app(self, app):
+        """
+        Read the hashing settings from app.config.
+
+        BCRYPT_LOG_ROUNDS fixes the cost. Without it, BCRYPT_TARGET_MS (if set) picks the highest cost that
+        hashes within that many milliseconds on this machine. PASSWORD_HASH_WORKERS and PASSWORD_HASH_MAX_PENDING
+        size the pool.
+        """
+
+        if app.config.get("BCRYPT_LOG_ROUNDS"):
+            self.rounds = int(app.config["BCRYPT_LOG_ROUNDS"])
+        elif app.config.get("BCRYPT_TARGET_MS"):
+            self.rounds = calibrate_rounds(float(app.config["BCRYPT_TARGET_MS"]))
+            app.logger.info(f"Calibrated bcrypt cost to {self.rounds} rounds")
+
+        self._pool.shutdown(wait=True)
+        self._configure_pool(
+            int(app.config.get("PASSWORD_HASH_WORKERS", self.max_workers)),
+            int(app.config.get("PASSWORD_HASH_MAX_PENDING", self.max_pending)),
+        )
+
+    def _configure_pool(self, max_workers, max_pending):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+        self._slots = BoundedSemaphore(self.max_pending)
+
+    def _run(self, fn, *args):
+        """Run fn on the pool and wait for its result, or raise PasswordHasherBusy if the pool is full."""
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+        try:
+            return self._pool.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash a password at the configured cost. Returns the hash as a str."""
+
+        hashed = self._run(bcrypt.hashpw, password.encode("utf8"), bcrypt.gensalt(self.rounds))
+        with self._lock:
+            self.hashes += 1
+        return hashed.decode("utf8")
+
+    def verify(self, hashed, password):
+        """Check a password against a stored hash, at the cost recorded in that hash."""
+
+        matches = self._run(bcrypt.checkpw, password.encode("utf8"), hashed.encode("utf8"))
+        with self._lock:
+            self.verifications += 1
+        return matches
+
+    def dummy_verify(self, password):
+        """
+        Verify a password against a throwaway hash at the configured cost and return False.
+
+        Used for usernames that don't exist, so they take as long to reject as a wrong password.
+        """
+
+        dummy_hash = self._dummy_hash
+        if dummy_hash is None or hash_rounds(dummy_hash) != self.rounds:
+            dummy_hash = self._dummy_hash = self.hash("dummy password")
+        self.verify(dummy_hash, password)
+        return False
+
+    def needs_rehash(self, hashed):
+        """
+        True if a stored hash was made at a lower cost than the one now configured.
+
+        Only upgrades: with BCRYPT_TARGET_MS each worker calibrates on its own and may settle on a different
+        cost, and rehashing in both directions would have them rewrite the same hash on every login.
+        """
+        rounds = hash_rounds(hashed)
+        return rounds is None or rounds < self.rounds
+
+    def stats(self):
+        """The configured cost and pool size plus hash/verify/rejection counters."""
+
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "hashes": self.hashes,
+                "verifications": self.verifications,
+                "rejected": self.rejected,
+            }
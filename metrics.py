@@ -0,0 +1,238 @@
+import threading
+import time
+from bisect import bisect_left
+
+from jinja2 import Template
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Bucket counts, sum and count of one metric for one set of label values."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus one for values above the largest (+Inf); not cumulative.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms keyed by metric name and label values, rendered in the Prometheus text format.
+
+    Recording takes no lock: each thread records into its own shard (a plain dict only that thread writes),
+    and render() adds the shards up when /metrics is scraped. A scrape running alongside a request may see
+    that request half-recorded, which the next scrape corrects. Shards of threads that have exited are
+    folded into one, so thread-per-request servers don't grow a shard per request.
+    """
+
+    def __init__(self):
+        self._definitions = {}
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        # Only taken when a thread records for the first time, and by render() and clear().
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labels):
+        self._definitions[name] = ("counter", help, labels, None)
+
+    def histogram(self, name, help, labels, buckets):
+        self._definitions[name] = ("histogram", help, labels, buckets)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._retire_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _retire_dead_shards(self):
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _merge_into(self._retired, shard)
+        self._shards = live
+
+    def inc(self, name, labels, amount=1):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        shard = self._shard()
+        key = (name, labels)
+        histogram = shard.get(key)
+        if histogram is None:
+            histogram = shard[key] = Histogram(self._definitions[name][3])
+        histogram.observe(value)
+
+    def collect(self):
+        """Every shard added up: {(name, label values): count or Histogram}."""
+
+        with self._lock:
+            self._retire_dead_shards()
+            shards = [shard for thread, shard in self._shards]
+            merged = _merge_into({}, self._retired)
+        for shard in shards:
+            _merge_into(merged, shard)
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+
+        samples = self.collect()
+        lines = []
+        for name, (kind, help, label_names, buckets) in self._definitions.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (sample_name, labels), value in sorted(samples.items(), key=lambda item: item[0]):
+                if sample_name != name:
+                    continue
+                label_text = ",".join(f'{label}="{_escape(text)}"' for label, text in zip(label_names, labels))
+                if kind == "counter":
+                    lines.append(f"{name}{{{label_text}}} {value}")
+                    continue
+                prefix = f"{label_text}," if label_text else ""
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), value.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label_text}}} {value.sum}")
+                lines.append(f"{name}_count{{{label_text}}} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            for thread, shard in self._shards:
+                shard.clear()
+            self._retired.clear()
+
+
+def _merge_into(target, shard):
+    for key, value in list(shard.items()):
+        if isinstance(value, Histogram):
+            histogram = target.get(key)
+            if histogram is None:
+                histogram = target[key] = Histogram(value.buckets)
+            histogram.merge(value)
+        else:
+            target[key] = target.get(key, 0) + value
+    return target
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_metrics = MetricsRegistry()
+request_metrics.counter(
+    "http_requests_total", "Requests handled, by endpoint, method and status.", ("endpoint", "method", "status")
+)
+request_metrics.histogram(
+    "http_request_duration_seconds",
+    "Time from the first before_request hook to the response.",
+    ("endpoint", "method"),
+    LATENCY_BUCKETS,
+)
+request_metrics.histogram("http_request_sql_queries", "SQL statements run per request.", ("endpoint",), QUERY_BUCKETS)
+request_metrics.histogram(
+    "http_request_sql_duration_seconds",
+    "Total time spent in SQL statements per request.",
+    ("endpoint",),
+    LATENCY_BUCKETS,
+)
+request_metrics.histogram("http_response_size_bytes", "Response body size.", ("endpoint",), SIZE_BUCKETS)
+request_metrics.histogram(
+    "template_render_duration_seconds", "Time to render a template.", ("template",), LATENCY_BUCKETS
+)
+request_metrics.histogram("template_render_size_bytes", "Size of a rendered template.", ("template",), SIZE_BUCKETS)
+request_metrics.counter(
+    "template_fragment_cache_total", "Fragment cache lookups, by fragment template and result.", ("template", "result")
+)
+
+# The request being handled on this thread: its start time and SQL tally.
+_current = threading.local()
+
+
+def start_request():
+    _current.start = time.perf_counter()
+    _current.queries = 0
+    _current.sql_seconds = 0.0
+
+
+def finish_request(endpoint, method, status, size):
+    """Record the request started on this thread by start_request(). Does nothing if none was started."""
+
+    start = getattr(_current, "start", None)
+    if start is None:
+        return
+    _current.start = None
+    endpoint = endpoint or "unmatched"
+    request_metrics.inc("http_requests_total", (endpoint, method, str(status)))
+    request_metrics.observe("http_request_duration_seconds", (endpoint, method), time.perf_counter() - start)
+    request_metrics.observe("http_request_sql_queries", (endpoint,), _current.queries)
+    request_metrics.observe("http_request_sql_duration_seconds", (endpoint,), _current.sql_seconds)
+    if size is not None:
+        request_metrics.observe("http_response_size_bytes", (endpoint,), size)
+
+
+def record_fragment_lookup(template, hit):
+    request_metrics.inc("template_fragment_cache_total", (template, "hit" if hit else "miss"))
+
+
+def install_query_events(engine):
+    """Count every statement the engine runs, and the time it takes, towards the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        if getattr(_current, "start", None) is not None:
+            _current.queries += 1
+            _current.sql_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # The statement failed, so after_cursor_execute won't pop its start time.
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+class MeasuredTemplate(Template):
+    """Jinja template class that records how long each top-level render takes and how big its output is."""
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        output = super().render(*args, **kwargs)
+        name = self.name or "<string>"
+        request_metrics.observe("template_render_duration_seconds", (name,), time.perf_counter() - start)
+        request_metrics.observe("template_render_size_bytes", (name,), len(output.encode()))
+        return output
@@ -0,0 +1,133 @@
+"""
+Copy the old denormalized `courts` table into `places` + `saved_courts`.
+
+Rows are read in id order in batches (keyset, not OFFSET) and each batch is written and committed on
+its own, so the migration can be stopped and re-run safely: already copied rows are skipped by
+ON CONFLICT DO NOTHING. Saved court ids are preserved so links and cached ids keep working. Duplicate
+saves of the same place by the same user are collapsed into the earliest one.
+
+The old table is left in place; drop it with --drop-old once the copy has been checked.
+
+Usage: python migrations/split_courts_into_places.py [--batch-size 5000] [--drop-old]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import inspect, text
+
+OLD_TABLE = "courts"
+
+
+def table_size(connection, table):
+    """Total on-disk size of a table (with indexes and TOAST) in bytes, on PostgreSQL only."""
+    if connection.dialect.name != "postgresql":
+        return None
+    return connection.execute(text("SELECT pg_total_relation_size(:table)"), {"table": table}).scalar()
+
+
+def upgrade(db, batch_size=5000, log=print):
+    """Copy every row of the old courts table into places and saved_courts. Returns the number of rows read."""
+
+    from models import Place, SavedCourt, dialect_insert
+
+    if OLD_TABLE not in inspect(db.engine).get_table_names():
+        log(f"No {OLD_TABLE} table found, nothing to migrate.")
+        return 0
+
+    db.create_all()
+    old_size = table_size(db.session.connection(), OLD_TABLE)
+
+    old_courts = db.Table(OLD_TABLE, db.MetaData(), autoload_with=db.engine)
+    last_id = 0
+    copied = 0
+    while True:
+        rows = db.session.execute(
+            db.select(old_courts)
+            .where(old_courts.c.id > last_id)
+            .order_by(old_courts.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        places = {
+            row.google_maps_place_id: {
+                "id": row.google_maps_place_id,
+                "name": row.court_name,
+                "address": row.address,
+                "google_maps_url": row.google_maps_url,
+            }
+            for row in rows
+        }
+        db.session.execute(
+            dialect_insert(Place).values(list(places.values())).on_conflict_do_nothing()
+        )
+        db.session.execute(
+            dialect_insert(SavedCourt)
+            .values(
+                [
+                    {
+                        "id": row.id,
+                        "user_id": row.user_id,
+                        "place_id": row.google_maps_place_id,
+                        "user_rating": row.user_rating,
+                    }
+                    for row in rows
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        db.session.commit()
+
+        last_id = rows[-1].id
+        copied += len(rows)
+        log(f"Copied {copied} courts (up to id {last_id})")
+
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        # Ids were inserted explicitly, so move the sequence past them.
+        connection.execute(
+            text(
+                "SELECT setval(pg_get_serial_sequence('saved_courts', 'id'), "
+                "COALESCE((SELECT MAX(id) FROM saved_courts), 1))"
+            )
+        )
+        db.session.commit()
+
+    new_size = table_size(connection, "places")
+    if old_size is not None and new_size is not None:
+        new_size += table_size(connection, "saved_courts")
+        log(f"{OLD_TABLE}: {old_size:,} bytes -> places + saved_courts: {new_size:,} bytes")
+    return copied
+
+
+def drop_old(db, log=print):
+    """Drop the old courts table."""
+    db.session.execute(text(f"DROP TABLE IF EXISTS {OLD_TABLE}"))
+    db.session.commit()
+    log(f"Dropped {OLD_TABLE}.")
+
+
+def main():
+    # The schema isn't at the current version yet, so don't let startup check it.
+    os.environ.setdefault("SCHEMA_CHECK", "off")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop-old", action="store_true", help=f"drop the old {OLD_TABLE} table after copying")
+    args = parser.parse_args()
+
+    from app import app
+    from models import db
+
+    with app.app_context():
+        upgrade(db, batch_size=args.batch_size)
+        if args.drop_old:
+            drop_old(db)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,33 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime
+import re
+from geocoding import normalize_query
+from hashing import PasswordHasher
+from geo import geohash_encode, geohash_cells_covering, geohash_prefix_upper_bound, haversine_m
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
+password_hasher = PasswordHasher()
+
+
+def dialect_insert(model):
+    """Return an INSERT for model from the current database's dialect, so ON CONFLICT clauses are available."""
+    insert = sqlite_insert if db.session.get_bind().dialect.name == "sqlite" else postgresql_insert
+    return insert(model)
+
+
+# SQLite reports "UNIQUE constraint failed: users.email", PostgreSQL "duplicate key value violates unique
+# constraint "users_email_key"" with the detail "Key (email)=(...) already exists."
+UNIQUE_VIOLATION = re.compile(r"UNIQUE constraint failed: \w+\.(\w+)|Key \((\w+)\)=")
+
+
+def unique_violation_column(error):
+    """The column an IntegrityError from a single-column unique constraint is about, or None."""
+
+    match = UNIQUE_VIOLATION.search(str(error.orig))
+    return match and (match.group(1) or match.group(2))
 
 
 class User(db.Model):
@@ -26,19 +51,24 @@ class User(db.Model):
 
     location = db.Column(db.Text, nullable=True, default="")
 
-    courts = db.relationship("Court", backref="user", cascade="all, delete-orphan")
+    location_lat = db.Column(db.Float, nullable=True, default=None)
+
+    location_lng = db.Column(db.Float, nullable=True, default=None)
+
+    courts = db.relationship("SavedCourt", backref="user", cascade="all, delete-orphan")
 
     @classmethod
     def register(cls, username, password, email, first_name, last_name, bio, location):
-        """Register a user with a hashed password."""
-
-        hashed = bcrypt.generate_password_hash(password)
+        """
+        Register a user with a hashed password.
+        The hash runs on password_hasher's pool, which raises PasswordHasherBusy when it is full.
+        """
 
-        hashed_utf8 = hashed.decode("utf8")
+        hashed = password_hasher.hash(password)
 
         return cls(
             username=username,
-            password=hashed_utf8,
+            password=hashed,
             email=email,
             first_name=first_name,
             last_name=last_name,
@@ -47,33 +77,89 @@ class User(db.Model):
         )
 
     @classmethod
-    def authenticate(cls, username, password):
-        """Login a user checking for password hash to match database."""
+    def authenticate(cls, username, password, on_unknown_user=None):
+        """
+        Login a user checking for password hash to match database.
+
+        For unknown usernames a dummy hash is verified anyway, so they cost as much as a wrong password;
+        on_unknown_user, if given, is called first (the login throttle budgets these hashes).
+        If the stored hash was made at a lower cost than the one now configured, it is replaced with a hash
+        at the current cost (not committed). Raises PasswordHasherBusy when the hashing pool is full.
+        """
 
         user = User.query.filter_by(username=username).first()
-        if user and bcrypt.check_password_hash(user.password, password):
+        if user is None:
+            if on_unknown_user is not None:
+                on_unknown_user()
+            password_hasher.dummy_verify(password)
+            return False
+
+        if password_hasher.verify(user.password, password):
+            if password_hasher.needs_rehash(user.password):
+                user.password = password_hasher.hash(password)
             return user
         else:
             return False
 
 
-class Court(db.Model):
-    """Model for basketball courts."""
+GEOHASH_PRECISION = 9
 
-    __tablename__ = "courts"
 
-    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+class Place(db.Model):
+    """A Google Maps place (basketball court), stored once and shared by every user who saves it."""
 
-    court_name = db.Column(db.Text, nullable=False)
+    __tablename__ = "places"
 
-    google_maps_place_id = db.Column(db.Text, nullable=False)
+    id = db.Column(db.Text, primary_key=True)
+
+    name = db.Column(db.Text, nullable=False)
 
     address = db.Column(db.Text, nullable=False)
 
     google_maps_url = db.Column(db.Text, nullable=False)
 
+    lat = db.Column(db.Float, nullable=True, default=None)
+
+    lng = db.Column(db.Float, nullable=True, default=None)
+
+    # Geohash of (lat, lng), indexed so nearby lookups can prune by cell prefix before computing distances.
+    geohash = db.Column(db.String(length=GEOHASH_PRECISION), nullable=True, default=None)
+
+    @classmethod
+    def get_or_build(cls, place_id, name, address, google_maps_url, lat=None, lng=None):
+        """Return the stored Place for place_id, or a new (unsaved) one built from the given details."""
+        return db.session.get(cls, place_id) or cls(
+            id=place_id, name=name, address=address, google_maps_url=google_maps_url, **cls.coordinates(lat, lng)
+        )
+
+    @staticmethod
+    def coordinates(lat, lng):
+        """Column values for a location: lat, lng and its geohash (all None if the location is unknown)."""
+        if lat is None or lng is None:
+            return {"lat": None, "lng": None, "geohash": None}
+        return {"lat": lat, "lng": lng, "geohash": geohash_encode(lat, lng, GEOHASH_PRECISION)}
+
+
+class SavedCourt(db.Model):
+    """
+    Model for a user's saved basketball court: a slim join between a user and a shared Place, plus their rating.
+
+    The place's details are exposed as court_name, address and google_maps_url (and its id as
+    google_maps_place_id), so a SavedCourt reads like the old denormalized court row.
+    """
+
+    __tablename__ = "saved_courts"
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "place_id", name="uq_saved_courts_user_id_place_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
 
+    place_id = db.Column(db.Text, db.ForeignKey("places.id"), nullable=False)
+
     user_rating = db.Column(
         db.Float,
         db.CheckConstraint("user_rating >= 0 AND user_rating <= 5"),
@@ -81,6 +167,214 @@ class Court(db.Model):
         default=None,
     )
 
+    place = db.relationship("Place", lazy="joined")
+
+    google_maps_place_id = db.synonym("place_id")
+
+    def __init__(
+        self, court_name=None, google_maps_place_id=None, address=None, google_maps_url=None, lat=None, lng=None, **kwargs
+    ):
+        """Accepts the place details directly (as the old courts table did) and links or creates the matching Place."""
+
+        super().__init__(**kwargs)
+        if google_maps_place_id is not None:
+            self.place = Place.get_or_build(google_maps_place_id, court_name, address, google_maps_url, lat, lng)
+
+    @property
+    def court_name(self):
+        return self.place.name
+
+    @property
+    def address(self):
+        return self.place.address
+
+    @property
+    def google_maps_url(self):
+        return self.place.google_maps_url
+
+    @classmethod
+    def keyset_page(cls, user_id, per_page, after=None, offset=0):
+        """
+        Return up to per_page + 1 of a user's courts, newest first.
+
+        With `after` set, only courts with an id below it are returned, which walks the
+        (user_id, id DESC) index directly instead of scanning past an OFFSET.
+        Without it, `offset` rows are skipped (used when jumping to a page number).
+        The extra row tells the caller whether a next page exists.
+        """
+
+        query = cls.query.filter(cls.user_id == user_id).order_by(cls.id.desc())
+        if after is not None:
+            query = query.filter(cls.id < after)
+        else:
+            query = query.offset(offset)
+        return query.limit(per_page + 1).all()
+
+    @classmethod
+    def upsert_many(cls, user_id, courts):
+        """
+        Save courts for a user, skipping any place they have already saved.
+
+        Stores any places not seen before with one INSERT ... ON CONFLICT DO NOTHING, then links them to the
+        user with one INSERT ... ON CONFLICT (user_id, place_id) DO NOTHING RETURNING, and finally looks up
+        the ids of the places the user had already saved. New saves are counted in each place's rating stats.
+        Takes a list of dicts with court_name, google_maps_place_id, address and google_maps_url, and optionally
+        lat and lng. Coordinates are filled in on stored places that don't have them yet.
+        Returns a dict mapping google_maps_place_id -> (court id, created) where created is False for existing saves.
+        Does not commit.
+        """
+
+        places = {
+            court["google_maps_place_id"]: {
+                "id": court["google_maps_place_id"],
+                "name": court["court_name"],
+                "address": court["address"],
+                "google_maps_url": court["google_maps_url"],
+                **Place.coordinates(court.get("lat"), court.get("lng")),
+            }
+            for court in courts
+        }
+        if not places:
+            return {}
+
+        insert_places = dialect_insert(Place).values(list(places.values()))
+        db.session.execute(
+            insert_places.on_conflict_do_update(
+                index_elements=["id"],
+                set_={
+                    "lat": insert_places.excluded.lat,
+                    "lng": insert_places.excluded.lng,
+                    "geohash": insert_places.excluded.geohash,
+                },
+                where=Place.lat.is_(None) & insert_places.excluded.lat.isnot(None),
+            )
+        )
+        statement = (
+            dialect_insert(cls)
+            .values([{"user_id": user_id, "place_id": place_id} for place_id in places])
+            .on_conflict_do_nothing(index_elements=["user_id", "place_id"])
+            .returning(cls.place_id, cls.id)
+        )
+        created = dict(db.session.execute(statement).all())
+
+        PlaceRatingStats.record([(place_id, 1, None, None) for place_id in created])
+
+        existing = {}
+        missing = places.keys() - created.keys()
+        if missing:
+            existing = dict(
+                db.session.execute(
+                    db.select(cls.place_id, cls.id).where(cls.user_id == user_id, cls.place_id.in_(missing))
+                ).all()
+            )
+
+        return {
+            place_id: (created[place_id], True) if place_id in created else (existing[place_id], False)
+            for place_id in places
+        }
+
+    @classmethod
+    def delete_owned(cls, court_id, user_id):
+        """
+        Delete a court only if it belongs to user_id, in one DELETE ... WHERE id AND user_id RETURNING statement.
+        The place's rating stats are updated to drop the save and its rating.
+        Returns the deleted court's id, or None if no court matched. Does not commit.
+        """
+
+        statement = (
+            db.delete(cls)
+            .where(cls.id == court_id, cls.user_id == user_id)
+            .returning(cls.id, cls.place_id, cls.user_rating)
+        )
+        deleted = db.session.execute(statement).first()
+        if deleted is None:
+            return None
+
+        PlaceRatingStats.record([(deleted.place_id, -1, deleted.user_rating, None)])
+        return deleted.id
+
+    @classmethod
+    def rate_owned(cls, court_id, user_id, rating):
+        """
+        Set a court's user_rating only if it belongs to user_id, and move the place's rating stats from the
+        old rating to the new one.
+
+        On PostgreSQL this is one UPDATE ... FROM ... RETURNING statement that also returns the rating being
+        replaced. SQLite's RETURNING can't see the old value, so there the rating is read first (SQLite
+        serializes writers, so nothing can change it in between).
+        Returns the updated court's id, or None if no court matched. Does not commit.
+        """
+
+        owned = (cls.id == court_id) & (cls.user_id == user_id)
+
+        if db.session.get_bind().dialect.name == "sqlite":
+            previous = db.session.execute(db.select(cls.place_id, cls.user_rating).where(owned)).first()
+            if previous is None:
+                return None
+            db.session.execute(
+                db.update(cls).where(owned).values(user_rating=rating).execution_options(synchronize_session=False)
+            )
+            updated = (court_id, previous.place_id, previous.user_rating)
+        else:
+            before = db.aliased(cls)
+            statement = (
+                db.update(cls)
+                .where(owned, before.id == cls.id)
+                .values(user_rating=rating)
+                .returning(cls.id, cls.place_id, before.user_rating)
+                .execution_options(synchronize_session=False)
+            )
+            updated = db.session.execute(statement).first()
+            if updated is None:
+                return None
+
+        updated_id, place_id, old_rating = updated
+        PlaceRatingStats.record([(place_id, 0, old_rating, rating)])
+        return updated_id
+
+    @classmethod
+    def nearby(cls, user_id, lat, lng, radius_m, limit=50):
+        """
+        Return a user's saved courts within radius_m meters of (lat, lng), nearest first, as (court, distance_m) pairs.
+
+        Candidates are selected with range scans on the geohash index (the cells covering the circle), then exact haversine
+        distances are computed for all candidates at once and used to filter and sort.
+        Courts whose place has no stored coordinates are never returned.
+        """
+
+        cell_ranges = []
+        for cell in geohash_cells_covering(lat, lng, radius_m, GEOHASH_PRECISION):
+            upper = geohash_prefix_upper_bound(cell)
+            cell_range = Place.geohash >= cell
+            cell_ranges.append(cell_range if upper is None else cell_range & (Place.geohash < upper))
+
+        candidates = (
+            cls.query.join(cls.place)
+            .options(db.contains_eager(cls.place))
+            .filter(cls.user_id == user_id, db.or_(*cell_ranges))
+            .all()
+        )
+        if not candidates:
+            return []
+
+        distances = haversine_m(
+            lat, lng, [court.place.lat for court in candidates], [court.place.lng for court in candidates]
+        )
+        within = (distances <= radius_m).nonzero()[0]
+        nearest = within[distances[within].argsort(kind="stable")][:limit]
+        return [(candidates[i], float(distances[i])) for i in nearest]
+
+    @classmethod
+    def saved_place_ids(cls, user_id):
+        """
+        Return a dict mapping google_maps_place_id -> court id for every court a user has saved.
+
+        Only those two columns are selected, so no SavedCourt or Place objects are built.
+        """
+
+        rows = db.session.execute(db.select(cls.place_id, cls.id).where(cls.user_id == user_id))
+        return {place_id: court_id for place_id, court_id in rows}
+
     def serialize(self):
         """Method to serialize court object data to be used as JSON."""
         return {
@@ -94,8 +388,240 @@ class Court(db.Model):
         }
 
 
-def connect_db(app):
+class PlaceRatingStats(db.Model):
+    """
+    Running totals of the saves and ratings for each place, across every user.
+
+    Rows are never recomputed on read: every save, removal and rating change applies its delta through
+    record() in the same transaction, so the community average for a place is one primary key lookup.
+    """
+
+    __tablename__ = "place_rating_stats"
+
+    BUCKETS = range(6)
+
+    COUNTERS = ("save_count", "rating_sum", "rating_count") + tuple(f"stars_{bucket}" for bucket in BUCKETS)
+
+    place_id = db.Column(db.Text, db.ForeignKey("places.id"), primary_key=True)
+
+    save_count = db.Column(db.Integer, nullable=False, default=0)
+
+    rating_sum = db.Column(db.Float, nullable=False, default=0)
+
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Histogram of ratings rounded to whole stars.
+    stars_0 = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def bucket(rating):
+        """The histogram bucket for a rating: rounded half up to a whole star."""
+        return min(5, max(0, int(rating + 0.5)))
+
+    @classmethod
+    def record(cls, changes):
+        """
+        Apply saves, removals and rating changes to the stats.
+
+        Takes (place_id, save_delta, old_rating, new_rating) tuples, where save_delta is 1 for a new save,
+        -1 for a removal and 0 for a rating change, and either rating may be None. Changes to the same place
+        are summed first, then every place is updated with one INSERT ... ON CONFLICT (place_id) DO UPDATE that
+        adds the deltas. Rows are written in place_id order so concurrent transactions lock them in the same
+        order. Does not commit.
+        """
+
+        deltas = {}
+        for place_id, save_delta, old_rating, new_rating in changes:
+            delta = deltas.setdefault(place_id, dict.fromkeys(cls.COUNTERS, 0))
+            delta["save_count"] += save_delta
+            for rating, sign in ((old_rating, -1), (new_rating, 1)):
+                if rating is not None:
+                    delta["rating_sum"] += sign * rating
+                    delta["rating_count"] += sign
+                    delta[f"stars_{cls.bucket(rating)}"] += sign
+
+        rows = [
+            {"place_id": place_id, **delta}
+            for place_id, delta in sorted(deltas.items())
+            if any(delta.values())
+        ]
+        if not rows:
+            return
+
+        insert = dialect_insert(cls).values(rows)
+        db.session.execute(
+            insert.on_conflict_do_update(
+                index_elements=["place_id"],
+                set_={counter: getattr(cls, counter) + getattr(insert.excluded, counter) for counter in cls.COUNTERS},
+            )
+        )
+
+    @classmethod
+    def for_places(cls, place_ids):
+        """
+        Return a dict mapping place_id -> serialized stats for the given places, in one primary key IN query.
+        Places nobody has saved are left out.
+        """
+
+        if not place_ids:
+            return {}
+        rows = db.session.execute(db.select(cls).where(cls.place_id.in_(set(place_ids)))).scalars()
+        return {stats.place_id: stats.serialize() for stats in rows}
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recompute every place's stats from saved_courts with one INSERT ... SELECT ... GROUP BY place_id.
+
+        Used to backfill the table for courts saved before it existed, or to repair drift. Does not commit.
+        """
+
+        rating = SavedCourt.user_rating
+        stars = []
+        for bucket in cls.BUCKETS:
+            # NULL ratings fail every comparison, so they fall through to else_ and aren't counted.
+            bounds = []
+            if bucket > 0:
+                bounds.append(rating >= bucket - 0.5)
+            if bucket < 5:
+                bounds.append(rating < bucket + 0.5)
+            stars.append(db.func.sum(db.case((db.and_(*bounds), 1), else_=0)))
+
+        totals = db.select(
+            SavedCourt.place_id,
+            db.func.count(),
+            db.func.coalesce(db.func.sum(rating), 0),
+            db.func.count(rating),
+            *stars,
+        ).group_by(SavedCourt.place_id)
+
+        db.session.execute(db.delete(cls))
+        db.session.execute(db.insert(cls).from_select(["place_id", *cls.COUNTERS], totals))
+
+    def serialize(self):
+        return {
+            "average": self.rating_sum / self.rating_count if self.rating_count else None,
+            "rating_count": self.rating_count,
+            "save_count": self.save_count,
+            "histogram": [getattr(self, f"stars_{bucket}") for bucket in self.BUCKETS],
+        }
+
+
+class GeocodeResult(db.Model):
+    """Geocoding results shared by every user, keyed by the normalized search term."""
+
+    __tablename__ = "geocode_results"
+
+    query = db.Column(db.Text, primary_key=True)
+
+    formatted_address = db.Column(db.Text, nullable=False)
+
+    lat = db.Column(db.Float, nullable=False)
+
+    lng = db.Column(db.Float, nullable=False)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def lookup(cls, query, geocoder):
+        """
+        Geocode a search term, using the stored result when one exists.
+
+        On a miss the geocoder is called and a match is stored with INSERT ... ON CONFLICT DO NOTHING,
+        so concurrent lookups of the same term can't collide. Does not commit.
+        Returns {"formatted_address", "lat", "lng"}, or None if the geocoder found nothing.
+        Raises GeocodingError if the geocoder fails.
+        """
+
+        key = normalize_query(query)
+        cached = db.session.get(cls, key)
+        if cached:
+            return cached.serialize()
+
+        result = geocoder.geocode(key)
+        if result:
+            db.session.execute(
+                dialect_insert(cls).values(query=key, **result).on_conflict_do_nothing(index_elements=["query"])
+            )
+        return result
+
+    def serialize(self):
+        return {"formatted_address": self.formatted_address, "lat": self.lat, "lng": self.lng}
+
+
+# Bump whenever the tables change, and add the matching step to schema.UPGRADES.
+SCHEMA_VERSION = 2
+
+
+class SchemaVersionError(Exception):
+    """Raised at startup when the database schema isn't at the version this code expects."""
+
+
+class SchemaVersion(db.Model):
+    """Single row recording which schema version the database is at."""
+
+    __tablename__ = "schema_version"
+
+    id = db.Column(db.Integer, primary_key=True, default=1)
+
+    version = db.Column(db.Integer, nullable=False)
+
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Older code (and the routes) refer to saved courts simply as courts.
+Court = SavedCourt
+
+# Serves the saved courts page: filter by user and walk ids newest first.
+db.Index("ix_saved_courts_user_id_id", SavedCourt.user_id, SavedCourt.id.desc())
+
+# Serves nearby lookups, which select geohash ranges covering the search circle.
+db.Index("ix_places_geohash", Place.geohash)
+
+
+def check_schema_version():
+    """
+    Make sure the database is at SCHEMA_VERSION with one primary key SELECT.
+    Raises SchemaVersionError if it isn't (or has never been migrated).
+    """
+
+    try:
+        version = db.session.execute(db.select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+    except SQLAlchemyError:
+        version = None
+    finally:
+        db.session.remove()
+
+    if version != SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Database schema is at version {version}, expected {SCHEMA_VERSION}. Run `python schema.py`."
+        )
+
+
+def connect_db(app, on_engine=None):
+    """
+    Bind the database to the app without touching the schema (that's `python schema.py`).
+
+    SCHEMA_CHECK picks what happens at startup: "version" (default) runs check_schema_version, "off" skips
+    the database entirely, and "create" runs create_all() like the app used to (for throwaway databases).
+    on_engine is called with the engine before the first connection is opened, to install event listeners.
+    """
+
     with app.app_context():
         db.app = app
         db.init_app(app)
-        db.create_all()
+        if on_engine is not None:
+            on_engine(db.engine)
+        schema_check = app.config.get("SCHEMA_CHECK", "version")
+        if schema_check == "version":
+            check_schema_version()
+        elif schema_check == "create":
+            db.create_all()
+            db.session.remove()
+        elif schema_check != "off":
+            raise ValueError(f"Unknown SCHEMA_CHECK: {schema_check}")
@@ -0,0 +1,43 @@
+from math import ceil
+
+
+class KeysetPage:
+    """
+    One page of results from a keyset (cursor) query, shaped like Flask-SQLAlchemy's Pagination.
+
+    Rows are expected in descending id order. `items` holds at most `per_page` rows; callers fetch
+    one extra row so `has_next` is known without counting. `total` is used only to render the
+    page-number nav and may come from a cache.
+    """
+
+    def __init__(self, rows, page, per_page, total):
+        self.items = rows[:per_page]
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.has_next = len(rows) > per_page
+
+    @property
+    def pages(self):
+        """Total number of pages, based on the (possibly cached) total."""
+        return max(ceil(self.total / self.per_page), self.page + self.has_next if self.items else 0)
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    @property
+    def next_cursor(self):
+        """Id of the last row on this page; pass it as `after` to fetch the next page."""
+        return self.items[-1].id if self.has_next else None
+
+    def __iter__(self):
+        return iter(self.items)
@@ -0,0 +1,244 @@
+import json
+import random
+import time
+from abc import ABC, abstractmethod
+from threading import Event, Lock
+
+import requests
+
+from cache import TTLCache
+from geo import geohash_encode, geohash_decode
+
+DEFAULT_QUERY = "Basketball Court"
+
+
+class PlacesProviderError(Exception):
+    """Raised when a places provider cannot complete a search."""
+
+
+class PlacesQuotaExceeded(PlacesProviderError):
+    """Raised when the upstream places API reports that its request quota is used up."""
+
+
+class PlacesProvider(ABC):
+    """
+    Interface for places text-search backends.
+
+    search_text returns a list of dicts shaped like the Places results search.js consumes:
+    {"id", "displayName", "formattedAddress", "googleMapsURI", "location": {"lat", "lng"}}.
+    """
+
+    @abstractmethod
+    def search_text(self, query, lat, lng):
+        """Search for places matching query around (lat, lng)."""
+
+
+class GooglePlacesProvider(PlacesProvider):
+    """Text search through the Google Places API (New) searchText endpoint."""
+
+    URL = "https://places.googleapis.com/v1/places:searchText"
+    FIELD_MASK = "places.id,places.displayName,places.formattedAddress,places.googleMapsUri,places.location"
+
+    def __init__(self, api_key, radius=20000, page_size=20, timeout=10):
+        self.api_key = api_key
+        self.radius = radius
+        self.page_size = page_size
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def search_text(self, query, lat, lng):
+        body = {
+            "textQuery": query,
+            "includedType": "park",
+            "strictTypeFiltering": False,
+            "languageCode": "en-US",
+            "regionCode": "us",
+            "pageSize": self.page_size,
+            "locationBias": {
+                "circle": {"center": {"latitude": lat, "longitude": lng}, "radius": self.radius}
+            },
+        }
+        headers = {"X-Goog-Api-Key": self.api_key, "X-Goog-FieldMask": self.FIELD_MASK}
+
+        try:
+            response = self.session.post(self.URL, json=body, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise PlacesProviderError(str(e)) from e
+
+        if response.status_code == 429:
+            raise PlacesQuotaExceeded(response.text)
+        if response.status_code != 200:
+            raise PlacesProviderError(f"Places API returned {response.status_code}: {response.text}")
+
+        return [
+            {
+                "id": place["id"],
+                "displayName": place.get("displayName", {}).get("text", ""),
+                "formattedAddress": place.get("formattedAddress", ""),
+                "googleMapsURI": place.get("googleMapsUri", ""),
+                "location": {
+                    "lat": place["location"]["latitude"],
+                    "lng": place["location"]["longitude"],
+                },
+            }
+            for place in response.json().get("places", [])
+        ]
+
+
+class StubPlacesProvider(PlacesProvider):
+    """
+    Offline provider that returns deterministic fake parks scattered around the search location.
+
+    `latency` (seconds) is slept on every call to stand in for the upstream round trip when benchmarking.
+    """
+
+    def __init__(self, results=20, latency=0.0):
+        self.results = results
+        self.latency = latency
+        self.calls = 0
+
+    def search_text(self, query, lat, lng):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        rng = random.Random(f"{query}:{lat:.5f}:{lng:.5f}")
+        prefix = geohash_encode(lat, lng, 7)
+        places = []
+        for i in range(self.results):
+            place_id = f"stub-{prefix}-{i}"
+            places.append(
+                {
+                    "id": place_id,
+                    "displayName": f"Stub Park {i + 1}",
+                    "formattedAddress": f"{i + 1} Stub St, Testville",
+                    "googleMapsURI": f"https://maps.google.com/?q=place_id:{place_id}",
+                    "location": {
+                        "lat": lat + rng.uniform(-0.05, 0.05),
+                        "lng": lng + rng.uniform(-0.05, 0.05),
+                    },
+                }
+            )
+        return places
+
+
+class FixturePlacesProvider(PlacesProvider):
+    """
+    Offline provider that serves recorded search results from a JSON fixture, for load tests.
+
+    The fixture lists areas, each with a center and the places a search there returns:
+    {"areas": [{"name", "center": {"lat", "lng"}, "places": [...]}]}. A search returns the places of the
+    area whose center is closest to the search location, whatever the query.
+    `latency` (seconds) is slept on every call to stand in for the upstream round trip.
+    """
+
+    def __init__(self, path, latency=0.0):
+        with open(path) as fixture:
+            self.areas = json.load(fixture)["areas"]
+        self.latency = latency
+        self.calls = 0
+
+    def search_text(self, query, lat, lng):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        area = min(
+            self.areas, key=lambda area: (area["center"]["lat"] - lat) ** 2 + (area["center"]["lng"] - lng) ** 2
+        )
+        return area["places"]
+
+
+class _InflightSearch:
+    """An upstream search that other threads asking for the same key can wait on."""
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class PlacesSearchCache:
+    """
+    Caches places searches by query and geohash cell of the search location.
+
+    Every location inside the same cell shares one cache entry, and the upstream search is biased to
+    the cell's center so all of them get the same results. Concurrent misses for the same key are
+    collapsed into a single upstream call that the other requests wait on.
+    """
+
+    def __init__(self, provider, maxsize=2048, ttl=86400, precision=5):
+        self.provider = provider
+        self.precision = precision
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.upstream_calls = 0
+        self.collapsed = 0
+        self._inflight = {}
+        self._lock = Lock()
+
+    def cache_key(self, query, lat, lng):
+        """Key for a search: the normalized query text and the geohash cell of the location."""
+        return " ".join(query.lower().split()), geohash_encode(lat, lng, self.precision)
+
+    def search(self, query, lat, lng):
+        """Return places for query near (lat, lng), from the cache when possible."""
+
+        key = self.cache_key(query, lat, lng)
+        places = self.cache.get(key)
+        if places is not None:
+            return places
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            is_leader = inflight is None
+            if is_leader:
+                # Another thread may have filled the cache between our miss and taking the lock.
+                places = self.cache.get(key)
+                if places is not None:
+                    return places
+                inflight = _InflightSearch()
+                self._inflight[key] = inflight
+                self.upstream_calls += 1
+            else:
+                self.collapsed += 1
+
+        if not is_leader:
+            return inflight.wait()
+
+        try:
+            center_lat, center_lng = geohash_decode(key[1])
+            inflight.result = self.provider.search_text(query, center_lat, center_lng)
+            self.cache.set(key, inflight.result)
+            return inflight.result
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight.done.set()
+
+    def stats(self):
+        """Cache counters plus how many upstream calls were made and how many requests were collapsed."""
+        return dict(self.cache.stats(), upstream_calls=self.upstream_calls, collapsed=self.collapsed)
+
+
+def create_places_provider(name, api_key=None, fixture=None):
+    """
+    Build the places provider named in config: "google" (default), or "stub" or "fixture" (serving the
+    `fixture` JSON file) for offline use.
+    """
+
+    if name == "stub":
+        return StubPlacesProvider()
+    if name == "fixture":
+        return FixturePlacesProvider(fixture)
+    if name == "google":
+        return GooglePlacesProvider(api_key)
+    raise ValueError(f"Unknown places provider: {name}")
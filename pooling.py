@@ -0,0 +1,154 @@
+import time
+from threading import Lock
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+POOL_PROFILES = ("adaptive", "direct", "pgbouncer")
+
+
+class PoolMetrics:
+    """
+    Counters for the connection pool of this process: checkouts, new connections, idle pings and how long
+    checkouts waited for a connection (including opening one).
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.pings = 0
+            self.ping_failures = 0
+            self.waits = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+                "wait_mean_ms": self.wait_seconds / self.waits * 1000 if self.waits else 0.0,
+                "wait_max_ms": self.max_wait_seconds * 1000,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class _TimedGet:
+    """Pool mixin that times every wait for a connection, whether it came from the pool or was newly opened."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedGet, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedGet, NullPool):
+    pass
+
+
+def engine_options(profile, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=300):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for a pool profile.
+
+    "adaptive" and "direct" keep a QueuePool of connections to the database; "adaptive" additionally pings a
+    connection on checkout if it has sat idle (see install_pool_events), "direct" never pings.
+    "pgbouncer" uses a NullPool, opening a connection per checkout and closing it afterwards, for when an
+    external pooler (pgbouncer, Neon's pooled endpoint) already keeps the server connections.
+    """
+
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"Unknown pool profile: {profile}")
+    if profile == "pgbouncer":
+        return {"poolclass": TimedNullPool}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+    }
+
+
+def install_pool_events(engine, ping_after_idle=None, clock=time.monotonic):
+    """
+    Count pool activity into pool_metrics and, if ping_after_idle is set, ping connections idle that long.
+
+    A connection checked out within ping_after_idle seconds of its last use is handed out as is, so busy
+    workers don't pay a round trip per checkout. One that has been idle longer gets a SELECT 1 first; if
+    that fails it is discarded and the pool transparently retries with a fresh connection.
+    The listeners live on the engine, so they carry over when engine.dispose() replaces the pool.
+    """
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, record):
+        pool_metrics.increment("connects")
+        record.info["last_used"] = clock()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, record, proxy):
+        pool_metrics.increment("checkouts")
+        last_used = record.info.get("last_used")
+        if ping_after_idle is None or last_used is None or clock() - last_used < ping_after_idle:
+            return
+
+        pool_metrics.increment("pings")
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception as e:
+            pool_metrics.increment("ping_failures")
+            raise exc.DisconnectionError(f"Connection failed idle ping: {e}") from e
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, record):
+        pool_metrics.increment("checkins")
+        record.info["last_used"] = clock()
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, record, exception):
+        pool_metrics.increment("invalidations")
+
+
+def pool_status(engine):
+    """Live occupancy of the engine's pool. Only queue pools have any."""
+
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"class": type(pool).__name__}
+    return {
+        "class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
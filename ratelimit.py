@@ -0,0 +1,141 @@
+import time
+from abc import ABC, abstractmethod
+from threading import Lock
+
+from cache import TTLCache
+
+
+class RateLimitBackend(ABC):
+    """
+    Interface for token bucket storage.
+
+    consume() must refill and take tokens from the bucket atomically, so a backend shared between workers
+    (e.g. Redis with a small Lua script) can be swapped in for the in-memory default.
+    """
+
+    @abstractmethod
+    def consume(self, key, capacity, refill_per_second, cost=1):
+        """Take `cost` tokens from the bucket for key if it has them. Returns True if they were taken."""
+
+    @abstractmethod
+    def tokens(self, key, capacity, refill_per_second):
+        """How many tokens the bucket for key holds right now, without taking any."""
+
+    @abstractmethod
+    def clear(self):
+        """Forget every bucket."""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Token buckets kept in this process.
+
+    Buckets are stored as (tokens, last update) in a TTLCache, so idle buckets (which would have refilled
+    anyway) expire after `ttl` seconds and at most `maxsize` are kept. `ttl` must be at least the time
+    the slowest bucket takes to refill completely.
+    """
+
+    def __init__(self, maxsize=100000, ttl=3600, timer=time.monotonic):
+        self.timer = timer
+        self.buckets = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+        self._lock = Lock()
+
+    def consume(self, key, capacity, refill_per_second, cost=1):
+        with self._lock:
+            now = self.timer()
+            tokens, updated_at = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets.set(key, (tokens, now))
+            return allowed
+
+    def tokens(self, key, capacity, refill_per_second):
+        with self._lock:
+            now = self.timer()
+            tokens, updated_at = self.buckets.get(key, (capacity, now))
+            return min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+    def clear(self):
+        self.buckets.clear()
+
+
+class LoginThrottle:
+    """
+    Token bucket limits on login attempts, checked before any password hashing.
+
+    Every attempt takes a token from its client IP's bucket and then from its username's bucket; an attempt
+    that finds either empty is rejected without touching bcrypt. Separately, each client IP has a smaller
+    budget for the dummy hashes run for usernames that don't exist (see record_unknown_user), so guessing
+    made-up usernames costs less CPU than the IP limit alone allows. While an IP's budget is used up every
+    attempt from that IP is rejected, known username or not, so the rejection doesn't reveal which usernames
+    exist; other clients' logins are unaffected.
+
+    Limits are (burst, per minute) pairs: a bucket holds up to `burst` attempts and refills at `per minute`.
+    """
+
+    def __init__(self, backend, per_username=(5, 5), per_ip=(20, 20), unknown_users=(10, 10)):
+        self.backend = backend
+        self.per_username = per_username
+        self.per_ip = per_ip
+        self.unknown_users = unknown_users
+        self.served = 0
+        self.rejected = 0
+        self.dummy_hashes = 0
+        self._lock = Lock()
+
+    def _consume(self, key, limit):
+        burst, per_minute = limit
+        return self.backend.consume(key, burst, per_minute / 60)
+
+    def allow(self, username, ip):
+        """Take a token for this username and client IP. Returns False if the attempt should be rejected."""
+
+        burst, per_minute = self.unknown_users
+        allowed = (
+            self.backend.tokens(f"login:unknown-users:{ip}", burst, per_minute / 60) >= 1
+            and self._consume(f"login:ip:{ip}", self.per_ip)
+            and self._consume(f"login:user:{username.strip().lower()}", self.per_username)
+        )
+        with self._lock:
+            if allowed:
+                self.served += 1
+            else:
+                self.rejected += 1
+        return allowed
+
+    def record_unknown_user(self, ip):
+        """
+        Take a token from the client IP's budget for dummy hashes, for an allowed attempt at a username that
+        doesn't exist. The dummy hash runs either way; an empty budget only rejects the IP's attempts after it.
+        """
+
+        self._consume(f"login:unknown-users:{ip}", self.unknown_users)
+        with self._lock:
+            self.dummy_hashes += 1
+
+    def clear(self):
+        """Forget every bucket and reset the counters."""
+
+        self.backend.clear()
+        with self._lock:
+            self.served = self.rejected = self.dummy_hashes = 0
+
+    def stats(self):
+        """Counters of served and rejected attempts, and of dummy hashes run."""
+
+        with self._lock:
+            return {
+                "served": self.served,
+                "rejected": self.rejected,
+                "dummy_hashes": self.dummy_hashes,
+            }
+
+
+def create_rate_limit_backend(name):
+    """Build the rate limit backend named in config. Only "memory" ships; shared backends plug in here."""
+
+    if name == "memory":
+        return MemoryRateLimitBackend()
+    raise ValueError(f"Unknown rate limit backend: {name}")
@@ -0,0 +1,157 @@
+import random
+import time
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, DisconnectionError, OperationalError
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the circuit breaker is open."""
+
+
+def is_transient_db_error(error):
+    """
+    True for database errors worth retrying: dropped or refused connections and other operational errors,
+    as opposed to errors in the query or data (integrity errors, bad SQL), which would just fail again.
+    """
+
+    if isinstance(error, (OperationalError, DisconnectionError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the database is down.
+
+    After `failure_threshold` transient failures in a row the breaker opens, and allow() returns False for
+    `reset_timeout` seconds, so requests get an immediate error instead of each waiting on a dead database.
+    After that the breaker is half-open: requests are let through again, the first success closes it and
+    the first failure opens it for another `reset_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._lock = Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self):
+        """True if a call to the database may go ahead."""
+
+        if self.state != self.OPEN:
+            return True
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def record_success(self):
+        # Checked without the lock first: this runs after every statement and is almost always a no-op.
+        if self.failures == 0 and self.opened_at is None:
+            return
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                # Tripping, or a half-open trial failed: (re)start the timeout.
+                if self.opened_at is None:
+                    self.times_opened += 1
+                self.opened_at = self.clock()
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.times_opened = 0
+            self.rejected = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class RetryPolicy:
+    """
+    Retries a callable on transient database errors, with exponential backoff and full jitter.
+
+    Attempt n (counting from 0) that fails is followed by a sleep of a random time between 0 and
+    min(max_delay, base_delay * 2 ** n), so clients retrying after the same blip spread out instead of
+    hitting the database together. Only use it for work that is safe to repeat, such as reads.
+    """
+
+    def __init__(self, attempts=3, base_delay=0.05, max_delay=1.0, sleep=time.sleep, random=random.random):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.random = random
+        self.retries = 0
+        self._lock = Lock()
+
+    def backoff(self, attempt):
+        """Seconds to wait after failed attempt number `attempt` (0-based)."""
+        return self.random() * min(self.max_delay, self.base_delay * 2**attempt)
+
+    def call(self, fn, breaker=None, before_retry=None):
+        """
+        Call fn() until it succeeds, raises a non-transient error or runs out of attempts.
+
+        With a breaker, raises CircuitOpenError instead of attempting while it is open. before_retry (e.g. a
+        session rollback) is called after each failed attempt, before sleeping.
+        """
+
+        for attempt in range(self.attempts):
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError()
+            try:
+                return fn()
+            except Exception as e:
+                if not is_transient_db_error(e) or attempt == self.attempts - 1:
+                    raise
+                if before_retry is not None:
+                    before_retry()
+                with self._lock:
+                    self.retries += 1
+                self.sleep(self.backoff(attempt))
+
+
+def install_circuit_breaker(engine, breaker):
+    """
+    Feed an engine's outcomes into a breaker: every statement that runs is a success, every transient
+    error (including failing to connect) is a failure. Works across every route without touching them.
+    """
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def on_success(*args):
+        breaker.record_success()
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        if context.is_disconnect or is_transient_db_error(context.sqlalchemy_exception):
+            breaker.record_failure()
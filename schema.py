@@ -0,0 +1,106 @@
+"""
+Creates and upgrades the database schema. Run explicitly, never at app import.
+
+A database with no schema_version table but a users table predates versioning and is treated as version 1
+(the original users + courts tables). UPGRADES[n] takes a database from version n - 1 to n; each step is
+committed and stamped on its own, so an interrupted upgrade can simply be re-run.
+
+Usage: python schema.py [--check]
+"""
+
+import argparse
+import os
+import sys
+
+from sqlalchemy import inspect, text
+
+from models import db, SchemaVersion, SchemaVersionError, SCHEMA_VERSION
+
+BASELINE_VERSION = 1
+
+
+def database_version():
+    """The version the database is at: None for an empty database, 1 for one created before versioning."""
+
+    tables = inspect(db.engine).get_table_names()
+    if SchemaVersion.__tablename__ in tables:
+        return db.session.execute(db.select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+    if "users" in tables:
+        return BASELINE_VERSION
+    return None
+
+
+def stamp(version):
+    """Record that the database is at version, and commit."""
+
+    row = db.session.get(SchemaVersion, 1)
+    if row is None:
+        db.session.add(SchemaVersion(id=1, version=version))
+    else:
+        row.version = version
+    db.session.commit()
+
+
+def upgrade_to_2(log):
+    """
+    Split courts into places + saved_courts, and add the tables and columns added alongside them:
+    users.location_lat/location_lng, geocode_results and place_rating_stats.
+    """
+
+    from migrations import backfill_place_rating_stats, split_courts_into_places
+
+    user_columns = {column["name"] for column in inspect(db.engine).get_columns("users")}
+    for column in ("location_lat", "location_lng"):
+        if column not in user_columns:
+            db.session.execute(text(f"ALTER TABLE users ADD COLUMN {column} FLOAT"))
+            log(f"Added users.{column}")
+    db.session.commit()
+
+    db.create_all()
+    split_courts_into_places.upgrade(db, log=log)
+    backfill_place_rating_stats.upgrade(db, log=log)
+
+
+UPGRADES = {2: upgrade_to_2}
+
+
+def upgrade(log=print):
+    """Bring the database up to SCHEMA_VERSION. Returns the version it started at."""
+
+    version = database_version()
+    if version is None:
+        db.create_all()
+        stamp(SCHEMA_VERSION)
+        log(f"Created schema at version {SCHEMA_VERSION}.")
+        return None
+    if version > SCHEMA_VERSION:
+        raise SchemaVersionError(f"Database schema is at version {version}, newer than this code's {SCHEMA_VERSION}.")
+
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        log(f"Upgrading schema to version {target}...")
+        UPGRADES[target](log)
+        stamp(target)
+
+    log(f"Schema is at version {SCHEMA_VERSION}.")
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report the database's version")
+    args = parser.parse_args()
+
+    # The schema may not exist yet, so don't let app startup check it.
+    os.environ.setdefault("SCHEMA_CHECK", "off")
+    from app import app
+
+    with app.app_context():
+        if args.check:
+            version = database_version()
+            print(f"Database schema is at version {version}, code expects {SCHEMA_VERSION}.")
+            sys.exit(0 if version == SCHEMA_VERSION else 1)
+        upgrade()
+
+
+if __name__ == "__main__":
+    main()
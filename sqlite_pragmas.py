@@ -0,0 +1,57 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+
+SQLITE_PROFILES = ("default", "benchmark")
+
+# Applied to every new SQLite connection. "default" only makes SQLite behave like the PostgreSQL the app
+# runs on in production: foreign keys enforced, and a writer waiting on a lock instead of failing at once.
+# "benchmark" also trades durability for speed, the way a tuned local database would be run: a write-ahead
+# log, so readers in other workers aren't blocked by a writer, synced at checkpoints rather than on every
+# commit, a 64 MiB page cache, temporary tables in memory and the database file memory-mapped.
+PRAGMAS = {
+    "default": (
+        ("foreign_keys", "ON"),
+        ("busy_timeout", "5000"),
+    ),
+    "benchmark": (
+        ("foreign_keys", "ON"),
+        ("busy_timeout", "5000"),
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", "-65536"),
+        ("temp_store", "MEMORY"),
+        ("mmap_size", "268435456"),
+    ),
+}
+
+
+def is_memory_database(url):
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def memory_engine_options():
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for an in-memory SQLite database. Every connection to one gets its own empty
+    database, so the engine hands out a single connection, shared by every thread.
+    """
+
+    return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+
+
+def install_sqlite_pragmas(engine, profile="default"):
+    """Run the profile's PRAGMAs on every connection the engine opens. Does nothing for other databases."""
+
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile: {profile}")
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, record):
+        cursor = dbapi_connection.cursor()
+        for name, value in PRAGMAS[profile]:
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
@@ -0,0 +1,130 @@
+/**
+ * Queues court operations (save/remove/rate) and sends them to /courts/batch together.
+ *
+ * Each operation is queued under a key. Queuing a new operation under a key that is still pending
+ * replaces the old one (e.g. several star clicks on the same court only send the last rating).
+ * The queue is flushed after `delay` milliseconds of quiet, once it holds `maxSize` operations,
+ * or when the page is unloaded.
+ */
+class CourtBatchQueue {
+  /**
+   * @param {number} [delay=400] - How long to wait for more clicks before sending the batch.
+   * @param {number} [maxSize=100] - Flush immediately once this many operations are queued (the server's limit).
+   */
+  constructor(delay = 400, maxSize = 100) {
+    this.delay = delay;
+    this.maxSize = maxSize;
+    this.pending = new Map();
+    this.timer = null;
+  }
+
+  /**
+   * Queues an operation and returns a promise for its result.
+   *
+   * The promise resolves with the server's result for the operation (e.g. {status: 201, id: 7}),
+   * with {status: "superseded"} if a later operation replaced it, or with {status: "sent"} if it was
+   * sent by flushOnExit, whose results are never seen. It rejects if the request fails
+   * or the server returns an error status for the operation.
+   *
+   * @param {string} key - Identifies what the operation acts on, e.g. "court:12" or "place:ChIJ...".
+   * @param {object} operation - The operation to send, e.g. {op: "rate", court_id: 12, rating: 4}.
+   * @returns {Promise<object>}
+   */
+  enqueue(key, operation) {
+    const previous = this.pending.get(key);
+    if (previous) {
+      previous.resolve({ status: "superseded" });
+      this.pending.delete(key);
+    }
+
+    return new Promise((resolve, reject) => {
+      this.pending.set(key, { operation, resolve, reject });
+      if (this.pending.size >= this.maxSize) {
+        this.flush();
+      } else {
+        clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.flush(), this.delay);
+      }
+    });
+  }
+
+  /**
+   * Drops a pending operation before it is sent.
+   *
+   * @param {string} key - The key the operation was queued under.
+   * @returns {boolean} true if an operation was pending and has been dropped.
+   */
+  cancel(key) {
+    const entry = this.pending.get(key);
+    if (!entry) return false;
+    entry.resolve({ status: "cancelled" });
+    this.pending.delete(key);
+    return true;
+  }
+
+  /**
+   * Sends every pending operation in one request and settles their promises with the per-item results.
+   *
+   * @async
+   * @returns {Promise<void>}
+   */
+  async flush() {
+    clearTimeout(this.timer);
+    this.timer = null;
+    if (this.pending.size === 0) return;
+
+    const entries = [...this.pending.values()];
+    this.pending.clear();
+
+    try {
+      const response = await axios.post(
+        "/courts/batch",
+        { operations: entries.map((entry) => entry.operation) },
+        { headers: { "Content-Type": "application/json" } }
+      );
+      const results = response.data.results;
+      entries.forEach((entry, index) => {
+        const result = results[index];
+        if (result && result.status < 400) {
+          entry.resolve(result);
+        } else {
+          entry.reject(new Error(result ? result.error : "Missing result"));
+        }
+      });
+    } catch (e) {
+      entries.forEach((entry) => entry.reject(e));
+    }
+  }
+
+  /**
+   * Sends any pending operations with navigator.sendBeacon so they survive the page being closed.
+   *
+   * Results are not available in this case, so each operation's promise resolves with {status: "sent"}
+   * (or rejects if the browser refuses to queue the beacon) rather than being left pending.
+   */
+  flushOnExit() {
+    clearTimeout(this.timer);
+    this.timer = null;
+    if (this.pending.size === 0) return;
+
+    const entries = [...this.pending.values()];
+    this.pending.clear();
+    const body = new Blob([JSON.stringify({ operations: entries.map((entry) => entry.operation) })], {
+      type: "application/json",
+    });
+    if (navigator.sendBeacon("/courts/batch", body)) {
+      entries.forEach((entry) => entry.resolve({ status: "sent" }));
+    } else {
+      const error = new Error("The browser did not send the queued operations");
+      entries.forEach((entry) => entry.reject(error));
+    }
+  }
+}
+
+const courtBatch = new CourtBatchQueue();
+
+// pagehide rather than visibilitychange: switching tabs hides the page too, and operations queued then
+// should still go through flush() so their results come back.
+window.addEventListener("pagehide", () => {
+  courtBatch.flushOnExit();
+});
@@ -1,27 +1,26 @@
 /**
- * Async function called by removeCourtUi function. Takes in a courtId and makes a Flask API request to remove the court from the database.
+ * Async function called by removeCourtUi function. Takes in a courtId and queues a request to remove the court from the database.
+ * Queued operations are sent together to /courts/batch. A pending rating for the same court is replaced by the removal.
  *
  * @param {number} courtId - the id of the court to remove from the database.
  * @returns {Promise<void>}
  */
 async function removeCourtData(courtId) {
   const data = {
+    op: "remove",
     court_id: courtId,
   };
 
   try {
-    const response = await axios.post("/remove_court", data, {
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
+    await courtBatch.enqueue(`court:${courtId}`, data);
   } catch (e) {
     showError("Error removing court. Please try again!");
   }
 }
 
 /**
- * Runs when a star rating is clicked. Takes in a courtId and rating and makes a Flask API request to update the court's rating in the database.
+ * Runs when a star rating is clicked. Takes in a courtId and rating and queues a request to update the court's rating in the database.
+ * Queued operations are sent together to /courts/batch, and repeat clicks on the same court only send the latest rating.
  *
  * @param {number} courtId - the id of the court to update the rating in the database.
  * @param {number} rating - the rating the user selected to add to the court.
@@ -29,16 +28,13 @@ async function removeCourtData(courtId) {
  */
 async function updateCourtRating(courtId, rating) {
   const data = {
+    op: "rate",
     court_id: courtId,
     rating: rating,
   };
 
   try {
-    const response = await axios.post("/update_court_rating", data, {
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
+    await courtBatch.enqueue(`court:${courtId}`, data);
   } catch (e) {
     showError("Error updating rating. Please try again!");
   }
@@ -11,16 +11,56 @@ if (disclaimerLink) {
   });
 }
 
-// Initialize global variables and get data for saved court mapping.
+// Initialize global variables. savedCourtMapping maps google_maps_place_id -> saved court id,
+// communityRatings maps google_maps_place_id -> rating stats for the current results.
 let map;
 let infoWindow;
 let markers = [];
-const courtDataEl = document.getElementById("court_data");
-let savedCourts = JSON.parse(courtDataEl.dataset.courts);
-const savedCourtMapping = {};
-savedCourts.forEach((sc) => {
-  savedCourtMapping[sc.google_maps_place_id] = sc.id;
-});
+let savedCourtMapping = {};
+let communityRatings = {};
+
+/**
+ * Loads the user's saved court ids from the server into savedCourtMapping.
+ *
+ * The endpoint sends an ETag, so repeat visits are revalidated by the browser and usually come back as a 304.
+ *
+ * @async
+ * @returns {Promise<void>}
+ */
+async function loadSavedCourtIds() {
+  try {
+    // fetch rather than axios: this runs at module load, before the deferred axios script has executed.
+    const response = await fetch("/saved_court_ids", { credentials: "same-origin" });
+    if (!response.ok) throw new Error(`Request failed with status ${response.status}`);
+    savedCourtMapping = await response.json();
+  } catch (e) {
+    showError("An error occurred while loading your saved courts. Please refresh the page.");
+  }
+}
+
+/**
+ * Loads the community rating stats for a set of places into communityRatings.
+ *
+ * Failures are ignored: the ratings are only shown as extra detail in the info windows.
+ *
+ * @async
+ * @param {string[]} placeIds - The google place ids of the search results.
+ * @returns {Promise<void>}
+ */
+async function loadCommunityRatings(placeIds) {
+  communityRatings = {};
+  if (!placeIds.length) return;
+
+  const params = new URLSearchParams();
+  placeIds.forEach((placeId) => params.append("place_id", placeId));
+  try {
+    const response = await fetch(`/places/ratings?${params}`, { credentials: "same-origin" });
+    if (!response.ok) return;
+    communityRatings = (await response.json()).ratings;
+  } catch (e) {
+    communityRatings = {};
+  }
+}
 
 /**
  * Initializes the Google Map and its UI components.
@@ -33,12 +73,20 @@ savedCourts.forEach((sc) => {
  * @returns {Promise<void>} A promise that resolves when the map is fully initialized.
  */
 async function initMap() {
-  const center = { lat: 39.8283, lng: -98.5795 };
+  const mapEl = document.getElementById("map");
+  // Center on the user's saved location (geocoded when they saved it), otherwise on the United States.
+  const hasUserCenter = "centerLat" in mapEl.dataset;
+  const center = hasUserCenter
+    ? {
+        lat: parseFloat(mapEl.dataset.centerLat),
+        lng: parseFloat(mapEl.dataset.centerLng),
+      }
+    : { lat: 39.8283, lng: -98.5795 };
 
   try {
     const { Map, InfoWindow } = await google.maps.importLibrary("maps");
-    map = new Map(document.getElementById("map"), {
-      zoom: 4,
+    map = new Map(mapEl, {
+      zoom: hasUserCenter ? 12 : 4,
       center,
       mapId: "c2c7ec2d8b2c125e",
       mapTypeId: "hybrid",
@@ -91,68 +139,71 @@ function displaySearchFeedback(
 /**
  * Performs a geocoding search based on user input and displays search feedback.
  *
- * This function retrieves the search term from the input element, uses the Geocoder to get location details, and then calls FindCourts to locate basketball courts near the search location.
+ * This function retrieves the search term from the input element, asks the server to geocode it (results are cached
+ * server-side and shared between users), and then calls FindCourts to locate basketball courts near the search location.
  *
  * @async
- * @param {object} Geocoder - The geocoding module imported from Google Maps.
  * @param {HTMLElement} searchArea - The container where search feedback messages will be displayed.
  * @param {HTMLInputElement} searchInput - The input element containing the search term.
  * @returns {Promise<void>}
  */
-async function performSearch(Geocoder, searchArea, searchInput) {
+async function performSearch(searchArea, searchInput) {
   const inputValue = searchInput.value.trim();
   if (inputValue.length < 1) {
     displaySearchFeedback(searchArea, "Please enter a search term.");
     return;
   }
-
-  const geocoder = new google.maps.Geocoder();
-  geocoder.geocode({ address: inputValue }, async (results, status) => {
-    if (status === "OK") {
-      const searchPlace = results[0].geometry.location;
-      const amountOfCourts = await findCourts(searchPlace);
-      displaySearchFeedback(
-        searchArea,
-        `Showing ${amountOfCourts} results near: ${results[0].formatted_address}`,
-        "info"
-      );
-    } else if (status === "ZERO_RESULTS") {
-      displaySearchFeedback(
-        searchArea,
-        "No results found. Please check the address and try again."
-      );
-    } else if (status === "OVER_QUERY_LIMIT") {
-      displaySearchFeedback(
-        searchArea,
-        "Daily request limit for Google Maps API reached. Sorry for the inconvenience! Please try again tomorrow. (READ THE DISCLAIMER AT THE BOTTOM).",
-        "error",
-        7000
-      );
-    } else {
-      displaySearchFeedback(
-        searchArea,
-        "Something went wrong, please try again!"
-      );
-    }
-  });
   searchInput.value = "";
+
+  let response;
+  try {
+    const params = new URLSearchParams({ query: inputValue });
+    response = await fetch(`/geocode?${params}`, { credentials: "same-origin" });
+  } catch (e) {
+    displaySearchFeedback(searchArea, "Something went wrong, please try again!");
+    return;
+  }
+
+  if (response.ok) {
+    const result = await response.json();
+    const amountOfCourts = await findCourts({ lat: result.lat, lng: result.lng });
+    displaySearchFeedback(
+      searchArea,
+      `Showing ${amountOfCourts} results near: ${result.formatted_address}`,
+      "info"
+    );
+  } else if (response.status === 404) {
+    displaySearchFeedback(
+      searchArea,
+      "No results found. Please check the address and try again."
+    );
+  } else if (response.status === 429) {
+    displaySearchFeedback(
+      searchArea,
+      "Daily request limit for Google Maps API reached. Sorry for the inconvenience! Please try again tomorrow. (READ THE DISCLAIMER AT THE BOTTOM).",
+      "error",
+      7000
+    );
+  } else {
+    displaySearchFeedback(
+      searchArea,
+      "Something went wrong, please try again!"
+    );
+  }
 }
 
 /**
- * Initializes the search bar functionality by importing the Geocoder library
- * and setting up the event listener on the search button.
+ * Initializes the search bar functionality by setting up the event listener on the search button.
  *
- * @async
- * @returns {Promise<void>}
+ * @returns {void}
  */
-async function initSearchBar() {
-  const { Geocoder } = await google.maps.importLibrary("geocoding");
+function initSearchBar() {
   const searchArea = document.getElementById("search-area");
   const searchInput = document.getElementById("search-bar-input");
   const searchButton = document.getElementById("search-bar-btn");
 
   searchButton.addEventListener("click", () => {
-    performSearch(Geocoder, searchArea, searchInput);
+    performSearch(searchArea, searchInput);
   });
 }
 
@@ -170,7 +221,10 @@ function clearMarkers() {
 }
 
 /**
- * Saves the provided court data to the server and updates local savedCourts data.
+ * Queues a save of the provided court and updates local savedCourtMapping data.
+ *
+ * The save is sent with any other queued clicks in one /courts/batch request. Until it completes,
+ * savedCourtMapping holds the pending promise so a quick un-save can wait for (or cancel) it.
  *
  * @async
  * @param {object} court - The court object containing details like displayName, id, formattedAddress, and googleMapsURI.
@@ -178,53 +232,53 @@ function clearMarkers() {
  */
 async function saveCourt(court) {
   const data = {
+    op: "save",
     court_name: court.displayName,
     google_maps_place_id: court.id,
     address: court.formattedAddress,
     google_maps_url: court.googleMapsURI,
+    lat: court.location.lat,
+    lng: court.location.lng,
   };
 
+  const saved = courtBatch.enqueue(`place:${court.id}`, data);
+  savedCourtMapping[court.id] = saved;
   try {
-    const response = await axios.post("/save_court", data, {
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
-
-    const newCourtId = response.data.id;
-    savedCourts.push({
-      google_maps_place_id: court.id,
-      id: newCourtId,
-    });
-    savedCourtMapping[court.id] = newCourtId;
+    const result = await saved;
+    if (savedCourtMapping[court.id] === saved) {
+      savedCourtMapping[court.id] = result.id;
+    }
   } catch (e) {
+    if (savedCourtMapping[court.id] === saved) {
+      delete savedCourtMapping[court.id];
+    }
     showError("An error occurred while saving the court. Please try again.");
   }
 }
 
 /**
- * Removes a saved court from the server and updates local savedCourts data.
+ * Queues removal of a saved court and updates local savedCourtMapping data.
+ *
+ * If the court's save hasn't been sent yet, the save is simply cancelled and nothing is sent.
  *
  * @async
  * @param {object} court - The court object representing the court to remove.
  * @returns {Promise<void>}
  */
 async function removeCourt(court) {
-  const savedCourtId = savedCourtMapping[court.id];
-  const data = {
-    court_id: savedCourtId,
-  };
+  const key = `place:${court.id}`;
+  if (courtBatch.cancel(key)) {
+    delete savedCourtMapping[court.id];
+    return;
+  }
 
+  let savedCourtId = savedCourtMapping[court.id];
   try {
-    const response = await axios.post("/remove_court", data, {
-      headers: {
-        "Content-Type": "application/json",
-      },
-    });
+    if (savedCourtId instanceof Promise) {
+      savedCourtId = (await savedCourtId).id;
+    }
     delete savedCourtMapping[court.id];
-    savedCourts = savedCourts.filter(
-      (sc) => sc.google_maps_place_id !== court.id
-    );
+    await courtBatch.enqueue(key, { op: "remove", court_id: savedCourtId });
   } catch (e) {
     showError("An error occurred while removing the court. Please try again.");
   }
@@ -279,14 +333,22 @@ function createMarkerInfoWindow(court, marker) {
   infoWindowMapsLink.textContent = "View on Google Maps";
   infoWindowMapsLink.classList.add("info-window-maps-link");
 
+  const infoWindowRating = document.createElement("p");
+  infoWindowRating.classList.add("info-window-rating");
+  const stats = communityRatings[court.id];
+  if (stats && stats.rating_count) {
+    const label = stats.rating_count === 1 ? "rating" : "ratings";
+    infoWindowRating.textContent = `Community rating: ${stats.average.toFixed(1)} / 5 (${stats.rating_count} ${label})`;
+  } else {
+    infoWindowRating.textContent = "No community ratings yet";
+  }
+
   const infoWindowSave = document.createElement("button");
   infoWindowSave.setAttribute("type", "button");
   infoWindowSave.ariaLabel = "Save Court";
   infoWindowSave.classList.add("info-window-save-btn");
 
-  const isSaved = savedCourts.some(
-    (savedCourt) => savedCourt.google_maps_place_id === court.id
-  );
+  const isSaved = court.id in savedCourtMapping;
   if (isSaved) {
     infoWindowSave.innerHTML = "<i class='fa-solid fa-heart'></i>";
   } else {
@@ -299,6 +361,7 @@ function createMarkerInfoWindow(court, marker) {
 
   infoWindowContent.append(
     infoWindowAddress,
+    infoWindowRating,
     infoWindowMapsLink,
     infoWindowSave
   );
@@ -349,6 +412,34 @@ function createMarkerElement(court, index, AdvancedMarkerElement, pin) {
   return marker;
 }
 
+/**
+ * Asks the server for basketball courts near a location.
+ *
+ * The server proxies the Places text search and caches results for nearby locations, so repeat searches
+ * of the same area don't use up the Google Maps quota.
+ *
+ * @async
+ * @param {{lat: number, lng: number}} searchPlace - The location to search around.
+ * @returns {Promise<object[]>} Places with id, displayName, formattedAddress, googleMapsURI and location ({lat, lng}).
+ * @throws {Error} With a `status` property holding the HTTP status when the request fails.
+ */
+async function searchPlaces(searchPlace) {
+  const params = new URLSearchParams({
+    lat: searchPlace.lat,
+    lng: searchPlace.lng,
+  });
+  const response = await fetch(`/places/search?${params}`, {
+    credentials: "same-origin",
+  });
+  if (!response.ok) {
+    const error = new Error(`Places search failed with status ${response.status}`);
+    error.status = response.status;
+    throw error;
+  }
+  const data = await response.json();
+  return data.places;
+}
+
 /**
  * Searches for basketball courts near a given location, creates markers for each result,
  * and adjusts the map view.
@@ -362,29 +453,15 @@ async function findCourts(searchPlace) {
   // Empty markers from previous search;
   clearMarkers();
 
-  const { Place } = await google.maps.importLibrary("places");
   const { AdvancedMarkerElement, PinElement } = await google.maps.importLibrary(
     "marker"
   );
 
-  const requestCourts = {
-    textQuery: "Basketball Court",
-    fields: ["displayName", "location", "formattedAddress", "googleMapsURI"],
-    includedType: "park",
-    locationBias: searchPlace,
-    language: "en-US",
-    maxResultCount: 100,
-    region: "us",
-    useStrictTypeFiltering: false,
-  };
-
   let places;
   try {
-    const result = await Place.searchByText(requestCourts);
-    places = result.places;
+    places = await searchPlaces(searchPlace);
   } catch (error) {
-    const errorStr = error.toString();
-    if (errorStr.includes("RESOURCE_EXHAUSTED")) {
+    if (error.status === 429) {
       showError(
         "The daily request limit for Google Maps API may have been reached. Sorry for the inconvenience! Please try again tomorrow. (READ THE DISCLAIMER AT THE BOTTOM).",
         "warning",
@@ -401,6 +478,8 @@ async function findCourts(searchPlace) {
   }
 
   if (places && places.length) {
+    loadCommunityRatings(places.map((court) => court.id));
+
     const { LatLngBounds } = await google.maps.importLibrary("core");
     const bounds = new LatLngBounds();
 
@@ -427,4 +506,11 @@ async function findCourts(searchPlace) {
   }
 }
 
+loadSavedCourtIds();
 initMap();
+
+// Saves sent by beacon when the page was hidden come back without their court ids, so a page restored
+// from the back/forward cache reloads them.
+window.addEventListener("pageshow", (event) => {
+  if (event.persisted) loadSavedCourtIds();
+});
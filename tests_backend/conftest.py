@@ -1,8 +1,175 @@
+import contextvars
 import sys
 import os
 
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from flask.testing import FlaskClient
+from flask_sqlalchemy.session import Session
+from sqlalchemy.pool import NullPool
+
 #Adds the project root to sys.path so that 'app' can be imported no matter where test files are.
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+
+# The `database` fixture builds the schema, so skip the startup schema version check.
+os.environ.setdefault("SCHEMA_CHECK", "off")
+
+# An in-memory SQLite database by default, so the suite runs without a database server. Set TEST_DATABASE_URL
+# to run it against PostgreSQL (postgresql:///basketball_court_finder_test) or a SQLite file instead.
+# DATABASE_URL is never used: it names the app's real database, and the suite drops every table.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "sqlite://")
+
+
+def worker_database_url(url, worker):
+    """The database for a pytest-xdist worker ("gw0", "gw1", ...): the test database's name plus the worker id."""
+
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        if not url.database or url.database == ":memory:":
+            return url
+        root, extension = os.path.splitext(url.database)
+        return url.set(database=f"{root}_{worker}{extension}")
+    return url.set(database=f"{url.database}_{worker}")
+
+
+def create_database_if_missing(url):
+    """Create a PostgreSQL database (SQLite creates its files on connect)."""
+
+    if url.get_backend_name() != "postgresql":
+        return
+    engine = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT", poolclass=NullPool)
+    with engine.connect() as connection:
+        exists = connection.scalar(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": url.database})
+        if not exists:
+            connection.execute(text(f'CREATE DATABASE "{url.database}"'))
+    engine.dispose()
+
+
+# Under pytest-xdist every worker gets its own database, so their schemas and data never collide.
+# This runs before any test module imports app, which reads DATABASE_URL (and .env doesn't override it).
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+if os.environ.get("PYTEST_XDIST_WORKER"):
+    worker_url = worker_database_url(os.environ["DATABASE_URL"], os.environ["PYTEST_XDIST_WORKER"])
+    create_database_if_missing(worker_url)
+    os.environ["DATABASE_URL"] = worker_url.render_as_string(hide_password=False)
+
+
+class ConnectionBoundSession(Session):
+    """Flask-SQLAlchemy session that runs everything on its `bind`; the stock one picks each table's engine."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return bind if bind is not None else self.bind
+
+
+class FreshContextClient(FlaskClient):
+    """
+    Test client that handles every request in a fresh app context, as the server does. Otherwise requests
+    reuse the test's app context, so they share its db.session and the session is never removed after them.
+
+    Afterwards the test's own objects are expired, so it reads what the request wrote.
+    """
+
+    def run_wsgi_app(self, environ, buffered=False):
+        from models import db
+
+        response = contextvars.Context().run(super().run_wsgi_app, environ, buffered)
+        db.session.expire_all()
+        return response
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    Creates the schema once for the whole test session, replacing whatever an earlier run left behind.
+    Tests get isolated from each other by db_session rather than by rebuilding it.
+    """
+    from app import app
+    from models import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return db
+
+
+@pytest.fixture
+def db_session(database):
+    """
+    Runs the test inside a transaction on one connection that is rolled back afterwards.
+
+    db.session is bound to that connection, and every transaction the session begins (the test's own and
+    the app's, which removes the session after each request) is a SAVEPOINT inside it. Commits release
+    the savepoint and rollbacks return to it, so the code under test behaves as usual but nothing it does
+    outlives the test.
+
+    Test client requests run in their own app context (see FreshContextClient), so each one starts with
+    a new session, like it would in production.
+    """
+    from app import app
+    from models import db
+
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        if connection.dialect.name == "sqlite":
+            # pysqlite only emits BEGIN before the first write, so the first SAVEPOINT would otherwise
+            # start the real transaction and releasing it would commit.
+            connection.exec_driver_sql("BEGIN")
+        app_session = db.session
+        db.session = db._make_scoped_session(
+            options=dict(class_=ConnectionBoundSession, bind=connection, join_transaction_mode="create_savepoint")
+        )
+        client_class = app.test_client_class
+        app.test_client_class = FreshContextClient
+
+        yield db.session
+
+        app.test_client_class = client_class
+        db.session.remove()
+        db.session = app_session
+        transaction.rollback()
+        connection.close()
+
+
+class QueryBudget:
+    """
+    Context manager that fails the test if the code inside it runs more than `limit` SQL statements,
+    listing each statement it ran. Counts statements on every engine, except the savepoints db_session
+    wraps the session's transactions in (the app itself never uses them).
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(Engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        event.remove(Engine, "before_cursor_execute", self._record)
+        if exc_type is None and len(self.statements) > self.limit:
+            listing = "\n".join(
+                f"  {number}. {' '.join(statement.split())}  {parameters!r}"
+                for number, (statement, parameters) in enumerate(self.statements, 1)
+            )
+            pytest.fail(f"{len(self.statements)} SQL statements, budget {self.limit}:\n{listing}", pytrace=False)
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Asserts a query budget around test client requests, to catch N+1 regressions:
+
+        with query_budget(2):
+            client.get("/saved_court_ids")
+    """
+    return QueryBudget
@@ -0,0 +1,114 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, url_for
+
+import assets
+from assets import StaticAssets, build
+
+
+def log(message):
+    pass
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    static = tmp_path / "static"
+    (static / "js").mkdir(parents=True)
+    (static / "images").mkdir()
+    (static / "js" / "search.js").write_text("function search() { return 'court'; }\n" * 50)
+    (static / "js" / "tiny.js").write_text("1")
+    (static / "images" / "logo.png").write_bytes(b"\x89PNG" + bytes(range(256)))
+    return static
+
+
+def make_app(static_dir):
+    app = Flask(__name__, static_folder=str(static_dir))
+    StaticAssets(app)
+    return app
+
+
+def test_build_fingerprints_and_compresses(static_dir):
+    files = build(str(static_dir), log=log)
+
+    search = files["js/search.js"]
+    assert search["path"].startswith("js/search.") and search["path"].endswith(".js")
+    assert "gzip" in search["encodings"]
+    hashed = static_dir / "dist" / search["path"]
+    assert hashed.read_bytes() == (static_dir / "js" / "search.js").read_bytes()
+    assert gzip.decompress((static_dir / "dist" / (search["path"] + ".gz")).read_bytes()) == hashed.read_bytes()
+    # Compression that doesn't pay (tiny files) and binary formats are skipped.
+    assert files["js/tiny.js"]["encodings"] == []
+    assert files["images/logo.png"]["encodings"] == []
+    assert json.loads((static_dir / "dist" / "manifest.json").read_text())["files"] == files
+
+    # A changed file gets a new name; the old build is replaced, not nested.
+    (static_dir / "js" / "search.js").write_text("function search() {}\n" * 50)
+    rebuilt = build(str(static_dir), log=log)
+    assert rebuilt["js/search.js"]["path"] != search["path"]
+    assert not hashed.exists()
+    assert "dist/manifest.json" not in rebuilt
+
+
+def test_build_writes_brotli_when_installed(static_dir):
+    brotli = pytest.importorskip("brotli")
+    files = build(str(static_dir), log=log)
+
+    search = files["js/search.js"]
+    assert search["encodings"] == ["br", "gzip"]
+    compressed = (static_dir / "dist" / (search["path"] + ".br")).read_bytes()
+    assert brotli.decompress(compressed) == (static_dir / "js" / "search.js").read_bytes()
+
+
+def test_static_urls_and_encodings(static_dir, monkeypatch):
+    monkeypatch.setattr(assets, "brotli", None)
+    files = build(str(static_dir), log=log)
+    search = files["js/search.js"]
+    # Stand in for the Brotli build: serving only needs the file.
+    (static_dir / "dist" / (search["path"] + ".br")).write_bytes(b"brotli bytes")
+    search["encodings"] = ["br", "gzip"]
+    (static_dir / "dist" / "manifest.json").write_text(json.dumps({"files": files}))
+
+    app = make_app(static_dir)
+    with app.test_request_context():
+        url = url_for("static", filename="js/search.js")
+    assert url == f"/static/dist/{search['path']}"
+
+    client = app.test_client()
+    original = (static_dir / "js" / "search.js").read_bytes()
+    for accept, encoding, body in [
+        ("gzip, deflate, br", "br", b"brotli bytes"),
+        ("gzip;q=1.0, br;q=0.5", "gzip", None),
+        ("", None, original),
+        ("identity", None, original),
+    ]:
+        response = client.get(url, headers={"Accept-Encoding": accept})
+        assert response.status_code == 200
+        assert response.content_encoding == encoding
+        assert response.mimetype == "text/javascript"
+        assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+        assert "Accept-Encoding" in response.vary
+        if encoding == "gzip":
+            assert gzip.decompress(response.data) == original
+        else:
+            assert response.data == body
+        response.close()
+
+    # Files outside the build keep Flask's default handling.
+    response = client.get("/static/js/search.js", headers={"Accept-Encoding": "gzip"})
+    assert response.content_encoding is None
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+    response.close()
+
+
+def test_plain_urls_without_build_or_in_debug(static_dir):
+    app = make_app(static_dir)
+    with app.test_request_context():
+        assert url_for("static", filename="js/search.js") == "/static/js/search.js"
+
+    build(str(static_dir), log=log)
+    app = make_app(static_dir)
+    app.debug = True
+    with app.test_request_context():
+        assert url_for("static", filename="js/search.js") == "/static/js/search.js"
@@ -1,49 +1,19 @@
 import pytest
 from sqlalchemy.exc import IntegrityError
 from app import app
-from models import db, Court, User
+from models import db, Court, User, Place, PlaceRatingStats
 
 
 
-@pytest.fixture(autouse=True)
-def session_scope():
-    """
-    Provides an isolated database session per test.
-
-    Opens a connection and begins a transaction, assigns a scoped session to 'db.session',
-    and rolls back and cleans up after the test.
-    """
-    with app.app_context():
-        connection = db.engine.connect()
-        transaction = connection.begin()
-        options = dict(bind=connection, binds={})
-        session = db._make_scoped_session(options=options)
-        db.session = session
-
-        yield session
-
-        transaction.rollback()
-        connection.close()
-        session.remove()
+# Every test runs in its own rolled-back transaction on the session-wide schema (see conftest.py).
+pytestmark = pytest.mark.usefixtures("db_session")
 
 
 @pytest.fixture()
 def test_app():
-    """
-    Configures the Flask app for testing with a clean test database.
-
-    Sets the test database URI and testing mode, drops and recreates all tables,
-    and cleans up the session and engine after tests.
-    """
-    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql:///basketball_court_finder_test"
+    """Configures the Flask app for testing."""
     app.config["TESTING"] = True
-    with app.app_context():
-        db.drop_all()
-        db.create_all()
-    yield app
-    with app.app_context():
-        db.session.remove()
-        db.engine.dispose()
+    return app
 
 
 @pytest.fixture
@@ -114,3 +84,144 @@ def test_court_model_rating_constraint(client):
     with pytest.raises(IntegrityError):
         db.session.commit()
     db.session.rollback()
+
+
+def test_court_model_unique_place_per_user(client):
+    user = User.register(
+        username="uniqueuser",
+        password="password",
+        email="unique@example.com",
+        first_name="Unique",
+        last_name="User",
+        bio="",
+        location="Test Town",
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    for _ in range(2):
+        db.session.add(
+            Court(
+                court_name="Unique Court",
+                google_maps_place_id="unique123",
+                address="123 Unique Rd",
+                google_maps_url="https://maps.google.com/?q=123+Unique+Rd",
+                user_id=user.id,
+            )
+        )
+
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_court_model_upsert_many(client):
+    user = User.register(
+        username="upsertuser",
+        password="password",
+        email="upsert@example.com",
+        first_name="Upsert",
+        last_name="User",
+        bio="",
+        location="Test Town",
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    court = {
+        "court_name": "Upsert Court",
+        "google_maps_place_id": "upsert123",
+        "address": "123 Upsert Rd",
+        "google_maps_url": "https://maps.google.com/?q=123+Upsert+Rd",
+    }
+    first = Court.upsert_many(user.id, [court])
+    db.session.commit()
+    second = Court.upsert_many(user.id, [court, dict(court, google_maps_place_id="upsert456")])
+    db.session.commit()
+
+    court_id, created = first["upsert123"]
+    assert created
+    assert second["upsert123"] == (court_id, False)
+    assert second["upsert456"][1]
+    assert Court.query.filter_by(user_id=user.id).count() == 2
+
+
+def test_saved_courts_share_a_place(client):
+    users = [
+        User.register(
+            username=f"shareuser{i}",
+            password="password",
+            email=f"share{i}@example.com",
+            first_name="Share",
+            last_name="User",
+            bio="",
+            location="Test Town",
+        )
+        for i in range(2)
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+
+    court = {
+        "court_name": "Shared Court",
+        "google_maps_place_id": "shared123",
+        "address": "123 Shared Rd",
+        "google_maps_url": "https://maps.google.com/?q=123+Shared+Rd",
+    }
+    db.session.add(Court(user_id=users[0].id, **court))
+    db.session.commit()
+    Court.upsert_many(users[1].id, [court])
+    db.session.commit()
+
+    assert Place.query.filter_by(id="shared123").count() == 1
+    saved = Court.query.filter_by(google_maps_place_id="shared123").all()
+    assert len(saved) == 2
+    assert all(court.serialize()["court_name"] == "Shared Court" for court in saved)
+
+
+def test_place_rating_stats_follow_saves_and_ratings(client):
+    users = [
+        User.register(
+            username=f"statsuser{i}",
+            password="password",
+            email=f"stats{i}@example.com",
+            first_name="Stats",
+            last_name="User",
+            bio="",
+            location="Test Town",
+        )
+        for i in range(3)
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+
+    court = {
+        "court_name": "Stats Court",
+        "google_maps_place_id": "stats123",
+        "address": "123 Stats Rd",
+        "google_maps_url": "https://maps.google.com/?q=123+Stats+Rd",
+    }
+    court_ids = [Court.upsert_many(user.id, [court])["stats123"][0] for user in users]
+    Court.upsert_many(users[0].id, [court])
+    db.session.commit()
+
+    Court.rate_owned(court_ids[0], users[0].id, 5)
+    Court.rate_owned(court_ids[1], users[1].id, 2)
+    Court.rate_owned(court_ids[1], users[1].id, 4)
+    Court.rate_owned(court_ids[2], users[2].id, 3)
+    assert Court.rate_owned(court_ids[2], users[0].id, 1) is None
+    Court.delete_owned(court_ids[2], users[2].id)
+    db.session.commit()
+
+    stats = PlaceRatingStats.for_places(["stats123", "unsaved"])
+    assert list(stats) == ["stats123"]
+    assert stats["stats123"] == {
+        "average": 4.5,
+        "rating_count": 2,
+        "save_count": 2,
+        "histogram": [0, 0, 0, 0, 1, 1],
+    }
+
+    PlaceRatingStats.rebuild()
+    db.session.commit()
+    assert PlaceRatingStats.for_places(["stats123"]) == stats
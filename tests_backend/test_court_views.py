@@ -1,47 +1,20 @@
 import pytest
-from app import app
-from models import db, User, Court
+from app import app, clear_caches, fragment_cache, places_search
+from places import StubPlacesProvider
+from geocoding import StubGeocoder
+from models import db, User, Court, GeocodeResult
 
 
-@pytest.fixture(autouse=True)
-def session_scope():
-    """
-    Provides an isolated database session per test.
-
-    Opens a connection and begins a transaction, assigns a scoped session to 'db.session',
-    and rolls back and cleans up after the test.
-    """
-    with app.app_context():
-        connection = db.engine.connect()
-        transaction = connection.begin()
-        options = dict(bind=connection, binds={})
-        session = db._make_scoped_session(options=options)
-        db.session = session
-
-        yield session
-
-        transaction.rollback()
-        connection.close()
-        session.remove()
+# Every test runs in its own rolled-back transaction on the session-wide schema (see conftest.py).
+pytestmark = pytest.mark.usefixtures("db_session")
 
 
 @pytest.fixture()
 def test_app():
-    """
-    Configures the Flask app for testing with a clean test database.
-
-    Sets the test database URI and testing mode, drops and recreates all tables,
-    and cleans up the session and engine after tests.
-    """
-    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql:///basketball_court_finder_test"
+    """Configures the Flask app for testing."""
     app.config["TESTING"] = True
-    with app.app_context():
-        db.drop_all()
-        db.create_all()
-    yield app
-    with app.app_context():
-        db.session.remove()
-        db.engine.dispose()
+    clear_caches()
+    return app
 
 
 @pytest.fixture
@@ -59,7 +32,7 @@ def login_test_user(client, user):
         sess["curr_user"] = user.id
 
 
-def test_save_court(client):
+def test_save_court(client, query_budget):
     user = User.register(
         username="courtuser",
         password="password",
@@ -79,14 +52,15 @@ def test_save_court(client):
         "address": "123 Court Ave",
         "google_maps_url": "https://maps.google.com/?q=123+Court+Ave",
     }
-    response = client.post("/save_court", json=data)
+    with query_budget(4):
+        response = client.post("/save_court", json=data)
     assert response.status_code == 201
     json_data = response.get_json()
     assert "message" in json_data
     assert json_data["message"] == "Court saved successfully"
 
 
-def test_remove_court(client):
+def test_remove_court(client, query_budget):
     user = User.register(
         username="removecourt",
         password="password",
@@ -110,16 +84,18 @@ def test_remove_court(client):
     db.session.add(court)
     db.session.commit()
 
-    data = {"court_id": court.id}
-    response = client.post("/remove_court", json=data)
+    court_id = court.id
+    data = {"court_id": court_id}
+    with query_budget(4):
+        response = client.post("/remove_court", json=data)
     assert response.status_code == 200
     json_data = response.get_json()
     assert "message" in json_data
     assert json_data["message"] == "Court successfully deleted"
-    assert Court.query.get(court.id) is None
+    assert Court.query.get(court_id) is None
 
 
-def test_update_court_rating(client):
+def test_update_court_rating(client, query_budget):
     user = User.register(
         username="ratecourt",
         password="password",
@@ -144,7 +120,8 @@ def test_update_court_rating(client):
     db.session.commit()
 
     data = {"court_id": court.id, "rating": 4}
-    response = client.post("/update_court_rating", json=data)
+    with query_budget(4):
+        response = client.post("/update_court_rating", json=data)
     assert response.status_code == 200
     json_data = response.get_json()
     assert "message" in json_data
@@ -152,7 +129,7 @@ def test_update_court_rating(client):
     updated_court = Court.query.get(court.id)
     assert updated_court.user_rating == 4
 
-def test_search_for_courts(client):
+def test_search_for_courts(client, query_budget):
     user = User.register(
         username="searchcourt",
         password="password",
@@ -183,7 +160,798 @@ def test_search_for_courts(client):
     db.session.commit()
 
     login_test_user(client, user)
-    response = client.get("/search")
+    with query_budget(1):
+        response = client.get("/search")
+    assert response.status_code == 200
+    assert b"First Court" not in response.data
+    assert b"first123" not in response.data
+
+    with query_budget(1):
+        response = client.get("/saved_court_ids")
+    assert response.status_code == 200
+    assert response.get_json() == {"first123": court1.id, "second123": court2.id}
+
+
+def test_saved_court_ids_etag(client, query_budget):
+    user = User.register(
+        username="etaguser",
+        password="password",
+        email="etag@example.com",
+        first_name="Etag",
+        last_name="User",
+        bio="",
+        location="Etag City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+
+    with query_budget(2):
+        response = client.get("/saved_court_ids")
+    etag = response.headers["ETag"]
+    assert etag
+
+    with query_budget(1):
+        response = client.get("/saved_court_ids", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    with query_budget(3):
+        client.post(
+            "/save_court",
+            json={
+                "court_name": "Etag Court",
+                "google_maps_place_id": "etag123",
+                "address": "1 Etag Way",
+                "google_maps_url": "https://maps.google.com/?q=1+Etag+Way",
+            },
+        )
+    with query_budget(1):
+        response = client.get("/saved_court_ids", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "etag123" in response.get_json()
+
+
+def test_view_saved_courts_keyset_pagination(client, query_budget):
+    user = User.register(
+        username="pageuser",
+        password="password",
+        email="page@example.com",
+        first_name="Page",
+        last_name="User",
+        bio="",
+        location="Page City",
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    courts = [
+        Court(
+            court_name=f"Paged Court {i}",
+            google_maps_place_id=f"paged{i}",
+            address=f"{i} Page St",
+            google_maps_url=f"https://maps.google.com/?q={i}+Page+St",
+            user_id=user.id,
+        )
+        for i in range(20)
+    ]
+    db.session.add_all(courts)
+    db.session.commit()
+    login_test_user(client, user)
+    saved_courts = f"/users/{user.username}/saved_courts"
+    last_on_first_page = courts[5].id
+
+    with query_budget(3):
+        response = client.get(saved_courts)
+    assert response.status_code == 200
+    assert b"Paged Court 19" in response.data
+    assert b"Paged Court 4<" not in response.data
+    assert f"after={last_on_first_page}".encode() in response.data
+
+    with query_budget(1):
+        response = client.get(f"{saved_courts}?page=2&after={last_on_first_page}")
+    assert response.status_code == 200
+    assert b"Paged Court 4<" in response.data
+    assert b"Paged Court 5<" not in response.data
+    assert b'<li class="page-item active"><span class="page-link">2</span></li>' in response.data
+
+    with query_budget(1):
+        response = client.get(f"{saved_courts}?page=3")
+    assert response.status_code == 404
+
+
+def test_saved_courts_fragments_follow_ratings_and_removals(client, query_budget):
+    user = User.register(
+        username="fragmentuser",
+        password="password",
+        email="fragment@example.com",
+        first_name="Fragment",
+        last_name="User",
+        bio="",
+        location="Fragment City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    courts = [
+        Court(
+            court_name=f"Cached Court {i}",
+            google_maps_place_id=f"cached{i}",
+            address=f"{i} Cache St",
+            google_maps_url=f"https://maps.google.com/?q={i}+Cache+St",
+            user_id=user.id,
+        )
+        for i in range(3)
+    ]
+    db.session.add_all(courts)
+    db.session.commit()
+    login_test_user(client, user)
+    saved_courts = f"/users/{user.username}/saved_courts"
+
+    client.get(saved_courts)
+    with query_budget(1):
+        response = client.get(saved_courts)
+    assert response.data.count(b"fa-solid fa-star") == 0
+    stats = fragment_cache.stats()["templates"]
+    assert stats["fragments/court_card.html"] == {"hits": 3, "misses": 3, "hit_rate": 0.5}
+    assert stats["fragments/saved_courts_pagination.html"]["hits"] == 1
+
+    client.post("/update_court_rating", json={"court_id": courts[0].id, "rating": 4})
+    response = client.get(saved_courts)
+    assert response.data.count(b"fa-solid fa-star") == 4
+
+    client.post("/remove_court", json={"court_id": courts[1].id})
+    response = client.get(saved_courts)
+    assert b"Cached Court 1<" not in response.data
+    assert b"Cached Court 2<" in response.data
+    assert fragment_cache.stats()["evictions"] == 2
+
+
+def test_user_profile_fragment_follows_saves_and_edits(client, monkeypatch, query_budget):
+    user = User.register(
+        username="profilefragment",
+        password="password",
+        email="profilefragment@example.com",
+        first_name="Profile",
+        last_name="Fragment",
+        bio="Old bio",
+        location="",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+    user_id = user.id
+    profile = f"/users/{user.username}/user_profile"
+
+    response = client.get(profile)
+    assert b"Old bio" in response.data
+    # Only the court count, which is never cached between requests.
+    with query_budget(1):
+        client.get(profile)
+    assert fragment_cache.stats()["templates"]["fragments/user_profile_body.html"]["hits"] == 1
+
+    client.post(
+        "/save_court",
+        json={
+            "court_name": "Profile Court",
+            "google_maps_place_id": "profilecourt",
+            "address": "1 Profile St",
+            "google_maps_url": "https://maps.google.com/?q=1+Profile+St",
+        },
+    )
+    response = client.get(profile)
+    assert b"Total Courts Saved:</span>\n    1\n" in response.data
+
+    # A save handled by another worker, which can't evict this worker's caches.
+    db.session.add(
+        Court(
+            court_name="Other Worker Court",
+            google_maps_place_id="otherworker",
+            address="2 Profile St",
+            google_maps_url="https://maps.google.com/?q=2+Profile+St",
+            user_id=user_id,
+        )
+    )
+    db.session.commit()
+    response = client.get(profile)
+    assert b"Total Courts Saved:</span>\n    2\n" in response.data
+
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", False)
+    client.post(
+        f"/users/{user.username}/edit_profile",
+        data={
+            "username": user.username,
+            "email": user.email,
+            "first_name": "Profile",
+            "last_name": "Fragment",
+            "bio": "New bio",
+            "location": "",
+        },
+    )
+    response = client.get(profile)
+    assert b"New bio" in response.data
+    assert b"Old bio" not in response.data
+
+
+def test_batch_court_operations(client, query_budget):
+    user = User.register(
+        username="batchuser",
+        password="password",
+        email="batch@example.com",
+        first_name="Batch",
+        last_name="User",
+        bio="",
+        location="Batch City",
+    )
+    other = User.register(
+        username="otherbatch",
+        password="password",
+        email="otherbatch@example.com",
+        first_name="Other",
+        last_name="Batch",
+        bio="",
+        location="Batch City",
+    )
+    db.session.add_all([user, other])
+    db.session.commit()
+
+    to_remove = Court(
+        court_name="Remove Me",
+        google_maps_place_id="batchremove",
+        address="1 Batch St",
+        google_maps_url="https://maps.google.com/?q=1+Batch+St",
+        user_id=user.id,
+    )
+    to_rate = Court(
+        court_name="Rate Me",
+        google_maps_place_id="batchrate",
+        address="2 Batch St",
+        google_maps_url="https://maps.google.com/?q=2+Batch+St",
+        user_id=user.id,
+    )
+    not_mine = Court(
+        court_name="Not Mine",
+        google_maps_place_id="batchother",
+        address="3 Batch St",
+        google_maps_url="https://maps.google.com/?q=3+Batch+St",
+        user_id=other.id,
+    )
+    db.session.add_all([to_remove, to_rate, not_mine])
+    db.session.commit()
+    to_remove_id = to_remove.id
+    login_test_user(client, user)
+
+    operations = [
+        {
+            "op": "save",
+            "court_name": "New Court",
+            "google_maps_place_id": "batchnew",
+            "address": "4 Batch St",
+            "google_maps_url": "https://maps.google.com/?q=4+Batch+St",
+        },
+        {"op": "remove", "court_id": str(to_remove_id)},
+        {"op": "rate", "court_id": to_rate.id, "rating": 3},
+        {"op": "rate", "court_id": not_mine.id, "rating": 5},
+        {"op": "remove", "court_id": 999999},
+        {"op": "rate", "court_id": to_rate.id, "rating": 7},
+    ]
+    with query_budget(8):
+        response = client.post("/courts/batch", json={"operations": operations})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["status"] for result in results] == [201, 200, 200, 403, 404, 400]
+
+    new_court = db.session.get(Court, results[0]["id"])
+    assert new_court.google_maps_place_id == "batchnew"
+    assert db.session.get(Court, to_remove_id) is None
+    assert db.session.get(Court, to_rate.id).user_rating == 3
+    assert db.session.get(Court, not_mine.id).user_rating is None
+
+
+def test_batch_rejects_operations_after_a_removal(client):
+    user = User.register(
+        username="orderuser",
+        password="password",
+        email="order@example.com",
+        first_name="Order",
+        last_name="User",
+        bio="",
+        location="Order City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    court = Court(
+        court_name="Order Court",
+        google_maps_place_id="orderplace",
+        address="1 Order St",
+        google_maps_url="https://maps.google.com/?q=1+Order+St",
+        user_id=user.id,
+    )
+    db.session.add(court)
+    db.session.commit()
+    court_id = court.id
+    login_test_user(client, user)
+
+    operations = [
+        {"op": "rate", "court_id": court_id, "rating": 2},
+        {"op": "remove", "court_id": court_id},
+        {
+            "op": "save",
+            "court_name": "Order Court",
+            "google_maps_place_id": "orderplace",
+            "address": "1 Order St",
+            "google_maps_url": "https://maps.google.com/?q=1+Order+St",
+        },
+        {"op": "rate", "court_id": court_id, "rating": 4},
+        {"op": "remove", "court_id": court_id},
+    ]
+    response = client.post("/courts/batch", json={"operations": operations})
+    assert [result["status"] for result in response.get_json()["results"]] == [200, 200, 409, 409, 409]
+    assert db.session.get(Court, court_id) is None
+    assert Court.query.filter_by(user_id=user.id).count() == 0
+
+
+def test_batch_court_operations_requires_operations(client, query_budget):
+    user = User.register(
+        username="emptybatch",
+        password="password",
+        email="emptybatch@example.com",
+        first_name="Empty",
+        last_name="Batch",
+        bio="",
+        location="Batch City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+
+    with query_budget(1):
+        response = client.post("/courts/batch", json={"operations": []})
+    assert response.status_code == 400
+    with query_budget(0):
+        response = client.post("/courts/batch", json={"operations": [{"op": "rate"}] * 101})
+    assert response.status_code == 400
+
+
+def test_save_court_is_idempotent(client, query_budget):
+    user = User.register(
+        username="dupeuser",
+        password="password",
+        email="dupe@example.com",
+        first_name="Dupe",
+        last_name="User",
+        bio="",
+        location="Dupe City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+
+    data = {
+        "court_name": "Dupe Court",
+        "google_maps_place_id": "dupe123",
+        "address": "1 Dupe Ave",
+        "google_maps_url": "https://maps.google.com/?q=1+Dupe+Ave",
+    }
+    with query_budget(4):
+        first = client.post("/save_court", json=data)
+    with query_budget(3):
+        second = client.post("/save_court", json=data)
+    assert first.status_code == 201
+    assert second.status_code == 200
+    assert first.get_json()["id"] == second.get_json()["id"]
+    assert Court.query.filter_by(user_id=user.id).count() == 1
+
+    headers = {"Idempotency-Key": "retry-1"}
+    data["google_maps_place_id"] = "dupe456"
+    with query_budget(3):
+        first = client.post("/save_court", json=data, headers=headers)
+    with query_budget(0):
+        retry = client.post("/save_court", json=data, headers=headers)
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert first.get_json() == retry.get_json()
+    assert Court.query.filter_by(user_id=user.id).count() == 2
+
+
+def test_remove_and_rate_court_not_owned(client, query_budget):
+    owner = User.register(
+        username="courtowner",
+        password="password",
+        email="owner@example.com",
+        first_name="Court",
+        last_name="Owner",
+        bio="",
+        location="Owner City",
+    )
+    intruder = User.register(
+        username="intruder",
+        password="password",
+        email="intruder@example.com",
+        first_name="Not",
+        last_name="Owner",
+        bio="",
+        location="Owner City",
+    )
+    db.session.add_all([owner, intruder])
+    db.session.commit()
+
+    court = Court(
+        court_name="Owned Court",
+        google_maps_place_id="owned123",
+        address="1 Owner Ave",
+        google_maps_url="https://maps.google.com/?q=1+Owner+Ave",
+        user_id=owner.id,
+    )
+    db.session.add(court)
+    db.session.commit()
+    court_id = court.id
+    login_test_user(client, intruder)
+
+    with query_budget(3):
+        response = client.post("/remove_court", json={"court_id": court_id})
+    assert response.status_code == 403
+    assert response.get_json()["error"] == "Unauthorized action"
+    with query_budget(2):
+        response = client.post("/update_court_rating", json={"court_id": court_id, "rating": 1})
+    assert response.status_code == 403
+
+    with query_budget(2):
+        response = client.post("/remove_court", json={"court_id": 999999})
+    assert response.status_code == 404
+    assert response.get_json()["error"] == "Court not found"
+    with query_budget(2):
+        response = client.post("/update_court_rating", json={"court_id": 999999, "rating": 1})
+    assert response.status_code == 404
+
+    remaining = db.session.get(Court, court_id)
+    assert remaining is not None
+    assert remaining.user_rating is None
+
+
+def test_search_places_proxy(client, monkeypatch, query_budget):
+    monkeypatch.setattr(places_search, "provider", StubPlacesProvider(results=3))
+    user = User.register(
+        username="placesuser",
+        password="password",
+        email="places@example.com",
+        first_name="Places",
+        last_name="User",
+        bio="",
+        location="Places City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+
+    with query_budget(1):
+        response = client.get("/places/search?lat=40.6782&lng=-73.9442")
+    assert response.status_code == 200
+    places = response.get_json()["places"]
+    assert len(places) == 3
+    assert set(places[0]) == {"id", "displayName", "formattedAddress", "googleMapsURI", "location"}
+
+    with query_budget(0):
+        response = client.get("/places/search?lat=40.6785&lng=-73.9445")
+    assert response.get_json()["places"] == places
+    assert places_search.provider.calls == 1
+
+    with query_budget(0):
+        response = client.get("/places/search?lat=200&lng=-73.9442")
+    assert response.status_code == 400
+
+
+def test_geocode_results_are_shared(client, monkeypatch, query_budget):
+    geocoder = StubGeocoder()
+    monkeypatch.setattr("app.geocoder", geocoder)
+    user = User.register(
+        username="geocoder",
+        password="password",
+        email="geocoder@example.com",
+        first_name="Geo",
+        last_name="Coder",
+        bio="",
+        location="",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+
+    with query_budget(3):
+        first = client.get("/geocode?query=Brooklyn, NY")
+    with query_budget(1):
+        second = client.get("/geocode?query=  brooklyn,   ny ")
+    assert first.status_code == 200
+    assert first.get_json() == second.get_json()
+    assert geocoder.calls == 1
+    assert db.session.get(GeocodeResult, "brooklyn, ny") is not None
+
+    with query_budget(0):
+        response = client.get("/geocode?query=")
+    assert response.status_code == 400
+
+
+def test_nearby_saved_courts(client, query_budget):
+    user = User.register(
+        username="nearbyuser",
+        password="password",
+        email="nearby@example.com",
+        first_name="Nearby",
+        last_name="User",
+        bio="",
+        location="Nearby City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+
+    courts = [
+        ("close", 40.6800, -73.9450),
+        ("closer", 40.6783, -73.9443),
+        ("across_town", 40.7580, -73.9855),
+        ("no_location", None, None),
+    ]
+    operations = [
+        {
+            "op": "save",
+            "court_name": name,
+            "google_maps_place_id": name,
+            "address": f"{name} address",
+            "google_maps_url": f"https://maps.google.com/?q={name}",
+            "lat": lat,
+            "lng": lng,
+        }
+        for name, lat, lng in courts
+    ]
+    with query_budget(4):
+        response = client.post("/courts/batch", json={"operations": operations})
+    assert response.status_code == 200
+
+    with query_budget(1):
+        response = client.get("/courts/nearby?lat=40.6782&lng=-73.9442&radius=5000")
+    assert response.status_code == 200
+    nearby = response.get_json()["courts"]
+    assert [court["google_maps_place_id"] for court in nearby] == ["closer", "close"]
+    assert nearby[0]["distance_m"] < nearby[1]["distance_m"] < 5000
+
+    with query_budget(1):
+        response = client.get("/courts/nearby?lat=40.6782&lng=-73.9442&radius=15000")
+    assert len(response.get_json()["courts"]) == 3
+
+    with query_budget(0):
+        response = client.get("/courts/nearby?lat=40.6782")
+    assert response.status_code == 400
+
+
+def test_place_ratings(client, query_budget):
+    user = User.register(
+        username="ratingsuser",
+        password="password",
+        email="ratings@example.com",
+        first_name="Ratings",
+        last_name="User",
+        bio="",
+        location="Ratings City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+
+    operations = [
+        {
+            "op": "save",
+            "court_name": name,
+            "google_maps_place_id": name,
+            "address": f"{name} address",
+            "google_maps_url": f"https://maps.google.com/?q={name}",
+        }
+        for name in ("rated", "unrated")
+    ]
+    with query_budget(4):
+        results = client.post("/courts/batch", json={"operations": operations}).get_json()["results"]
+    rated_id, unrated_id = (result["id"] for result in results)
+
+    with query_budget(3):
+        client.post("/update_court_rating", json={"court_id": rated_id, "rating": 2})
+    with query_budget(3):
+        client.post("/courts/batch", json={"operations": [{"op": "rate", "court_id": rated_id, "rating": 4}]})
+    with query_budget(3):
+        client.post("/courts/batch", json={"operations": [{"op": "remove", "court_id": unrated_id}]})
+
+    with query_budget(1):
+        response = client.get("/places/ratings?place_id=rated&place_id=unrated&place_id=unknown")
+    assert response.status_code == 200
+    ratings = response.get_json()["ratings"]
+    assert ratings["rated"] == {
+        "average": 4.0,
+        "rating_count": 1,
+        "save_count": 1,
+        "histogram": [0, 0, 0, 0, 1, 0],
+    }
+    assert ratings["unrated"]["save_count"] == 0
+    assert "unknown" not in ratings
+
+    too_many = "&".join(f"place_id=p{i}" for i in range(101))
+    with query_budget(0):
+        assert client.get(f"/places/ratings?{too_many}").status_code == 400
+
+
+def test_internal_pool_stats(client, monkeypatch, query_budget):
+    with query_budget(0):
+        assert client.get("/internal/pool").status_code == 404
+
+    monkeypatch.setitem(app.config, "INTERNAL_METRICS_TOKEN", "secret")
+    with query_budget(0):
+        assert client.get("/internal/pool", headers={"Authorization": "Bearer wrong"}).status_code == 404
+
+    with query_budget(0):
+        response = client.get("/internal/pool", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert stats["profile"] == app.config["DB_POOL_PROFILE"]
+    assert "checkouts" in stats["metrics"]
+    assert "class" in stats["pool"]
+    assert {"hits", "misses", "hit_rate"} <= stats["user_cache"].keys()
+
+
+@pytest.fixture
+def failing_statements(test_app, monkeypatch):
+    """
+    Makes the next N statements fail with a transient OperationalError, as a database that is restarting
+    or unreachable would, and skips the retry backoff sleeps. Set the count through the returned dict.
+    """
+    import app as app_module
+    from sqlalchemy import event
+
+    monkeypatch.setattr(app_module.read_retry, "sleep", lambda seconds: None)
+    remaining = {"times": 0}
+
+    # Savepoints only exist in the tests (see db_session), so they are let through, but they mustn't
+    # count as the database answering again.
+    record_success = app_module.db_breaker.record_success
+    monkeypatch.setattr(app_module.db_breaker, "record_success", lambda: remaining["times"] or record_success())
+
+    # Raised from the dialect's execute hooks, where SQLAlchemy wraps it as it would a cursor's own error.
+    def fail(cursor, statement, *args):
+        if remaining["times"] > 0 and "SAVEPOINT" not in statement:
+            remaining["times"] -= 1
+            raise dbapi.OperationalError("server closed the connection unexpectedly")
+
+    with test_app.app_context():
+        engine = db.engine
+    dbapi = engine.dialect.loaded_dbapi
+    event.listen(engine, "do_execute", fail)
+    event.listen(engine, "do_execute_no_params", fail)
+    yield remaining
+    event.remove(engine, "do_execute", fail)
+    event.remove(engine, "do_execute_no_params", fail)
+
+
+def test_reads_are_retried_through_transient_errors(client, failing_statements):
+    user = User.register(
+        username="retryuser",
+        password="password",
+        email="retry@example.com",
+        first_name="Retry",
+        last_name="User",
+        bio="",
+        location="Retry City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+
+    failing_statements["times"] = 2
+    response = client.get("/users/retryuser/saved_courts")
+    assert response.status_code == 200
+    assert failing_statements["times"] == 0
+
+    import app as app_module
+
+    assert app_module.read_retry.retries >= 2
+    assert app_module.db_breaker.state == "closed"
+
+
+def test_persistent_database_errors_open_the_breaker(client, failing_statements):
+    user = User.register(
+        username="downuser",
+        password="password",
+        email="down@example.com",
+        first_name="Down",
+        last_name="User",
+        bio="",
+        location="Down City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+    user_id = user.id
+
+    import app as app_module
+
+    threshold = app_module.db_breaker.failure_threshold
+    failing_statements["times"] = 1000
+    response = client.get("/saved_court_ids", headers={"Accept": "application/json"})
+    assert response.status_code == 503
+    assert "error" in response.get_json()
+
+    # Keep failing until the breaker trips; from then on requests don't reach the database at all.
+    for _ in range(threshold):
+        if app_module.db_breaker.state == "open":
+            break
+        client.get("/saved_court_ids", headers={"Accept": "application/json"})
+    assert app_module.db_breaker.state == "open"
+    remaining = failing_statements["times"]
+    response = client.get("/saved_court_ids", headers={"Accept": "application/json"})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert failing_statements["times"] == remaining
+    assert app_module.db_breaker.stats()["times_opened"] == 1
+    assert threshold <= 1000 - remaining
+
+    # The user was not logged out by the outage.
+    with client.session_transaction() as sess:
+        assert sess["curr_user"] == user_id
+
+
+def test_transient_error_on_write_returns_503(client, failing_statements):
+    user = User.register(
+        username="writeuser",
+        password="password",
+        email="write@example.com",
+        first_name="Write",
+        last_name="User",
+        bio="",
+        location="Write City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+    client.get("/saved_court_ids")
+
+    failing_statements["times"] = 1
+    data = {
+        "court_name": "Test Court",
+        "google_maps_place_id": "writeplace",
+        "address": "123 Court Ave",
+        "google_maps_url": "https://maps.google.com/?q=123+Court+Ave",
+    }
+    response = client.post("/save_court", json=data)
+    assert response.status_code == 503
+
+
+def test_metrics_endpoint(client, monkeypatch, query_budget):
+    from metrics import request_metrics
+
+    user = User.register(
+        username="metricsuser",
+        password="password",
+        email="metrics@example.com",
+        first_name="Metrics",
+        last_name="User",
+        bio="",
+        location="Metrics City",
+    )
+    db.session.add(user)
+    db.session.commit()
+    login_test_user(client, user)
+    request_metrics.clear()
+
+    with query_budget(3):
+        assert client.get("/users/metricsuser/saved_courts").status_code == 200
+    with query_budget(0):
+        assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setitem(app.config, "INTERNAL_METRICS_TOKEN", "secret")
+    with query_budget(0):
+        response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
     assert response.status_code == 200
-    assert b"First Court" in response.data
-    assert b"Second Court" in response.data
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{endpoint="views.view_saved_courts",method="GET",status="200"} 1' in body
+    assert 'http_request_sql_queries_count{endpoint="views.view_saved_courts"} 1' in body
+    assert 'http_requests_total{endpoint="views.metrics",method="GET",status="404"} 1' in body
+    assert 'template_render_size_bytes_count{template="saved_courts.html"} 1' in body
+
+    samples = request_metrics.collect()
+    assert samples[("http_request_sql_queries", ("views.view_saved_courts",))].sum > 0
+    assert samples[("http_response_size_bytes", ("views.view_saved_courts",))].sum > 0
+    request_metrics.clear()
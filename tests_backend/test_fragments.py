@@ -0,0 +1,44 @@
+from jinja2 import DictLoader, Environment
+from markupsafe import Markup
+
+from fragments import FragmentCache
+
+
+def make_cache(**kwargs):
+    environment = Environment(
+        loader=DictLoader({"card.html": "<p>{{ name }}: {{ rating }}</p>"}), autoescape=True
+    )
+    return FragmentCache(environment, **kwargs)
+
+
+def test_renders_once_per_version():
+    lookups = []
+    cache = make_cache(on_lookup=lambda template, hit: lookups.append((template, hit)))
+
+    first = cache.render(("card", 1), ("Court", 3), "card.html", name="Court", rating=3)
+    assert first == Markup("<p>Court: 3</p>")
+    # Served from the cache: the context isn't even looked at.
+    assert cache.render(("card", 1), ("Court", 3), "card.html", name="ignored", rating=0) == first
+    # A new version (here another worker changed the rating) renders again.
+    assert cache.render(("card", 1), ("Court", 5), "card.html", name="Court", rating=5) == "<p>Court: 5</p>"
+
+    assert lookups == [("card.html", False), ("card.html", True), ("card.html", False)]
+    assert cache.stats() == {
+        "size": 1,
+        "evictions": 0,
+        "templates": {"card.html": {"hits": 1, "misses": 2, "hit_rate": 1 / 3}},
+    }
+
+
+def test_escapes_and_evicts():
+    cache = make_cache()
+    assert cache.render(("card", 1), (1,), "card.html", name="<b>", rating=1) == "<p>&lt;b&gt;: 1</p>"
+
+    cache.evict(("card", 1), ("card", 2))
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 0
+    cache.render(("card", 1), (1,), "card.html", name="<b>", rating=1)
+    assert cache.stats()["templates"]["card.html"]["misses"] == 2
+
+    cache.clear()
+    assert cache.stats() == {"size": 0, "evictions": 0, "templates": {}}
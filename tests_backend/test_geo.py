@@ -0,0 +1,29 @@
+from geo import geohash_encode, geohash_decode, geohash_cells_covering, geohash_prefix_upper_bound, haversine_m
+
+
+def test_geohash_encode_and_decode():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    lat, lng = geohash_decode("u4pruydqqvj")
+    assert abs(lat - 57.64911) < 0.0001
+    assert abs(lng - 10.40744) < 0.0001
+
+
+def test_haversine_distances():
+    distances = haversine_m(40.6782, -73.9442, [40.6782, 40.7128], [-73.9442, -74.0060])
+    assert distances[0] == 0
+    assert 6400 < distances[1] < 6550
+
+
+def test_covering_cells_contain_points_on_the_circle():
+    lat, lng, radius = 40.6782, -73.9442, 5000
+    cells = geohash_cells_covering(lat, lng, radius)
+    # Points about 4.9 km north, south, east and west of the center.
+    for point in [(lat + 0.044, lng), (lat - 0.044, lng), (lat, lng + 0.058), (lat, lng - 0.058)]:
+        assert haversine_m(lat, lng, [point[0]], [point[1]])[0] < radius
+        assert any(geohash_encode(*point, 9).startswith(cell) for cell in cells)
+
+
+def test_geohash_prefix_upper_bound():
+    assert geohash_prefix_upper_bound("dr5r") == "dr5s"
+    assert geohash_prefix_upper_bound("dr5z") == "dr6"
+    assert geohash_prefix_upper_bound("zz") is None
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from hashing import PasswordHasher, PasswordHasherBusy, calibrate_rounds, hash_rounds
+
+
+class StepTimer:
+    """Clock that advances a fixed number of seconds every time it is read."""
+
+    def __init__(self, step):
+        self.step = step
+        self.now = 0
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=4)
+    hashed = hasher.hash("password")
+    assert hashed != "password"
+    assert hash_rounds(hashed) == 4
+    assert hasher.verify(hashed, "password")
+    assert not hasher.verify(hashed, "wrongpassword")
+    assert hasher.stats()["hashes"] == 1
+    assert hasher.stats()["verifications"] == 2
+
+
+def test_verify_uses_the_stored_cost():
+    old = PasswordHasher(rounds=4).hash("password")
+    hasher = PasswordHasher(rounds=5)
+    assert hasher.verify(old, "password")
+    assert hasher.needs_rehash(old)
+    assert not hasher.needs_rehash(hasher.hash("password"))
+    # A hash from a worker that calibrated to a higher cost is left alone rather than downgraded.
+    assert not PasswordHasher(rounds=4).needs_rehash(hasher.hash("password"))
+
+
+def test_hash_rounds_of_non_bcrypt_value():
+    assert hash_rounds("not a hash") is None
+
+
+def test_calibrate_rounds_fits_target():
+    # Each read advances 10ms, so a hash at min_rounds is timed at 10ms and every extra round doubles it.
+    assert calibrate_rounds(100, min_rounds=4, max_rounds=12, timer=StepTimer(0.01)) == 7
+    assert calibrate_rounds(1, min_rounds=4, max_rounds=12, timer=StepTimer(0.01)) == 4
+    assert calibrate_rounds(10**9, min_rounds=4, max_rounds=12, timer=StepTimer(0.01)) == 12
+
+
+def test_full_pool_rejects_hashes():
+    hasher = PasswordHasher(rounds=4, max_workers=1, max_pending=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    running = threading.Thread(target=hasher._run, args=(block,))
+    running.start()
+    try:
+        started.wait()
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash("password")
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        release.set()
+        running.join()
+    assert hasher.verify(hasher.hash("password"), "password")
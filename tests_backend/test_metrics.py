@@ -0,0 +1,79 @@
+import threading
+
+from sqlalchemy import create_engine, text
+
+from metrics import MetricsRegistry, finish_request, install_query_events, request_metrics, start_request
+
+
+def make_registry():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs run.", ("queue",))
+    registry.histogram("job_seconds", "Job duration.", ("queue",), (0.1, 1.0))
+    return registry
+
+
+def test_render_prometheus_text():
+    registry = make_registry()
+    registry.inc("jobs_total", ("default",))
+    registry.inc("jobs_total", ("default",))
+    for seconds in (0.05, 0.1, 0.5, 3):
+        registry.observe("job_seconds", ("default",), seconds)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE jobs_total counter" in lines
+    assert 'jobs_total{queue="default"} 2' in lines
+    assert "# TYPE job_seconds histogram" in lines
+    # Buckets are cumulative and a value equal to a bound falls in that bucket.
+    assert 'job_seconds_bucket{queue="default",le="0.1"} 2' in lines
+    assert 'job_seconds_bucket{queue="default",le="1.0"} 3' in lines
+    assert 'job_seconds_bucket{queue="default",le="+Inf"} 4' in lines
+    assert 'job_seconds_sum{queue="default"} 3.65' in lines
+    assert 'job_seconds_count{queue="default"} 4' in lines
+
+
+def test_label_values_are_escaped():
+    registry = make_registry()
+    registry.inc("jobs_total", ('say "hi"\\\n',))
+    assert 'jobs_total{queue="say \\"hi\\"\\\\\\n"} 1' in registry.render()
+
+
+def test_shards_from_every_thread_are_added_up():
+    registry = make_registry()
+
+    def work():
+        for _ in range(1000):
+            registry.inc("jobs_total", ("default",))
+            registry.observe("job_seconds", ("default",), 0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    registry.inc("jobs_total", ("default",))
+
+    samples = registry.collect()
+    assert samples[("jobs_total", ("default",))] == 8001
+    assert samples[("job_seconds", ("default",))].count == 8000
+    # The exited threads' shards were folded into one.
+    assert len(registry._shards) == 1
+
+
+def test_request_sql_tally(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    install_query_events(engine)
+    request_metrics.clear()
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        start_request()
+        connection.execute(text("SELECT 1"))
+        connection.execute(text("SELECT 2"))
+        finish_request("jobs", "GET", 200, 10)
+        connection.execute(text("SELECT 3"))
+
+    samples = request_metrics.collect()
+    assert samples[("http_requests_total", ("jobs", "GET", "200"))] == 1
+    assert samples[("http_request_sql_queries", ("jobs",))].sum == 2
+    assert samples[("http_response_size_bytes", ("jobs",))].sum == 10
+    request_metrics.clear()
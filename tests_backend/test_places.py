@@ -0,0 +1,79 @@
+import os
+import threading
+import pytest
+from places import (
+    FixturePlacesProvider,
+    PlacesProvider,
+    PlacesSearchCache,
+    StubPlacesProvider,
+    PlacesProviderError,
+)
+
+PLACES_FIXTURE = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures", "places.json")
+
+
+class FailingProvider(StubPlacesProvider):
+    def search_text(self, query, lat, lng):
+        raise PlacesProviderError("upstream down")
+
+
+def test_nearby_searches_share_a_cache_entry():
+    provider = StubPlacesProvider()
+    places_search = PlacesSearchCache(provider, precision=5)
+
+    first = places_search.search("Basketball Court", 40.6782, -73.9442)
+    second = places_search.search("basketball  court", 40.6790, -73.9450)
+    assert first == second
+    assert provider.calls == 1
+
+    places_search.search("Basketball Court", 34.0522, -118.2437)
+    assert provider.calls == 2
+    assert places_search.stats()["hits"] == 1
+
+
+def test_concurrent_misses_are_collapsed():
+    provider = StubPlacesProvider(latency=0.2)
+    places_search = PlacesSearchCache(provider)
+    results = []
+
+    def search():
+        results.append(places_search.search("Basketball Court", 40.6782, -73.9442))
+
+    threads = [threading.Thread(target=search) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert provider.calls == 1
+    assert places_search.upstream_calls == 1
+    assert places_search.collapsed + places_search.stats()["hits"] == 7
+    assert all(result == results[0] for result in results)
+
+
+def test_provider_errors_are_not_cached():
+    places_search = PlacesSearchCache(FailingProvider())
+    with pytest.raises(PlacesProviderError):
+        places_search.search("Basketball Court", 40.6782, -73.9442)
+    assert len(places_search.cache) == 0
+
+
+def test_fixture_provider_serves_the_nearest_area():
+    provider = FixturePlacesProvider(PLACES_FIXTURE)
+
+    brooklyn = provider.search_text("Basketball Court", 40.70, -73.95)
+    seattle = provider.search_text("Basketball Court", 47.60, -122.30)
+    assert brooklyn and seattle and brooklyn != seattle
+    assert all(", NY " in place["formattedAddress"] for place in brooklyn)
+    # Same shape as the live provider's results, which search.js consumes.
+    assert set(brooklyn[0]) == {"id", "displayName", "formattedAddress", "googleMapsURI", "location"}
+    assert set(brooklyn[0]["location"]) == {"lat", "lng"}
+    assert provider.calls == 2
+
+
+def test_incomplete_provider_fails_when_created():
+    class NoSearchProvider(PlacesProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        NoSearchProvider()
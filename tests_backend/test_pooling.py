@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool, QueuePool
+
+from pooling import engine_options, install_pool_events, pool_metrics, pool_status
+
+
+class FakeTimer:
+    """Manually advanced clock so idle periods can be tested without sleeping."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def metrics():
+    pool_metrics.clear()
+    yield pool_metrics
+    pool_metrics.clear()
+
+
+def make_engine(tmp_path, profile, **kwargs):
+    return create_engine(f"sqlite:///{tmp_path / 'pool.db'}", **engine_options(profile, **kwargs))
+
+
+def test_engine_options_profiles():
+    assert issubclass(engine_options("adaptive")["poolclass"], QueuePool)
+    assert engine_options("direct", pool_size=2)["pool_size"] == 2
+    assert issubclass(engine_options("pgbouncer")["poolclass"], NullPool)
+    with pytest.raises(ValueError):
+        engine_options("fastest")
+
+
+def test_adaptive_pings_only_after_idle(tmp_path, metrics):
+    timer = FakeTimer()
+    engine = make_engine(tmp_path, "adaptive")
+    install_pool_events(engine, ping_after_idle=30, clock=timer)
+
+    for now in (0, 10, 20, 60):
+        timer.now = now
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    stats = metrics.stats()
+    assert stats["connects"] == 1
+    assert stats["checkouts"] == 4
+    assert stats["checkins"] == 4
+    assert stats["pings"] == 1
+    assert stats["ping_failures"] == 0
+    assert pool_status(engine)["checked_in"] == 1
+
+
+def test_direct_never_pings(tmp_path, metrics):
+    timer = FakeTimer()
+    engine = make_engine(tmp_path, "direct")
+    install_pool_events(engine, clock=timer)
+
+    for now in (0, 1000):
+        timer.now = now
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    assert metrics.stats()["pings"] == 0
+    assert metrics.stats()["checkouts"] == 2
+
+
+def test_failed_ping_replaces_connection(tmp_path, metrics):
+    timer = FakeTimer()
+    engine = make_engine(tmp_path, "adaptive")
+    install_pool_events(engine, ping_after_idle=30, clock=timer)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    # Kill the pooled connection behind the pool's back, like a database that went to sleep.
+    engine.pool._pool.queue[0].dbapi_connection.close()
+    timer.now = 60
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+
+    stats = metrics.stats()
+    assert stats["ping_failures"] == 1
+    assert stats["connects"] == 2
+
+
+def test_pgbouncer_opens_connection_per_checkout(tmp_path, metrics):
+    engine = make_engine(tmp_path, "pgbouncer")
+    install_pool_events(engine)
+
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    assert metrics.stats()["connects"] == 3
+    assert metrics.stats()["wait_max_ms"] > 0
+    assert pool_status(engine) == {"class": "TimedNullPool"}
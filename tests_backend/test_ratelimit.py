@@ -0,0 +1,81 @@
+import pytest
+
+from ratelimit import LoginThrottle, MemoryRateLimitBackend, RateLimitBackend, create_rate_limit_backend
+
+
+class FakeTimer:
+    """Manually advanced clock so bucket refills can be tested without sleeping."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills():
+    timer = FakeTimer()
+    backend = MemoryRateLimitBackend(timer=timer)
+    assert [backend.consume("key", 3, 1) for _ in range(4)] == [True, True, True, False]
+    timer.now = 1
+    assert backend.consume("key", 3, 1)
+    assert not backend.consume("key", 3, 1)
+    timer.now = 100
+    assert [backend.consume("key", 3, 1) for _ in range(4)] == [True, True, True, False]
+    assert backend.consume("other", 3, 1)
+
+
+def test_throttle_limits_username_and_ip():
+    throttle = LoginThrottle(MemoryRateLimitBackend(timer=FakeTimer()), per_username=(2, 1), per_ip=(2, 1))
+    assert throttle.allow("hooper", "10.0.0.1")
+    assert throttle.allow("HOOPER ", "10.0.0.2")
+    assert not throttle.allow("hooper", "10.0.0.3")
+    assert throttle.allow("baller", "10.0.0.1")
+    assert not throttle.allow("someoneelse", "10.0.0.1")
+    assert throttle.stats()["served"] == 3
+    assert throttle.stats()["rejected"] == 2
+
+
+def test_bucket_tokens_does_not_consume():
+    timer = FakeTimer()
+    backend = MemoryRateLimitBackend(timer=timer)
+    assert backend.tokens("key", 3, 1) == 3
+    backend.consume("key", 3, 1, cost=3)
+    assert backend.tokens("key", 3, 1) == 0
+    assert backend.tokens("key", 3, 1) == 0
+    timer.now = 2
+    assert backend.tokens("key", 3, 1) == 2
+
+
+def test_spent_dummy_hash_budget_rejects_only_that_ip():
+    throttle = LoginThrottle(MemoryRateLimitBackend(timer=FakeTimer()), unknown_users=(2, 1))
+    assert throttle.allow("nobody1", "10.0.0.1")
+    throttle.record_unknown_user("10.0.0.1")
+    assert throttle.allow("nobody2", "10.0.0.1")
+    throttle.record_unknown_user("10.0.0.1")
+    assert throttle.stats()["dummy_hashes"] == 2
+
+    # Known and unknown usernames from that IP are turned away alike, so the rejection gives nothing away.
+    assert not throttle.allow("nobody3", "10.0.0.1")
+    assert not throttle.allow("hooper", "10.0.0.1")
+    # Everyone else can still log in.
+    assert throttle.allow("hooper", "10.0.0.2")
+    assert throttle.stats()["rejected"] == 2
+
+    throttle.clear()
+    assert throttle.allow("hooper", "10.0.0.1")
+    assert throttle.stats() == {"served": 1, "rejected": 0, "dummy_hashes": 0}
+
+
+def test_incomplete_backend_fails_when_created():
+    class ConsumeOnlyBackend(RateLimitBackend):
+        def consume(self, key, capacity, refill_per_second, cost=1):
+            return True
+
+    with pytest.raises(TypeError):
+        ConsumeOnlyBackend()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_rate_limit_backend("carrier-pigeon")
@@ -0,0 +1,177 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, install_circuit_breaker, is_transient_db_error
+
+
+class FakeTimer:
+    """Manually advanced clock so breaker timeouts can be tested without sleeping."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def drop_connections(engine, times, error=lambda: sqlite3.ProgrammingError("Cannot operate on a closed database.")):
+    """
+    Make the next `times` statements on engine fail as if the server had dropped the connection.
+
+    The error is raised from the dialect's execute hooks, where SQLAlchemy wraps DBAPI errors as it would
+    one raised by the cursor itself.
+    """
+
+    remaining = {"times": times}
+
+    def fail(cursor, statement, *args):
+        if remaining["times"] > 0:
+            remaining["times"] -= 1
+            raise error()
+
+    event.listen(engine, "do_execute", fail)
+    event.listen(engine, "do_execute_no_params", fail)
+    return remaining
+
+
+def operational_error():
+    return OperationalError("SELECT 1", {}, sqlite3.OperationalError("server closed the connection unexpectedly"))
+
+
+def test_is_transient_db_error():
+    assert is_transient_db_error(operational_error())
+    assert not is_transient_db_error(IntegrityError("INSERT", {}, sqlite3.IntegrityError("UNIQUE")))
+    assert not is_transient_db_error(ValueError())
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_timeout():
+    timer = FakeTimer()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=timer)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    timer.now = 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # A failed trial opens it again for a full timeout.
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    timer.now = 59
+    assert not breaker.allow()
+
+    timer.now = 60
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "times_opened": 1, "rejected": 2}
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_backoff_grows_exponentially_up_to_max_delay():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.5, random=lambda: 1.0)
+    assert [policy.backoff(attempt) for attempt in range(5)] == [0.1, 0.2, 0.4, 0.5, 0.5]
+
+    jittered = RetryPolicy(base_delay=0.1, max_delay=0.5, random=lambda: 0.25)
+    assert jittered.backoff(2) == pytest.approx(0.1)
+
+
+def test_retry_until_success():
+    sleeps = []
+    policy = RetryPolicy(attempts=3, sleep=sleeps.append, random=lambda: 1.0)
+    outcomes = [operational_error(), operational_error(), "ok"]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    rollbacks = []
+    assert policy.call(flaky, before_retry=lambda: rollbacks.append(1)) == "ok"
+    assert sleeps == [0.05, 0.1]
+    assert len(rollbacks) == 2
+    assert policy.retries == 2
+
+
+def test_retry_gives_up_after_attempts():
+    policy = RetryPolicy(attempts=2, sleep=lambda seconds: None)
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise operational_error()
+
+    with pytest.raises(OperationalError):
+        policy.call(down)
+    assert len(calls) == 2
+
+
+def test_non_transient_errors_are_not_retried():
+    policy = RetryPolicy(sleep=lambda seconds: None)
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        policy.call(broken)
+    assert len(calls) == 1
+
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure()
+    calls = []
+
+    with pytest.raises(CircuitOpenError):
+        RetryPolicy().call(lambda: calls.append(1), breaker=breaker)
+    assert calls == []
+
+
+def test_dropped_connection_is_retried_on_a_fresh_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'resilience.db'}")
+    breaker = CircuitBreaker(failure_threshold=5)
+    install_circuit_breaker(engine, breaker)
+    drop_connections(engine, times=1)
+
+    def read():
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT 1")).scalar()
+
+    policy = RetryPolicy(sleep=lambda seconds: None)
+    assert policy.call(read, breaker=breaker) == 1
+    assert policy.retries == 1
+    # The failure was counted and the success that followed reset it.
+    assert breaker.stats()["consecutive_failures"] == 0
+
+
+def test_engine_failures_open_the_breaker(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'resilience.db'}")
+    breaker = CircuitBreaker(failure_threshold=2)
+    install_circuit_breaker(engine, breaker)
+    drop_connections(engine, times=10)
+
+    def read():
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT 1")).scalar()
+
+    policy = RetryPolicy(attempts=5, sleep=lambda seconds: None)
+    with pytest.raises(CircuitOpenError):
+        policy.call(read, breaker=breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert policy.retries == 2
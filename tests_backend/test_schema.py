@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import inspect, text
+from app import app
+from models import db, check_schema_version, SchemaVersionError, SCHEMA_VERSION, Court, PlaceRatingStats
+import schema
+
+
+@pytest.fixture()
+def empty_db():
+    """
+    Provides an empty test database inside an app context.
+
+    Drops every table (including the pre-versioning courts table) before the test, and afterwards
+    puts back the schema the other test modules share (see the database fixture in conftest.py).
+    """
+    app.config["TESTING"] = True
+    with app.app_context():
+        drop_everything()
+        yield db
+        db.session.remove()
+        drop_everything()
+        db.create_all()
+
+
+def drop_everything():
+    db.session.remove()
+    # The pre-versioning courts table references users, so it has to go before drop_all() drops users.
+    with db.engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS courts"))
+    db.drop_all()
+    with db.engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS users"))
+
+
+def log(message):
+    pass
+
+
+def test_upgrade_creates_empty_database(empty_db):
+    with pytest.raises(SchemaVersionError):
+        check_schema_version()
+
+    assert schema.upgrade(log=log) is None
+    assert schema.database_version() == SCHEMA_VERSION
+    check_schema_version()
+
+    assert schema.upgrade(log=log) == SCHEMA_VERSION
+
+
+def test_check_rejects_other_versions(empty_db):
+    schema.upgrade(log=log)
+    schema.stamp(SCHEMA_VERSION - 1)
+    with pytest.raises(SchemaVersionError):
+        check_schema_version()
+
+
+def test_upgrade_from_unversioned_database(empty_db):
+    db.session.execute(
+        text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(30) NOT NULL UNIQUE, "
+            "password TEXT NOT NULL, email VARCHAR(75) NOT NULL UNIQUE, first_name VARCHAR(30) NOT NULL, "
+            "last_name VARCHAR(30) NOT NULL, bio TEXT, location TEXT)"
+        )
+    )
+    db.session.execute(
+        text(
+            "CREATE TABLE courts (id INTEGER PRIMARY KEY, court_name TEXT NOT NULL, "
+            "google_maps_place_id TEXT NOT NULL, address TEXT NOT NULL, google_maps_url TEXT NOT NULL, "
+            "user_id INTEGER REFERENCES users (id), user_rating FLOAT)"
+        )
+    )
+    db.session.execute(
+        text(
+            "INSERT INTO users (id, username, password, email, first_name, last_name) "
+            "VALUES (1, 'olduser', 'x', 'old@example.com', 'Old', 'User')"
+        )
+    )
+    db.session.execute(
+        text(
+            "INSERT INTO courts (id, court_name, google_maps_place_id, address, google_maps_url, user_id, user_rating) "
+            "VALUES (7, 'Old Court', 'oldplace', '1 Old St', 'https://maps.google.com/?q=1+Old+St', 1, 4)"
+        )
+    )
+    db.session.commit()
+    assert schema.database_version() == schema.BASELINE_VERSION
+
+    assert schema.upgrade(log=log) == schema.BASELINE_VERSION
+    check_schema_version()
+
+    user_columns = {column["name"] for column in inspect(db.engine).get_columns("users")}
+    assert {"location_lat", "location_lng"} <= user_columns
+    court = db.session.get(Court, 7)
+    assert court.court_name == "Old Court"
+    assert court.user_rating == 4
+    assert PlaceRatingStats.for_places(["oldplace"])["oldplace"]["save_count"] == 1
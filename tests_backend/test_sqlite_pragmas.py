@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import StaticPool
+
+from models import unique_violation_column
+from pooling import engine_options
+from sqlite_pragmas import install_sqlite_pragmas, is_memory_database, memory_engine_options
+
+
+def pragmas(engine):
+    with engine.connect() as connection:
+        return {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("foreign_keys", "busy_timeout", "journal_mode", "synchronous", "temp_store")
+        }
+
+
+def test_default_profile_enforces_foreign_keys(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'default.db'}", **engine_options("adaptive"))
+    install_sqlite_pragmas(engine)
+
+    assert pragmas(engine) == {
+        "foreign_keys": 1, "busy_timeout": 5000, "journal_mode": "delete", "synchronous": 2, "temp_store": 0
+    }
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE parents (id INTEGER PRIMARY KEY)"))
+        connection.execute(text("CREATE TABLE children (parent_id INTEGER REFERENCES parents (id))"))
+    with pytest.raises(IntegrityError), engine.begin() as connection:
+        connection.execute(text("INSERT INTO children VALUES (1)"))
+
+
+def test_benchmark_profile_uses_wal(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}", **engine_options("adaptive"))
+    install_sqlite_pragmas(engine, "benchmark")
+
+    assert pragmas(engine) == {
+        "foreign_keys": 1, "busy_timeout": 5000, "journal_mode": "wal", "synchronous": 1, "temp_store": 2
+    }
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        install_sqlite_pragmas(create_engine("sqlite://"), "fastest")
+
+
+def test_memory_database_is_shared_across_threads():
+    assert is_memory_database("sqlite://")
+    assert is_memory_database("sqlite:///:memory:")
+    assert not is_memory_database("sqlite:////tmp/court_connect.db")
+    assert not is_memory_database("postgresql:///basketball_court_finder_db")
+
+    engine = create_engine("sqlite://", **memory_engine_options())
+    assert isinstance(engine.pool, StaticPool)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (1)"))
+
+    counts = []
+    thread = threading.Thread(target=lambda: counts.append(engine.connect().scalar(text("SELECT count(*) FROM t"))))
+    thread.start()
+    thread.join()
+    assert counts == [1]
+
+
+@pytest.mark.parametrize(
+    "message, column",
+    [
+        ("UNIQUE constraint failed: users.email", "email"),
+        (
+            'duplicate key value violates unique constraint "users_username_key"\n'
+            "DETAIL:  Key (username)=(email) already exists.",
+            "username",
+        ),
+        (
+            'duplicate key value violates unique constraint "users_email_key"\n'
+            "DETAIL:  Key (email)=(username@example.com) already exists.",
+            "email",
+        ),
+        ('insert or update on table "saved_courts" violates foreign key constraint', None),
+    ],
+)
+def test_unique_violation_column(message, column):
+    assert unique_violation_column(IntegrityError("INSERT", {}, Exception(message))) == column
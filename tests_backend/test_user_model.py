@@ -1,47 +1,18 @@
 import pytest
 from app import app
-from models import db, User
+from models import db, User, password_hasher
+from hashing import hash_rounds
 
 
-@pytest.fixture(autouse=True)
-def session_scope():
-    """
-    Provides an isolated database session per test.
-
-    Opens a connection and begins a transaction, assigns a scoped session to 'db.session',
-    and rolls back and cleans up after the test.
-    """
-    with app.app_context():
-        connection = db.engine.connect()
-        transaction = connection.begin()
-        options = dict(bind=connection, binds={})
-        session = db._make_scoped_session(options=options)
-        db.session = session
-
-        yield session
-
-        transaction.rollback()
-        connection.close()
-        session.remove()
+# Every test runs in its own rolled-back transaction on the session-wide schema (see conftest.py).
+pytestmark = pytest.mark.usefixtures("db_session")
 
 
 @pytest.fixture()
 def test_app():
-    """
-    Configures the Flask app for testing with a clean test database.
-
-    Sets the test database URI and testing mode, drops and recreates all tables,
-    and cleans up the session and engine after tests.
-    """
-    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql:///basketball_court_finder_test"
+    """Configures the Flask app for testing."""
     app.config["TESTING"] = True
-    with app.app_context():
-        db.drop_all()
-        db.create_all()
-    yield app
-    with app.app_context():
-        db.session.remove()
-        db.engine.dispose()
+    return app
 
 
 @pytest.fixture
@@ -102,3 +73,41 @@ def test_user_authenticate_failure(client):
 
     auth_user = User.authenticate(username="failuser", password="wrongpassword")
     assert auth_user is False
+
+
+def test_user_authenticate_rehashes_at_new_cost(client, monkeypatch):
+    rounds = password_hasher.rounds
+    monkeypatch.setattr(password_hasher, "rounds", rounds - 1)
+    user = User.register(
+        username="rehashuser",
+        password="password",
+        email="rehashuser@example.com",
+        first_name="Rehash",
+        last_name="User",
+        bio="",
+        location="Hashville",
+    )
+    db.session.add(user)
+    db.session.commit()
+    old_hash = user.password
+
+    monkeypatch.setattr(password_hasher, "rounds", rounds)
+    auth_user = User.authenticate(username="rehashuser", password="password")
+    db.session.commit()
+
+    assert auth_user.password != old_hash
+    assert hash_rounds(auth_user.password) == password_hasher.rounds
+    assert User.authenticate(username="rehashuser", password="password").id == user.id
+
+
+def test_user_authenticate_unknown_user_runs_dummy_hash(client):
+    verifications = password_hasher.stats()["verifications"]
+    assert User.authenticate(username="nobody", password="password") is False
+    assert password_hasher.stats()["verifications"] == verifications + 1
+
+    unknown_users = []
+    assert User.authenticate(
+        username="nobody", password="password", on_unknown_user=lambda: unknown_users.append(1)
+    ) is False
+    assert unknown_users == [1]
+    assert password_hasher.stats()["verifications"] == verifications + 2
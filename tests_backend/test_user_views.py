@@ -1,48 +1,22 @@
 import pytest
-from app import app
-from models import db, User
+from app import app, user_cache, clear_caches, login_throttle
+from models import db, User, password_hasher
+from hashing import PasswordHasherBusy
+from geocoding import StubGeocoder
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 
-@pytest.fixture(autouse=True)
-def session_scope():
-    """
-    Provides an isolated database session per test.
-
-    Opens a connection and begins a transaction, assigns a scoped session to 'db.session',
-    and rolls back and cleans up after the test.
-    """
-    with app.app_context():
-        connection = db.engine.connect()
-        transaction = connection.begin()
-        options = dict(bind=connection, binds={})
-        session = db._make_scoped_session(options=options)
-        db.session = session
-
-        yield session
-
-        transaction.rollback()
-        connection.close()
-        session.remove()
+# Every test runs in its own rolled-back transaction on the session-wide schema (see conftest.py).
+pytestmark = pytest.mark.usefixtures("db_session")
 
 
 @pytest.fixture()
 def test_app():
-    """
-    Configures the Flask app for testing with a clean test database and allows to test form data without a CSRF token.
-
-    Sets the test database URI and testing mode, drops and recreates all tables,
-    and cleans up the session and engine after tests.
-    """
-    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql:///basketball_court_finder_test"
+    """Configures the Flask app for testing and allows to test form data without a CSRF token."""
     app.config["TESTING"] = True
     app.config["WTF_CSRF_ENABLED"] = False
-    with app.app_context():
-        db.drop_all()
-        db.create_all()
-    yield app
-    with app.app_context():
-        db.session.remove()
-        db.engine.dispose()
+    clear_caches()
+    return app
 
 
 @pytest.fixture
@@ -55,33 +29,67 @@ def client(test_app):
     return test_app.test_client()
 
 
-def test_register_get(client):
-    response = client.get("/register")
+def test_register_get(client, query_budget):
+    with query_budget(0):
+        response = client.get("/register")
     assert response.status_code == 200
     assert b"Register" in response.data
 
 
-def test_register_post(client):
-    response = client.post(
-        "/register",
-        data={
-            "username": "testregister",
-            "password": "password",
-            "email": "register@example.com",
-            "first_name": "Test",
-            "last_name": "Register",
-            "bio": "Test bio",
-            "location": "Test City",
-        },
-        follow_redirects=True,
-    )
+def test_register_post(client, query_budget):
+    with query_budget(6):
+        response = client.post(
+            "/register",
+            data={
+                "username": "testregister",
+                "password": "password",
+                "email": "register@example.com",
+                "first_name": "Test",
+                "last_name": "Register",
+                "bio": "Test bio",
+                "location": "Test City",
+            },
+            follow_redirects=True,
+        )
     assert response.status_code == 200
     assert b"Welcome" in response.data or b"Court Connect" in response.data
     user = User.query.filter_by(username="testregister").first()
     assert user is not None
 
 
-def test_login_post(client):
+@pytest.mark.parametrize(
+    "field, message",
+    [("username", b"already claimed that username"), ("email", b"Another person is using this email address")],
+)
+def test_register_duplicate(client, field, message):
+    existing = User.register(
+        username="takenname",
+        password="password",
+        email="taken@example.com",
+        first_name="Taken",
+        last_name="User",
+        bio=None,
+        location=None,
+    )
+    db.session.add(existing)
+    db.session.commit()
+
+    data = {
+        "username": "freshname",
+        "password": "password",
+        "email": "fresh@example.com",
+        "first_name": "Fresh",
+        "last_name": "User",
+    }
+    data[field] = getattr(existing, field)
+    response = client.post("/register", data=data)
+
+    assert response.status_code == 200
+    assert message in response.data
+    assert User.query.filter_by(username="freshname").first() is None
+
+
+def test_login_post(client, query_budget):
     user = User.register(
         username="loginuser",
         password="password",
@@ -94,25 +102,103 @@ def test_login_post(client):
     db.session.add(user)
     db.session.commit()
 
-    response = client.post(
-        "/login",
-        data={"username": "loginuser", "password": "password"},
-        follow_redirects=True,
-    )
+    with query_budget(4):
+        response = client.post(
+            "/login",
+            data={"username": "loginuser", "password": "password"},
+            follow_redirects=True,
+        )
     assert response.status_code == 200
     assert b"Welcome back" in response.data
 
 
-def test_login_invalid(client):
-    response = client.post(
-        "/login",
-        data={"username": "nousername", "password": "wrongpassword"},
-        follow_redirects=True,
+def test_login_busy_hasher(client, monkeypatch, query_budget):
+    user = User.register(
+        username="busyuser",
+        password="password",
+        email="busy@example.com",
+        first_name="Busy",
+        last_name="User",
+        bio="",
+        location="Loginville",
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    def busy(hashed, password):
+        raise PasswordHasherBusy()
+
+    monkeypatch.setattr(password_hasher, "verify", busy)
+    with query_budget(1):
+        response = client.post("/login", data={"username": "busyuser", "password": "password"})
+    assert response.status_code == 503
+    assert b"try again in a moment" in response.data
+
+
+def test_login_throttled_before_hashing(client, query_budget):
+    verifications = password_hasher.stats()["verifications"]
+    # One user lookup per attempt that gets past the throttle.
+    with query_budget(5):
+        statuses = [
+            client.post("/login", data={"username": "stuffed", "password": f"guess{i}"}).status_code
+            for i in range(7)
+        ]
+    assert statuses == [200] * 5 + [429] * 2
+    assert password_hasher.stats()["verifications"] == verifications + 5
+    assert login_throttle.stats()["rejected"] == 2
+
+
+def test_login_unknown_user_budget_is_per_client_ip(client, monkeypatch):
+    user = User.register(
+        username="knownuser",
+        password="password",
+        email="known@example.com",
+        first_name="Known",
+        last_name="User",
+        bio="",
+        location="Loginville",
     )
+    db.session.add(user)
+    db.session.commit()
+    monkeypatch.setattr(login_throttle, "unknown_users", (2, 1))
+
+    def attempt(username, client_ip):
+        return client.post(
+            "/login", data={"username": username, "password": "password"}, environ_base={"REMOTE_ADDR": client_ip}
+        ).status_code
+
+    assert [attempt(f"madeup{i}", "203.0.113.1") for i in range(2)] == [200, 200]
+    verifications = password_hasher.stats()["verifications"]
+    # The guessing IP is refused for every username, without hashing, so existing ones can't be told apart...
+    assert [attempt("madeup2", "203.0.113.1"), attempt("knownuser", "203.0.113.1")] == [429, 429]
+    assert password_hasher.stats()["verifications"] == verifications
+    # ...while the account's owner, elsewhere, still logs in.
+    assert attempt("knownuser", "198.51.100.7") == 302
+
+
+def test_login_limit_keyed_on_forwarded_client_ip(client, monkeypatch):
+    monkeypatch.setattr(app, "wsgi_app", ProxyFix(app.wsgi_app, x_for=1))
+    monkeypatch.setattr(login_throttle, "per_ip", (1, 1))
+
+    def attempt(client_ip):
+        return client.post(
+            "/login", data={"username": f"from{client_ip}", "password": "guess"}, headers={"X-Forwarded-For": client_ip}
+        ).status_code
+
+    assert [attempt("203.0.113.1"), attempt("203.0.113.2"), attempt("203.0.113.1")] == [200, 200, 429]
+
+
+def test_login_invalid(client, query_budget):
+    with query_budget(1):
+        response = client.post(
+            "/login",
+            data={"username": "nousername", "password": "wrongpassword"},
+            follow_redirects=True,
+        )
     assert response.status_code == 200
     assert b"Invalid username/password" in response.data
 
-def test_logout(client):
+def test_logout(client, query_budget):
     user = User.register(
         username="logoutuser",
         password="password",
@@ -128,11 +214,12 @@ def test_logout(client):
     with client.session_transaction() as sess:
         sess["curr_user"] = user.id
     
-    response = client.get("/logout", follow_redirects=True)
+    with query_budget(1):
+        response = client.get("/logout", follow_redirects=True)
     assert response.status_code == 200
     assert b"login" in response.data.lower()
 
-def test_user_profile_view(client):
+def test_user_profile_view(client, query_budget):
     user = User.register(
         username="profileuser",
         password="password",
@@ -148,6 +235,142 @@ def test_user_profile_view(client):
     with client.session_transaction() as sess:
         sess["curr_user"] = user.id
 
-    response = client.get(f"/users/{user.username}/user_profile")
+    with query_budget(2):
+        response = client.get(f"/users/{user.username}/user_profile")
     assert response.status_code == 200
     assert bytes(user.username, "utf-8") in response.data
+
+
+def test_curr_user_served_from_cache(client, query_budget):
+    user = User.register(
+        username="cacheduser",
+        password="password",
+        email="cached@example.com",
+        first_name="Cached",
+        last_name="User",
+        bio="",
+        location="Cache City",
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    with client.session_transaction() as sess:
+        sess["curr_user"] = user.id
+
+    username = user.username
+    with query_budget(2):
+        client.get(f"/users/{username}/user_profile")
+    # The user comes from the cache; the one statement is the profile's court count.
+    with query_budget(1):
+        response = client.get(f"/users/{username}/user_profile")
+    assert response.status_code == 200
+    assert b"Cached User" in response.data
+    assert user_cache.misses == 1
+    assert user_cache.hits == 1
+
+
+def test_edit_profile_invalidates_cached_user(client, query_budget):
+    user = User.register(
+        username="staleuser",
+        password="password",
+        email="stale@example.com",
+        first_name="Stale",
+        last_name="User",
+        bio="",
+        location="Stale City",
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    with client.session_transaction() as sess:
+        sess["curr_user"] = user.id
+
+    username = user.username
+    with query_budget(2):
+        client.get(f"/users/{username}/user_profile")
+    with query_budget(4):
+        response = client.post(
+            f"/users/{username}/edit_profile",
+            data={
+                "username": "freshuser",
+                "email": "fresh@example.com",
+                "first_name": "Fresh",
+                "last_name": "User",
+                "bio": "",
+                "location": "Fresh City",
+            },
+            follow_redirects=True,
+        )
+    assert response.status_code == 200
+    assert b"Fresh User" in response.data
+    assert b"Stale User" not in response.data
+
+
+def test_edit_profile_invalidates_cached_user_for_other_sessions(test_app, client, query_budget):
+    user = User.register(
+        username="twodevices",
+        password="password",
+        email="twodevices@example.com",
+        first_name="First",
+        last_name="Name",
+        bio="",
+        location="Device City",
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    other_client = test_app.test_client()
+    for each in (client, other_client):
+        with each.session_transaction() as sess:
+            sess["curr_user"] = user.id
+
+    def edit_first_name(first_name):
+        with query_budget(4):
+            response = client.post(
+                "/users/twodevices/edit_profile",
+                data={
+                    "username": "twodevices",
+                    "email": "twodevices@example.com",
+                    "first_name": first_name,
+                    "last_name": "Name",
+                    "bio": "",
+                    "location": "Device City",
+                },
+            )
+        assert response.status_code == 302
+
+    # The other session (a second device) caches the user after the first edit, then must not be served
+    # that snapshot once the first session edits again.
+    edit_first_name("Second")
+    with query_budget(2):
+        assert b"Second Name" in other_client.get("/users/twodevices/user_profile").data
+    edit_first_name("Third")
+    with query_budget(2):
+        response = other_client.get("/users/twodevices/user_profile")
+    assert b"Third Name" in response.data
+    assert b"Second Name" not in response.data
+
+
+def test_register_geocodes_location(client, monkeypatch, query_budget):
+    monkeypatch.setattr("app.geocoder", StubGeocoder())
+    with query_budget(4):
+        response = client.post(
+            "/register",
+            data={
+                "username": "geocodeuser",
+                "password": "password",
+                "email": "geocode@example.com",
+                "first_name": "Geo",
+                "last_name": "Code",
+                "bio": "",
+                "location": "Brooklyn, NY",
+            },
+        )
+    assert response.status_code == 302
+    user = User.query.filter_by(username="geocodeuser").first()
+    assert user.location_lat is not None
+    assert user.location_lng is not None
+
+    with query_budget(1):
+        response = client.get("/search")
+    assert f'data-center-lat="{user.location_lat}"'.encode() in response.data
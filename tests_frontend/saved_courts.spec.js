@@ -8,18 +8,26 @@ describe("Saved Courts Functions", () => {
 
     // Mock showError function to prevent actual UI updates
     showErrorSpy = spyOn(window, "showError").and.callThrough();
+
+    // Send queued court operations right away instead of waiting for more clicks
+    courtBatch.delay = 0;
   });
 
   describe("removeCourtData", () => {
-    it("should call axios.post with correct data", async () => {
+    it("should send a remove operation to the batch endpoint", async () => {
       const courtId = 1;
-      const data = { court_id: courtId };
+      axiosPostSpy.and.returnValue(
+        Promise.resolve({ data: { results: [{ status: 200, id: courtId }] } })
+      );
 
       await removeCourtData(courtId);
 
-      expect(axiosPostSpy).toHaveBeenCalledWith("/remove_court", data, {
-        headers: { "Content-Type": "application/json" },
-      });
+      expect(axiosPostSpy).toHaveBeenCalledWith(
+        "/courts/batch",
+        { operations: [{ op: "remove", court_id: courtId }] },
+        { headers: { "Content-Type": "application/json" } }
+      );
+      expect(showErrorSpy).not.toHaveBeenCalled();
     });
 
     it("should call showError when axios.post fails", async () => {
@@ -34,16 +42,49 @@ describe("Saved Courts Functions", () => {
   });
 
   describe("updateCourtRating", () => {
-    it("should call axios.post with correct data", async () => {
+    it("should send a rate operation to the batch endpoint", async () => {
       const courtId = 1;
       const rating = 4;
-      const data = { court_id: courtId, rating: rating };
+      axiosPostSpy.and.returnValue(
+        Promise.resolve({ data: { results: [{ status: 200, id: courtId }] } })
+      );
 
       await updateCourtRating(courtId, rating);
 
-      expect(axiosPostSpy).toHaveBeenCalledWith("/update_court_rating", data, {
-        headers: { "Content-Type": "application/json" },
-      });
+      expect(axiosPostSpy).toHaveBeenCalledWith(
+        "/courts/batch",
+        { operations: [{ op: "rate", court_id: courtId, rating: rating }] },
+        { headers: { "Content-Type": "application/json" } }
+      );
+    });
+
+    it("should only send the latest rating for repeat clicks on a court", async () => {
+      axiosPostSpy.and.returnValue(
+        Promise.resolve({ data: { results: [{ status: 200, id: 1 }] } })
+      );
+
+      const first = updateCourtRating(1, 2);
+      const second = updateCourtRating(1, 5);
+      await Promise.all([first, second]);
+
+      expect(axiosPostSpy).toHaveBeenCalledTimes(1);
+      expect(axiosPostSpy).toHaveBeenCalledWith(
+        "/courts/batch",
+        { operations: [{ op: "rate", court_id: 1, rating: 5 }] },
+        { headers: { "Content-Type": "application/json" } }
+      );
+    });
+
+    it("should call showError when the server rejects the rating", async () => {
+      axiosPostSpy.and.returnValue(
+        Promise.resolve({ data: { results: [{ status: 403, error: "Unauthorized action" }] } })
+      );
+
+      await updateCourtRating(1, 4);
+
+      expect(showErrorSpy).toHaveBeenCalledWith(
+        "Error updating rating. Please try again!"
+      );
     });
 
     it("should call showError when axios.post fails", async () => {
@@ -107,12 +148,15 @@ describe("Saved Courts Functions", () => {
       document.body.appendChild(courtContainer);
 
       spyOn(courtContainer, "remove").and.callThrough();
+      axiosPostSpy.and.returnValue(
+        Promise.resolve({ data: { results: [{ status: 200, id: 1 }] } })
+      );
 
       await removeCourtUi({ preventDefault: () => {} }, removeButton);
 
       expect(axiosPostSpy).toHaveBeenCalledWith(
-        "/remove_court",
-        { court_id: "1" },
+        "/courts/batch",
+        { operations: [{ op: "remove", court_id: "1" }] },
         {
           headers: { "Content-Type": "application/json" },
         }